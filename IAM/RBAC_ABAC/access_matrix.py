@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Access Matrix Runner
+Runs every principal x resource x action check of a declarative spec in parallel and prints a PASS/FAIL table
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+IAM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, IAM_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(IAM_DIR), 'common'))
+from cli import get_option
+from credential_cache import CredentialCache
+
+# The ABAC lab: users may read objects only in the bucket whose Project tag matches theirs,
+# and may list every abac-lab-* bucket. ${Name} is replaced with the stack output Name.
+DEFAULT_SPEC = {
+    "stack_name": "ABACLabStack",
+    "principals": {
+        "RedUser": {"tags": {"Project": "Red"}},
+        "BlueUser": {"tags": {"Project": "Blue"}}
+    },
+    "resources": {
+        "RedBucket": {"bucket": "${RedBucketName}", "key": "secret.txt", "tags": {"Project": "Red"}},
+        "BlueBucket": {"bucket": "${BlueBucketName}", "key": "secret.txt", "tags": {"Project": "Blue"}}
+    },
+    "actions": ["s3:GetObject", "s3:ListBucket"],
+    "expect": {"s3:GetObject": "tag-match:Project", "s3:ListBucket": "SUCCESS"}
+}
+
+# Errors that can mean "not propagated yet" for a brand new access key or policy
+PROPAGATION_ERRORS = ['AccessDenied', 'InvalidAccessKeyId', 'InvalidClientTokenId', 'SignatureDoesNotMatch']
+
+ACTIONS = {
+    's3:GetObject': lambda s3, resource: s3.get_object(Bucket=resource['bucket'], Key=resource['key']),
+    's3:ListBucket': lambda s3, resource: s3.list_objects_v2(Bucket=resource['bucket'], MaxKeys=1)
+}
+
+def get_stack_outputs(stack_name):
+    cf = boto3.client('cloudformation')
+    response = cf.describe_stacks(StackName=stack_name)
+    outputs = {}
+    for output in response['Stacks'][0]['Outputs']:
+        outputs[output['OutputKey']] = output['OutputValue']
+    return outputs
+
+def substitute(value, outputs):
+    """Replace ${OutputKey} placeholders with stack output values"""
+    return re.sub(r'\$\{(\w+)\}', lambda match: outputs[match.group(1)], value)
+
+def expected_result(rule, principal, resource):
+    """Resolve an expectation: SUCCESS, FAIL, or tag-match:<Key> (SUCCESS when both tags are equal)"""
+    if rule.startswith('tag-match:'):
+        tag = rule.split(':', 1)[1]
+        principal_tag = principal.get('tags', {}).get(tag)
+        return "SUCCESS" if principal_tag is not None and principal_tag == resource.get('tags', {}).get(tag) else "FAIL"
+    return rule
+
+def expand_checks(spec, outputs):
+    """Expand the spec into one check per principal x resource x action, with explicit overrides applied"""
+    resources = {}
+    for name, resource in spec['resources'].items():
+        resources[name] = dict(resource, bucket=substitute(resource['bucket'], outputs))
+
+    overrides = {(o['principal'], o['resource'], o['action']): o['expect'] for o in spec.get('overrides', [])}
+    checks = []
+    for principal_name, principal in spec['principals'].items():
+        for resource_name, resource in resources.items():
+            for action in spec['actions']:
+                if action not in ACTIONS:
+                    raise ValueError(f"Unsupported action {action}; supported: {', '.join(ACTIONS)}")
+                rule = spec['expect'].get(action, "FAIL") if isinstance(spec['expect'], dict) else spec['expect']
+                expected = overrides.get((principal_name, resource_name, action),
+                                         expected_result(rule, principal, resource))
+                checks.append({
+                    'principal': principal_name,
+                    'resource': resource_name,
+                    'action': action,
+                    'expected': expected,
+                    'target': resource
+                })
+    return checks
+
+def backoff_delays(initial=0.5, maximum=4.0):
+    delay = initial
+    while True:
+        yield delay
+        delay = min(maximum, delay * 2)
+
+def wait_for_credentials(cache, keys, timeout=60):
+    """Poll get_session_token with backoff until every new access key works; returns seconds waited"""
+    started = time.perf_counter()
+
+    def wait(user):
+        for delay in backoff_delays():
+            try:
+                cache.session(keys[user]['AccessKeyId'], keys[user]['SecretAccessKey'])
+                return
+            except ClientError as e:
+                if time.perf_counter() - started + delay > timeout:
+                    raise TimeoutError(f"Credentials for {user} did not propagate within {timeout}s: {e}")
+                time.sleep(delay)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(keys))) as pool:
+        list(pool.map(wait, keys))
+    return time.perf_counter() - started
+
+def run_check(cache, keys, check, settle_seconds):
+    """
+    Run one check. An outcome that differs from the expectation because of a
+    propagation-type error is retried with backoff for up to settle_seconds,
+    since new keys and tags take a while to reach every endpoint.
+    """
+    key = keys[check['principal']]
+    s3 = cache.client('s3', key['AccessKeyId'], key['SecretAccessKey'])
+    started = time.perf_counter()
+    attempts = 0
+    for delay in backoff_delays():
+        attempts += 1
+        error = None
+        try:
+            ACTIONS[check['action']](s3, check['target'])
+            outcome = "SUCCESS"
+        except ClientError as e:
+            error = e.response['Error']['Code']
+            outcome = "FAIL" if error == 'AccessDenied' else f"ERROR ({error})"
+        settled = outcome == check['expected'] or error not in PROPAGATION_ERRORS
+        if settled or time.perf_counter() - started + delay > settle_seconds:
+            break
+        time.sleep(delay)
+    return dict(check, outcome=outcome, passed=outcome == check['expected'], attempts=attempts,
+                duration_ms=(time.perf_counter() - started) * 1000)
+
+def run_matrix(checks, keys, cache=None, workers=32, settle_seconds=30):
+    """Run all checks on a thread pool; results come back in check order"""
+    cache = cache or CredentialCache()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda check: run_check(cache, keys, check, settle_seconds), checks))
+
+def print_table(results):
+    print(f"\n{'Principal':<16} {'Resource':<16} {'Action':<16} {'Expected':<9} {'Actual':<22} {'Tries':>5}  Result")
+    print("-" * 95)
+    for result in results:
+        status = "✅ PASS" if result['passed'] else "❌ FAIL"
+        print(f"{result['principal']:<16} {result['resource']:<16} {result['action']:<16} {result['expected']:<9} "
+              f"{result['outcome']:<22} {result['attempts']:>5}  {status}")
+    passed = sum(1 for result in results if result['passed'])
+    print(f"\n📊 {passed}/{len(results)} checks passed")
+
+def create_access_keys(iam, users):
+    keys = {}
+    for user in users:
+        print(f"Creating key for {user}...")
+        keys[user] = iam.create_access_key(UserName=user)['AccessKey']
+    return keys
+
+def delete_access_keys(iam, keys):
+    for user, key in keys.items():
+        try:
+            iam.delete_access_key(UserName=user, AccessKeyId=key['AccessKeyId'])
+        except ClientError as e:
+            print(f"Error deleting key for {user}: {e}")
+
+def run_access_matrix(spec, outputs, workers=32, settle_seconds=30):
+    """Create keys for the spec's principals, wait for them, run the matrix, clean up; returns the results"""
+    checks = expand_checks(spec, outputs)
+    iam = boto3.client('iam')
+    cache = CredentialCache()
+    keys = {}
+    try:
+        keys = create_access_keys(iam, spec['principals'])
+        print("Waiting for credential propagation...")
+        waited = wait_for_credentials(cache, keys)
+        print(f"Credentials ready after {waited:.1f}s")
+
+        started = time.perf_counter()
+        results = run_matrix(checks, keys, cache, workers, settle_seconds)
+        print_table(results)
+        print(f"⏱️  {len(checks)} checks in {time.perf_counter() - started:.1f}s; credential cache: {cache.stats()}")
+        return results
+    finally:
+        print("\nCleaning up keys...")
+        delete_access_keys(iam, keys)
+        cache.close()
+
+def run_offline(spec, template_path):
+    """Evaluate the matrix against the template's policies with policy_evaluator.py; no AWS calls"""
+    from policy_evaluator import PolicyEvaluator, s3_request, stack_outputs
+    evaluator = PolicyEvaluator.from_template(template_path)
+    results = []
+    for check in expand_checks(spec, stack_outputs(template_path)):
+        target = check['target']
+        resource, context = s3_request(check['action'], target['bucket'], target.get('key'), target.get('tags'))
+        allowed = evaluator.is_allowed(check['principal'], check['action'], resource, context)
+        outcome = "SUCCESS" if allowed else "FAIL"
+        results.append(dict(check, outcome=outcome, passed=outcome == check['expected'], attempts=1, duration_ms=0.0))
+    print_table(results)
+    return results
+
+def main():
+    args = sys.argv[1:]
+    if '--help' in args:
+        print("Usage: python3 access_matrix.py [spec.json] [--workers N] [--settle SECONDS] "
+              "[--offline [--template abac_lab.yaml]]")
+        sys.exit(0)
+
+    spec = DEFAULT_SPEC
+    if args and not args[0].startswith('--'):
+        with open(args[0]) as spec_file:
+            spec = json.load(spec_file)
+
+    workers = get_option(args, '--workers', 32)
+    settle_seconds = get_option(args, '--settle', 30.0)
+    if '--offline' in args:
+        results = run_offline(spec, get_option(args, '--template', 'abac_lab.yaml'))
+        sys.exit(0 if all(result['passed'] for result in results) else 1)
+
+    stack_name = spec.get('stack_name', DEFAULT_SPEC['stack_name'])
+
+    print(f"Fetching outputs for stack: {stack_name}...")
+    try:
+        outputs = get_stack_outputs(stack_name)
+    except Exception as e:
+        print(f"Error fetching stack outputs: {e}")
+        sys.exit(1)
+
+    results = run_access_matrix(spec, outputs, workers, settle_seconds)
+    sys.exit(0 if all(result['passed'] for result in results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Offline IAM Policy Evaluator
+Loads the identity policies of a CloudFormation template and answers Allow/Deny
+for (principal, action, resource, context) without AWS credentials
+"""
+
+import os
+import random
+import re
+import sys
+import time
+from functools import lru_cache
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO_DIR, 'common'))
+from cfn_template import read_template
+from cli import get_option
+
+DEFAULT_ACCOUNT_ID = '123456789012'
+DEFAULT_REGION = 'us-east-1'
+
+ALLOW = 'Allow'
+EXPLICIT_DENY = 'ExplicitDeny'
+IMPLICIT_DENY = 'ImplicitDeny'
+
+class PolicyError(Exception):
+    """Raised for templates or policy documents the evaluator cannot interpret"""
+    pass
+
+# --- Wildcard matching -------------------------------------------------------
+
+@lru_cache(maxsize=4096)
+def _wildcard_regex(pattern, ignore_case):
+    """IAM wildcards: * matches any run of characters, ? matches exactly one"""
+    regex = ''.join('.*' if char == '*' else '.' if char == '?' else re.escape(char) for char in pattern)
+    return re.compile(regex + r'\Z', re.IGNORECASE if ignore_case else 0)
+
+@lru_cache(maxsize=1 << 16)
+def wildcard_match(pattern, value, ignore_case=False):
+    """Memoized IAM wildcard match; actions compare case-insensitively, resources case-sensitively"""
+    if '*' not in pattern and '?' not in pattern:
+        return pattern.lower() == value.lower() if ignore_case else pattern == value
+    return _wildcard_regex(pattern, ignore_case).match(value) is not None
+
+_POLICY_VARIABLE = re.compile(r'\$\{([^}]+)\}')
+
+def substitute_variables(text, context):
+    """Replace ${key} policy variables with request context values; None if one is missing"""
+    if '${' not in text:
+        return text
+    missing = []
+
+    def replace(match):
+        value = context.get(match.group(1))
+        if value is None:
+            missing.append(match.group(1))
+            return ''
+        return str(value)
+
+    result = _POLICY_VARIABLE.sub(replace, text)
+    return None if missing else result
+
+# --- Statement compilation ---------------------------------------------------
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _string_equals(context_value, policy_value):
+    return context_value == policy_value
+
+def _string_equals_ignore_case(context_value, policy_value):
+    return context_value.lower() == policy_value.lower()
+
+def _string_like(context_value, policy_value):
+    return wildcard_match(policy_value, context_value)
+
+def _bool(context_value, policy_value):
+    return str(context_value).lower() == str(policy_value).lower()
+
+# operator -> (comparison, negated)
+CONDITION_OPERATORS = {
+    'StringEquals': (_string_equals, False),
+    'StringNotEquals': (_string_equals, True),
+    'StringEqualsIgnoreCase': (_string_equals_ignore_case, False),
+    'StringNotEqualsIgnoreCase': (_string_equals_ignore_case, True),
+    'StringLike': (_string_like, False),
+    'StringNotLike': (_string_like, True),
+    'ArnEquals': (_string_like, False),
+    'ArnLike': (_string_like, False),
+    'ArnNotEquals': (_string_like, True),
+    'ArnNotLike': (_string_like, True),
+    'Bool': (_bool, False)
+}
+
+class Statement:
+    """One compiled policy statement"""
+
+    def __init__(self, document, source):
+        self.source = source
+        self.sid = document.get('Sid', '')
+        self.effect = document.get('Effect')
+        if self.effect not in (ALLOW, 'Deny'):
+            raise PolicyError(f"{source}: Effect must be Allow or Deny, got {self.effect!r}")
+        self.actions = [action.lower() for action in _as_list(document.get('Action'))]
+        self.not_actions = [action.lower() for action in _as_list(document.get('NotAction'))]
+        self.resources = _as_list(document.get('Resource'))
+        self.not_resources = _as_list(document.get('NotResource'))
+        self.conditions = []
+        for operator, entries in (document.get('Condition') or {}).items():
+            if_exists = operator.endswith('IfExists')
+            name = operator[:-len('IfExists')] if if_exists else operator
+            if name == 'Null':
+                for key, values in entries.items():
+                    self.conditions.append((None, False, True, key, [str(v).lower() for v in _as_list(values)]))
+                continue
+            if name not in CONDITION_OPERATORS:
+                raise PolicyError(f"{source}: unsupported condition operator {operator}")
+            compare, negated = CONDITION_OPERATORS[name]
+            for key, values in entries.items():
+                self.conditions.append((compare, negated, if_exists, key, [str(v) for v in _as_list(values)]))
+
+    def matches_action(self, action):
+        if self.not_actions:
+            return not any(wildcard_match(pattern, action, True) for pattern in self.not_actions)
+        return any(wildcard_match(pattern, action, True) for pattern in self.actions)
+
+    def matches_resource(self, resource, context):
+        patterns = self.not_resources or self.resources
+        matched = False
+        for pattern in patterns:
+            pattern = substitute_variables(pattern, context)
+            if pattern is not None and wildcard_match(pattern, resource):
+                matched = True
+                break
+        return not matched if self.not_resources else matched
+
+    def conditions_met(self, context):
+        for compare, negated, if_exists, key, values in self.conditions:
+            context_value = context.get(key)
+            if compare is None:  # Null: "true" means the key must be absent
+                if (context_value is None) != (values[0] == 'true'):
+                    return False
+                continue
+            if context_value is None:
+                # A missing key fails the condition, except for negated operators and ...IfExists
+                if negated or if_exists:
+                    continue
+                return False
+            matched = False
+            for value in values:
+                value = substitute_variables(value, context)
+                if value is not None and compare(str(context_value), value):
+                    matched = True
+                    break
+            if matched == negated:
+                return False
+        return True
+
+# --- CloudFormation resolution -----------------------------------------------
+
+def _resource_name(template, logical_id, pseudo):
+    """Physical name of a template resource, as Ref would return it"""
+    resource = template['Resources'].get(logical_id)
+    if resource is None:
+        raise PolicyError(f"Unknown resource {logical_id}")
+    properties = resource.get('Properties', {})
+    kind = resource['Type']
+    name_property = {
+        'AWS::S3::Bucket': 'BucketName',
+        'AWS::IAM::User': 'UserName',
+        'AWS::IAM::Role': 'RoleName',
+        'AWS::IAM::Group': 'GroupName',
+        'AWS::IAM::ManagedPolicy': 'ManagedPolicyName'
+    }.get(kind)
+    name = resolve(properties.get(name_property), template, pseudo) if name_property else None
+    name = name or logical_id
+    if kind == 'AWS::IAM::ManagedPolicy':
+        return f"arn:aws:iam::{pseudo['AWS::AccountId']}:policy/{name}"
+    return name
+
+def _get_att(template, logical_id, attribute, pseudo):
+    kind = template['Resources'][logical_id]['Type']
+    name = _resource_name(template, logical_id, pseudo)
+    if attribute == 'Arn':
+        if kind == 'AWS::S3::Bucket':
+            return f"arn:aws:s3:::{name}"
+        iam_kind = {'AWS::IAM::User': 'user', 'AWS::IAM::Role': 'role', 'AWS::IAM::Group': 'group'}.get(kind)
+        if iam_kind:
+            return f"arn:aws:iam::{pseudo['AWS::AccountId']}:{iam_kind}/{name}"
+    raise PolicyError(f"Cannot resolve !GetAtt {logical_id}.{attribute}")
+
+def resolve(value, template, pseudo):
+    """Resolve Ref/Sub/GetAtt/Join in a template value; IAM policy variables are left untouched"""
+    if isinstance(value, list):
+        return [resolve(item, template, pseudo) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        (function, argument), = value.items()
+        function = function.replace('Fn::', '')
+        if function == 'Ref':
+            return pseudo[argument] if argument in pseudo else _resource_name(template, argument, pseudo)
+        if function == 'GetAtt':
+            logical_id, attribute = argument.split('.', 1) if isinstance(argument, str) else argument
+            return _get_att(template, logical_id, attribute, pseudo)
+        if function == 'Join':
+            separator, items = argument
+            return separator.join(resolve(items, template, pseudo))
+        if function == 'Sub':
+            text, variables = (argument, {}) if isinstance(argument, str) else argument
+            variables = {key: resolve(item, template, pseudo) for key, item in variables.items()}
+
+            def replace(match):
+                name = match.group(1)
+                if name.startswith('!'):
+                    return '${' + name[1:] + '}'
+                if name in variables:
+                    return str(variables[name])
+                if name in pseudo:
+                    return pseudo[name]
+                if name in template['Resources']:
+                    return _resource_name(template, name, pseudo)
+                if '.' in name and name.split('.', 1)[0] in template['Resources']:
+                    return _get_att(template, *name.split('.', 1), pseudo)
+                return match.group(0)  # An IAM policy variable such as ${aws:username}
+
+            return _POLICY_VARIABLE.sub(replace, text)
+    return {key: resolve(item, template, pseudo) for key, item in value.items()}
+
+# --- Evaluator -----------------------------------------------------------------
+
+class PolicyEvaluator:
+    """
+    Identity-policy evaluator for the principals of a template.
+
+    Statements are indexed per principal by exact action, with wildcard
+    actions kept in a separate list; the candidate statements for a
+    (principal, action) pair are computed once and cached, so a decision
+    only checks resources and conditions. Evaluation follows IAM's order:
+    an explicit Deny wins, then any Allow, otherwise the request is
+    implicitly denied. Resource-based policies, permission boundaries and
+    SCPs are out of scope.
+    """
+
+    def __init__(self):
+        self.principals = {}
+        self._candidates = {}
+
+    def add_principal(self, name, policy_documents, tags=None, arn=None):
+        """Register a principal with its policy documents and tags (exposed as aws:PrincipalTag/<Key>)"""
+        statements = []
+        for source, document in policy_documents:
+            for statement in _as_list(document.get('Statement')):
+                statements.append(Statement(statement, source))
+
+        exact = {}
+        wildcard = []
+        for statement in statements:
+            if statement.not_actions or any('*' in a or '?' in a for a in statement.actions):
+                wildcard.append(statement)
+            else:
+                for action in set(statement.actions):
+                    exact.setdefault(action, []).append(statement)
+
+        context = {f"aws:PrincipalTag/{key}": value for key, value in (tags or {}).items()}
+        context['aws:username'] = name
+        if arn:
+            context['aws:PrincipalArn'] = arn
+        self.principals[name] = {'exact': exact, 'wildcard': wildcard, 'context': context, 'tags': tags or {}}
+        self._candidates = {key: value for key, value in self._candidates.items() if key[0] != name}
+
+    def _statements_for(self, principal, action):
+        key = (principal, action)
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            entry = self.principals[principal]
+            candidates = list(entry['exact'].get(action, ()))
+            candidates.extend(s for s in entry['wildcard'] if s.matches_action(action))
+            self._candidates[key] = candidates
+        return candidates
+
+    def evaluate(self, principal, action, resource, context=None):
+        """Return Allow, ExplicitDeny or ImplicitDeny"""
+        if principal not in self.principals:
+            raise PolicyError(f"Unknown principal {principal}")
+        request_context = self.principals[principal]['context']
+        if context:
+            request_context = dict(request_context, **context)
+
+        allowed = False
+        for statement in self._statements_for(principal, action.lower()):
+            if not statement.matches_resource(resource, request_context):
+                continue
+            if statement.conditions and not statement.conditions_met(request_context):
+                continue
+            if statement.effect == 'Deny':
+                return EXPLICIT_DENY
+            allowed = True
+        return ALLOW if allowed else IMPLICIT_DENY
+
+    def is_allowed(self, principal, action, resource, context=None):
+        return self.evaluate(principal, action, resource, context) == ALLOW
+
+    @classmethod
+    def from_template(cls, path, account_id=DEFAULT_ACCOUNT_ID, region=DEFAULT_REGION):
+        """Build an evaluator for every user and role of a CloudFormation template"""
+        template, pseudo = load_template(path, account_id, region)
+        resources = template['Resources']
+        evaluator = cls()
+
+        # Policy documents attached to each user/role/group logical ID
+        attached = {}
+        managed = {}
+        for logical_id, resource in resources.items():
+            properties = resource.get('Properties', {})
+            kind = resource['Type']
+            if kind in ('AWS::IAM::ManagedPolicy', 'AWS::IAM::Policy'):
+                document = resolve(properties['PolicyDocument'], template, pseudo)
+                if kind == 'AWS::IAM::ManagedPolicy':
+                    managed[_resource_name(template, logical_id, pseudo)] = (logical_id, document)
+                for attachment in ('Users', 'Roles', 'Groups'):
+                    for target in properties.get(attachment, []):
+                        target_id = target['Ref'] if isinstance(target, dict) else _logical_id(template, target, pseudo)
+                        attached.setdefault(target_id, []).append((logical_id, document))
+
+        def identity_policies(logical_id):
+            properties = resources[logical_id].get('Properties', {})
+            documents = list(attached.get(logical_id, []))
+            for policy in properties.get('Policies', []):
+                documents.append((f"{logical_id}/{policy['PolicyName']}",
+                                  resolve(policy['PolicyDocument'], template, pseudo)))
+            for arn in resolve(properties.get('ManagedPolicyArns', []), template, pseudo):
+                if arn in managed:
+                    documents.append(managed[arn])
+                else:
+                    print(f"⚠️  {logical_id}: managed policy {arn} is not in the template and is ignored")
+            return documents
+
+        for logical_id, resource in resources.items():
+            if resource['Type'] not in ('AWS::IAM::User', 'AWS::IAM::Role'):
+                continue
+            properties = resource.get('Properties', {})
+            documents = identity_policies(logical_id)
+            for group in properties.get('Groups', []):
+                group_id = group['Ref'] if isinstance(group, dict) else _logical_id(template, group, pseudo)
+                documents.extend(identity_policies(group_id))
+            tags = {tag['Key']: resolve(tag['Value'], template, pseudo) for tag in properties.get('Tags', [])}
+            evaluator.add_principal(_resource_name(template, logical_id, pseudo), documents, tags,
+                                    _get_att(template, logical_id, 'Arn', pseudo))
+        return evaluator
+
+def _logical_id(template, physical_name, pseudo):
+    for logical_id in template['Resources']:
+        if _resource_name(template, logical_id, pseudo) == physical_name:
+            return logical_id
+    raise PolicyError(f"No resource named {physical_name} in the template")
+
+def load_template(path, account_id=DEFAULT_ACCOUNT_ID, region=DEFAULT_REGION):
+    """Return (template, pseudo parameters) for a CloudFormation YAML/JSON template"""
+    template = read_template(path)
+    pseudo = {
+        'AWS::AccountId': account_id,
+        'AWS::Region': region,
+        'AWS::Partition': 'aws',
+        'AWS::StackName': 'OfflineStack',
+        'AWS::URLSuffix': 'amazonaws.com'
+    }
+    return template, pseudo
+
+def stack_outputs(path, account_id=DEFAULT_ACCOUNT_ID, region=DEFAULT_REGION):
+    """The template's Outputs as they would resolve when deployed to the given account and region"""
+    template, pseudo = load_template(path, account_id, region)
+    return {key: resolve(output['Value'], template, pseudo) for key, output in template.get('Outputs', {}).items()}
+
+def s3_request(action, bucket, key=None, tags=None):
+    """(resource ARN, request context) for an S3 request against a tagged bucket/object"""
+    resource = f"arn:aws:s3:::{bucket}/{key}" if key is not None and action.lower() != 's3:listbucket' \
+        else f"arn:aws:s3:::{bucket}"
+    context = {}
+    for tag_key, value in (tags or {}).items():
+        context[f"aws:ResourceTag/{tag_key}"] = value
+        context[f"s3:ExistingObjectTag/{tag_key}"] = value
+    return resource, context
+
+def benchmark(evaluator, buckets, decisions):
+    """Random principal x bucket x action decisions; returns decisions per second"""
+    principals = list(evaluator.principals)
+    actions = ['s3:GetObject', 's3:PutObject', 's3:ListBucket', 's3:DeleteObject']
+    requests = []
+    for i in range(decisions):
+        bucket, tags = random.choice(buckets)
+        action = random.choice(actions)
+        resource, context = s3_request(action, bucket, f"data/{i % 1000}.txt", tags)
+        requests.append((random.choice(principals), action, resource, context))
+
+    started = time.perf_counter()
+    for principal, action, resource, context in requests:
+        evaluator.evaluate(principal, action, resource, context)
+    return decisions / (time.perf_counter() - started)
+
+def main():
+    args = sys.argv[1:]
+    if '--help' in args:
+        print("Usage: python3 policy_evaluator.py [template.yaml] [--benchmark N]")
+        sys.exit(0)
+    path = args[0] if args and not args[0].startswith('--') else 'abac_lab.yaml'
+
+    print("=" * 60)
+    print("🔐 Offline IAM Policy Evaluator")
+    print("=" * 60)
+    evaluator = PolicyEvaluator.from_template(path)
+    outputs = stack_outputs(path)
+    print(f"Template: {path}")
+    for name, principal in evaluator.principals.items():
+        print(f"  {name}: tags {principal['tags']}")
+
+    buckets = []
+    template, pseudo = load_template(path)
+    for logical_id, resource in template['Resources'].items():
+        if resource['Type'] == 'AWS::S3::Bucket':
+            tags = {tag['Key']: tag['Value'] for tag in resource.get('Properties', {}).get('Tags', [])}
+            buckets.append((_resource_name(template, logical_id, pseudo), tags))
+
+    print(f"\n{'Principal':<20} {'Action':<16} {'Bucket':<45} Decision")
+    for principal in evaluator.principals:
+        for bucket, tags in buckets:
+            for action in ('s3:GetObject', 's3:ListBucket'):
+                resource, context = s3_request(action, bucket, 'secret.txt', tags)
+                print(f"{principal:<20} {action:<16} {bucket:<45} {evaluator.evaluate(principal, action, resource, context)}")
+
+    decisions = get_option(args, '--benchmark', 0)
+    if decisions:
+        rate = benchmark(evaluator, buckets, decisions)
+        print(f"\n📊 {decisions} decisions: {rate:,.0f}/sec ({rate * 60 / 1e6:.1f}M per minute)")
+    print(f"\nStack outputs (offline): {outputs}")
+
+if __name__ == '__main__':
+    main()
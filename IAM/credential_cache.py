@@ -0,0 +1,159 @@
+"""
+Credential and Session Cache
+Reuses STS credentials, sessions and clients across access checks instead of
+calling STS and building a new boto3.Session + client for every check
+"""
+
+import threading
+from datetime import datetime, timezone
+
+import boto3
+
+# Credentials are refreshed no earlier than halfway through their lifetime
+MAX_MARGIN_FRACTION = 0.5
+
+class CredentialCache:
+    """
+    Cache of temporary credentials keyed by (principal access key, role ARN).
+
+    The first request for a principal calls get_session_token (or
+    assume_role when a role ARN is given); later requests reuse the same
+    credentials and the same clients. Each key has one boto3.Session built
+    from its temporary credentials; a background thread renews credentials
+    refresh_margin_seconds before they expire and swaps in a new session, and
+    clients built from the old session are rebuilt on their next use.
+    """
+
+    def __init__(self, refresh_margin_seconds=1200, duration_seconds=3600, region_name=None, check_interval=30):
+        # Clients built before a refresh keep the old credentials until their
+        # next use, so the margin leaves them valid for a while after the swap
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.duration_seconds = duration_seconds
+        self.region_name = region_name
+        self.check_interval = check_interval
+        self.sts_calls = 0
+        self.client_builds = 0
+        self.client_hits = 0
+        self._entries = {}
+        self._sts_clients = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    def _sts_client(self, access_key_id, secret_access_key):
+        with self._lock:
+            client = self._sts_clients.get(access_key_id)
+            if client is None:
+                client = boto3.Session(
+                    aws_access_key_id=access_key_id,
+                    aws_secret_access_key=secret_access_key,
+                    region_name=self.region_name
+                ).client('sts')
+                self._sts_clients[access_key_id] = client
+            return client
+
+    def _fetch(self, key, secret_access_key, session_name):
+        """Call STS for one cache key and return the temporary credentials with their expiry"""
+        access_key_id, role_arn = key
+        sts = self._sts_client(access_key_id, secret_access_key)
+        if role_arn:
+            response = sts.assume_role(RoleArn=role_arn, RoleSessionName=session_name,
+                                       DurationSeconds=self.duration_seconds)
+        else:
+            response = sts.get_session_token(DurationSeconds=max(900, self.duration_seconds))
+        with self._lock:
+            self.sts_calls += 1
+        creds = response['Credentials']
+        return {
+            'access_key': creds['AccessKeyId'],
+            'secret_key': creds['SecretAccessKey'],
+            'token': creds['SessionToken'],
+            'expiry_time': creds['Expiration'].isoformat(),
+            'lifetime_seconds': (creds['Expiration'] - datetime.now(timezone.utc)).total_seconds()
+        }
+
+    def _needs_refresh(self, entry):
+        metadata = entry['metadata']
+        # Short-lived credentials (e.g. a 900s assume_role against the 1200s default margin) would be
+        # stale as soon as they arrive, so the margin never exceeds half of their lifetime
+        margin = min(self.refresh_margin_seconds, metadata['lifetime_seconds'] * MAX_MARGIN_FRACTION)
+        expiry = datetime.fromisoformat(metadata['expiry_time'])
+        return (expiry - datetime.now(timezone.utc)).total_seconds() < margin
+
+    def _session(self, key):
+        """Current session for a key, calling STS only if it is missing or about to expire"""
+        with self._lock:
+            entry = self._entries[key]
+        with entry['lock']:
+            if entry['metadata'] is None or self._needs_refresh(entry):
+                metadata = self._fetch(key, entry['secret_access_key'], entry['session_name'])
+                entry['session'] = boto3.Session(
+                    aws_access_key_id=metadata['access_key'],
+                    aws_secret_access_key=metadata['secret_key'],
+                    aws_session_token=metadata['token'],
+                    region_name=self.region_name
+                )
+                entry['metadata'] = metadata
+            return entry['session']
+
+    def session(self, access_key_id, secret_access_key, role_arn=None, session_name='LabSession'):
+        """boto3.Session with temporary credentials for the principal (or the role it assumes)"""
+        key = (access_key_id, role_arn)
+        with self._lock:
+            self._entries.setdefault(key, {
+                'secret_access_key': secret_access_key,
+                'session_name': session_name,
+                'metadata': None,
+                'session': None,
+                'lock': threading.Lock()
+            })
+        session = self._session(key)
+        self._start_refresher()
+        return session
+
+    def client(self, service, access_key_id, secret_access_key, role_arn=None, session_name='LabSession'):
+        """Cached client for the principal; rebuilt only when its credentials are renewed"""
+        key = (access_key_id, role_arn, service)
+        session = self.session(access_key_id, secret_access_key, role_arn, session_name)
+        with self._lock:
+            cached = self._clients.get(key)
+            if cached is not None and cached[0] is session:
+                self.client_hits += 1
+                return cached[1]
+            # Session.client is not thread-safe, so builds happen under the lock
+            client = session.client(service)
+            self._clients[key] = (session, client)
+            self.client_builds += 1
+            return client
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+                self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.check_interval):
+            with self._lock:
+                keys = [key for key, entry in self._entries.items()
+                        if entry['metadata'] is not None and self._needs_refresh(entry)]
+            for key in keys:
+                try:
+                    self._session(key)
+                except Exception as e:
+                    print(f"⚠️  Could not refresh credentials for {key[1] or key[0]}: {e}")
+
+    def stats(self):
+        return {'sts_calls': self.sts_calls, 'client_builds': self.client_builds, 'client_hits': self.client_hits}
+
+    def close(self):
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
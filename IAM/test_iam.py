@@ -4,6 +4,8 @@ import time
 import sys
 from botocore.exceptions import ClientError
 
+from credential_cache import CredentialCache
+
 def get_stack_outputs(stack_name):
     cf = boto3.client('cloudformation')
     response = cf.describe_stacks(StackName=stack_name)
@@ -66,32 +68,25 @@ def test_iam_scenario():
 
         # 3. Assume the Role
         print(f"\n[Step 3] Assuming Role: {role_arn}...")
-        sts_client = user_session.client('sts')
-        try:
-            assume_role_response = sts_client.assume_role(
-                RoleArn=role_arn,
-                RoleSessionName='LabSession'
-            )
-            temp_creds = assume_role_response['Credentials']
-            print("PASS: Role assumed successfully.")
-        except ClientError as e:
-            print(f"FAIL: Could not assume role: {e}")
-            raise e
+        # Role credentials are cached per (user, role) and refreshed before they expire; closing the
+        # cache stops its refresh thread
+        with CredentialCache() as credentials:
+            try:
+                credentials.session(access_key_id, secret_access_key, role_arn=role_arn)
+                print("PASS: Role assumed successfully.")
+            except ClientError as e:
+                print(f"FAIL: Could not assume role: {e}")
+                raise e
 
-        # 4. Access S3 with Temporary Credentials (Should Succeed)
-        print("\n[Step 4] Attempting S3 Access with Assumed Role (Expect: Success)...")
-        role_session = boto3.Session(
-            aws_access_key_id=temp_creds['AccessKeyId'],
-            aws_secret_access_key=temp_creds['SecretAccessKey'],
-            aws_session_token=temp_creds['SessionToken']
-        )
-        s3_role_client = role_session.client('s3')
+            # 4. Access S3 with Temporary Credentials (Should Succeed)
+            print("\n[Step 4] Attempting S3 Access with Assumed Role (Expect: Success)...")
+            s3_role_client = credentials.client('s3', access_key_id, secret_access_key, role_arn=role_arn)
         
-        try:
-            s3_role_client.list_objects_v2(Bucket=bucket_name)
-            print("PASS: Access succeeded with assumed role.")
-        except ClientError as e:
-            print(f"FAIL: Access failed with assumed role: {e}")
+            try:
+                s3_role_client.list_objects_v2(Bucket=bucket_name)
+                print("PASS: Access succeeded with assumed role.")
+            except ClientError as e:
+                print(f"FAIL: Access failed with assumed role: {e}")
 
     finally:
         # 5. Cleanup
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+SFN Handler Benchmark
+Measures cold-start (fresh interpreter: import + first call) and warm invocation time per handler
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from local_executor import COMMON_DIR, HANDLER_FILES, load_handlers, local_arn
+
+SAMPLE_ORDER = {"order_id": "ord-bench", "customer_id": "cust-001", "amount": 100, "items": ["sku-1", "sku-2"]}
+
+COLD_START_SCRIPT = """
+import importlib.util, json, sys, time
+started = time.perf_counter()
+sys.path[:0] = [sys.argv[1], sys.argv[4]]
+spec = importlib.util.spec_from_file_location('handler', sys.argv[2])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+module.lambda_handler(json.loads(sys.argv[3]), None)
+finished = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'first_call_ms': (finished - imported) * 1000}))
+"""
+
+def cold_start(path, runs):
+    """Average import and first-invocation time, each run in a fresh interpreter"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', COLD_START_SCRIPT, os.path.dirname(path), path, json.dumps(SAMPLE_ORDER),
+             COMMON_DIR],
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: sum(sample[key] for sample in samples) / runs for key in samples[0]}
+
+def warm_invocation(handler, repeats):
+    """Average microseconds per invocation once the module is loaded"""
+    handler(dict(SAMPLE_ORDER), None)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        handler(dict(SAMPLE_ORDER), None)
+    return (time.perf_counter() - started) / repeats * 1e6
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    print("=" * 60)
+    print("⏱️  SFN Handler Benchmark")
+    print("=" * 60)
+    print(f"Cold start: {runs} fresh interpreters per handler; warm: {repeats} invocations")
+
+    handlers = load_handlers(quiet=True)
+    print(f"\n{'Handler':<20} {'import ms':>10} {'1st call ms':>12} {'warm µs':>10}")
+    for name, path in HANDLER_FILES.items():
+        cold = cold_start(path, runs)
+        warm = warm_invocation(handlers[local_arn(name)], repeats)
+        print(f"{name:<20} {cold['import_ms']:>10.2f} {cold['first_call_ms']:>12.3f} {warm:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Step Functions Execution Tracker
+Resolves many executions as they finish, without a describe_execution loop per execution
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+from botocore.exceptions import ClientError
+
+TERMINAL_STATUSES = ['SUCCEEDED', 'FAILED', 'TIMED_OUT', 'ABORTED']
+# Error codes worth polling again; any other ClientError fails the affected futures at once
+RETRYABLE_ERROR_CODES = {'ThrottlingException', 'Throttling', 'TooManyRequestsException', 'RequestLimitExceeded',
+                         'ServiceUnavailable', 'InternalServerError', 'InternalFailure', 'RequestTimeout'}
+
+def is_retryable(error):
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in RETRYABLE_ERROR_CODES
+    return True
+
+def state_machine_arn_for(execution_arn):
+    """arn:aws:states:<region>:<account>:execution:<machine>:<name> -> the state machine ARN"""
+    parts = execution_arn.split(':')
+    return ':'.join(parts[:5] + ['stateMachine', parts[6]])
+
+class ExecutionTracker:
+    """
+    Watches many execution ARNs from one background thread.
+
+    Each round lists the RUNNING executions of every tracked state machine
+    (one paginated list_executions call per machine, however many executions
+    are tracked) and only calls describe_execution for tracked executions
+    that are no longer running. The poll interval starts at min_interval,
+    grows by `backoff` while nothing finishes, and drops back as soon as
+    something does. track() returns a Future with the describe_execution
+    response of the finished execution.
+
+    A non-retryable ClientError, or max_errors failed rounds in a row, is
+    set as the exception of the futures it affects instead of leaving
+    them waiting forever.
+    """
+
+    def __init__(self, sfn_client, min_interval=0.2, max_interval=5.0, backoff=1.5, max_errors=5):
+        self.sfn_client = sfn_client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_errors = max_errors
+        self.api_calls = 0
+        self._pending = {}
+        self._closed = False
+        self._interval = min_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def track(self, execution_arn):
+        """Return a Future that resolves when the execution reaches a terminal status"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ExecutionTracker is closed")
+            self._pending[execution_arn] = future
+            self._interval = self.min_interval
+            self._wakeup.notify()
+        return future
+
+    def close(self):
+        """Stop polling; executions still pending are cancelled"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        for future in self._pending.values():
+            future.cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        errors = 0
+        while True:
+            with self._lock:
+                while not self._closed and not self._pending:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                pending = dict(self._pending)
+
+            try:
+                finished = self._poll(pending)
+                errors = 0
+            except Exception as e:
+                errors += 1
+                finished = 0
+                if not is_retryable(e) or errors >= self.max_errors:
+                    print(f"❌ Error polling executions, failing {len(pending)} tracked executions: {e}")
+                    self._fail(pending, e)
+                    errors = 0
+                else:
+                    print(f"⚠️  Error polling executions ({errors}/{self.max_errors}): {e}")
+
+            with self._lock:
+                # Re-read the interval: track() may have reset it while this round was polling
+                if finished:
+                    self._interval = self.min_interval
+                else:
+                    self._interval = min(self.max_interval, self._interval * self.backoff)
+                self._wakeup.wait(self._interval)
+
+    def _fail(self, pending, error):
+        for execution_arn, future in pending.items():
+            with self._lock:
+                if self._pending.get(execution_arn) is not future:
+                    continue
+                del self._pending[execution_arn]
+            future.set_exception(error)
+
+    def _running_executions(self, state_machine_arn):
+        running = set()
+        kwargs = {'stateMachineArn': state_machine_arn, 'statusFilter': 'RUNNING', 'maxResults': 1000}
+        while True:
+            self.api_calls += 1
+            response = self.sfn_client.list_executions(**kwargs)
+            running.update(execution['executionArn'] for execution in response['executions'])
+            if not response.get('nextToken'):
+                return running
+            kwargs['nextToken'] = response['nextToken']
+
+    def _poll(self, pending):
+        """One polling round; returns how many executions finished"""
+        running = set()
+        for state_machine_arn in {state_machine_arn_for(arn) for arn in pending}:
+            running |= self._running_executions(state_machine_arn)
+
+        finished = 0
+        for execution_arn, future in pending.items():
+            if execution_arn in running:
+                continue
+            self.api_calls += 1
+            try:
+                response = self.sfn_client.describe_execution(executionArn=execution_arn)
+            except ClientError as e:
+                if is_retryable(e):
+                    raise
+                # Only this execution is affected (e.g. ExecutionDoesNotExist)
+                self._fail({execution_arn: future}, e)
+                continue
+            # list_executions is eventually consistent, so a just-started execution may be missing
+            if response['status'] not in TERMINAL_STATUSES:
+                continue
+            with self._lock:
+                del self._pending[execution_arn]
+            future.set_result(response)
+            finished += 1
+        return finished
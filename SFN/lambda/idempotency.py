@@ -0,0 +1,178 @@
+"""
+Idempotency store for handlers that must not repeat side effects.
+
+Step Functions retries, SQS redelivery and FIFO replays can all deliver the
+same payment more than once. IdempotencyStore.run(key, action) executes the
+action once per key and returns the stored result for every duplicate until
+the entry expires. A fingerprint of the request payload is stored with the
+result, so reusing a key for a different payload is an error rather than a
+silent replay. Completed results are kept in an in-memory LRU (O(1)
+lookups on a warm container) backed by SQLite, so they survive a cold start
+on the same /tmp and are shared with other processes using the same file.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class IdempotencyInProgressError(Exception):
+    """Another process is still executing this key; the caller should retry later"""
+    pass
+
+class IdempotencyKeyMismatchError(Exception):
+    """The key was already used for a request with a different payload"""
+    pass
+
+class IdempotencyStore:
+    """
+    Run-once store keyed on an idempotency key (order or payment ID).
+
+    Concurrent duplicates in the same process wait for the first caller's
+    result instead of executing again. A key is claimed in SQLite with an
+    IN_PROGRESS row before the action runs, so a duplicate in another
+    process raises IdempotencyInProgressError rather than double-charging.
+    A failed action releases its claim so a retry can run it again.
+    """
+
+    def __init__(self, path=None, ttl_seconds=86400, max_memory_entries=10000, in_progress_ttl_seconds=300):
+        self.ttl_seconds = ttl_seconds
+        self.in_progress_ttl_seconds = in_progress_ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.executed = 0
+        self.replayed = 0
+        self._memory = OrderedDict()
+        self._in_flight = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency ("
+                "key TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, expires_at REAL NOT NULL, "
+                "fingerprint TEXT)"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(idempotency)")]
+            if 'fingerprint' not in columns:
+                # Database written before fingerprints were stored
+                self._db.execute("ALTER TABLE idempotency ADD COLUMN fingerprint TEXT")
+
+    def run(self, key, action, fingerprint=None):
+        """
+        Return (result, replayed): action() runs only for the first caller of a key.
+
+        Raises IdempotencyKeyMismatchError when the key already holds a result
+        for a different fingerprint.
+        """
+        while True:
+            with self._lock:
+                result = self._cached(key, fingerprint)
+                if result is not None:
+                    self.replayed += 1
+                    return result, True
+                waiter = self._in_flight.get(key)
+                if waiter is None:
+                    result = self._claim(key, fingerprint)
+                    if result is not None:
+                        self.replayed += 1
+                        return result, True
+                    self._in_flight[key] = waiter = threading.Event()
+                    break
+            # Same key already running in this process: wait for its result, then look again
+            waiter.wait()
+
+        try:
+            result = action()
+        except Exception:
+            with self._lock:
+                self._release(key)
+                del self._in_flight[key]
+            waiter.set()
+            raise
+
+        with self._lock:
+            self._complete(key, result, fingerprint)
+            del self._in_flight[key]
+            self.executed += 1
+        waiter.set()
+        return result, False
+
+    def _cached(self, key, fingerprint):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        _check_fingerprint(key, entry[2], fingerprint)
+        return entry[0]
+
+    def _remember(self, key, result, expires_at, fingerprint):
+        self._memory[key] = (result, expires_at, fingerprint)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _claim(self, key, fingerprint):
+        """Insert an IN_PROGRESS row; returns the stored result if the key already completed"""
+        if self._db is None:
+            return None
+        now = time.time()
+        self._db.execute("DELETE FROM idempotency WHERE key = ? AND expires_at <= ?", (key, now))
+        inserted = self._db.execute(
+            "INSERT OR IGNORE INTO idempotency (key, status, expires_at, fingerprint) "
+            "VALUES (?, 'IN_PROGRESS', ?, ?)",
+            (key, now + self.in_progress_ttl_seconds, fingerprint)
+        ).rowcount
+        if inserted:
+            return None
+        status, result, expires_at, stored_fingerprint = self._db.execute(
+            "SELECT status, result, expires_at, fingerprint FROM idempotency WHERE key = ?", (key,)
+        ).fetchone()
+        _check_fingerprint(key, stored_fingerprint, fingerprint)
+        if status != 'COMPLETED':
+            raise IdempotencyInProgressError(f"{key} is being processed by another caller")
+        result = json.loads(result)
+        self._remember(key, result, expires_at, stored_fingerprint)
+        return result
+
+    def _complete(self, key, result, fingerprint):
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, result, expires_at, fingerprint)
+        if self._db is None:
+            return
+        self._db.execute(
+            "UPDATE idempotency SET status = 'COMPLETED', result = ?, expires_at = ?, fingerprint = ? WHERE key = ?",
+            (json.dumps(result), expires_at, fingerprint, key)
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._evict_expired()
+
+    def _release(self, key):
+        if self._db is not None:
+            self._db.execute("DELETE FROM idempotency WHERE key = ? AND status = 'IN_PROGRESS'", (key,))
+
+    def evict_expired(self):
+        """Drop expired rows from SQLite; expired memory entries are dropped when looked up"""
+        with self._lock:
+            self._evict_expired()
+
+    def _evict_expired(self):
+        if self._db is not None:
+            self._db.execute("DELETE FROM idempotency WHERE expires_at <= ?", (time.time(),))
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+def _check_fingerprint(key, stored, fingerprint):
+    if stored is not None and fingerprint is not None and stored != fingerprint:
+        raise IdempotencyKeyMismatchError(f"{key} was already used for a different payload")
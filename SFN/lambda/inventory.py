@@ -1,14 +1,36 @@
 import json
-import random
+import os
 
+from runtime import TTLCache, get_client, log, traced
+
+INVENTORY_TABLE = os.environ.get('INVENTORY_TABLE')
+
+# SKU availability, shared by every warm invocation in this container
+SKU_CACHE = TTLCache(max_entries=10000, ttl_seconds=int(os.environ.get('SKU_CACHE_TTL_SECONDS', '30')))
+
+class OutOfStockError(Exception):
+    pass
+
+def load_availability(sku):
+    """Units in stock for a SKU, read from DynamoDB when INVENTORY_TABLE is set"""
+    if not INVENTORY_TABLE:
+        return None  # No inventory table configured: every SKU counts as in stock
+    item = get_client('dynamodb').get_item(TableName=INVENTORY_TABLE, Key={'sku': {'S': sku}}).get('Item')
+    return int(item['available']['N']) if item else 0
+
+def invalidate_sku(sku):
+    """Drop a cached SKU so the next order re-reads its stock level"""
+    SKU_CACHE.invalidate(sku)
+
+@traced('sfn.handler', handler='inventory')
 def lambda_handler(event, context):
-    print(f"Checking inventory for order: {event['order_id']}")
-    
-    # Simulate inventory check
-    # In a real scenario, this would check DynamoDB
+    log(f"Checking inventory for order: {event['order_id']}")
     
-    # Simulate random out of stock (10% chance) for educational purposes? 
-    # Let's keep it simple for now and assume success unless we want to demo error handling specifically.
+    # Check each SKU through the warm cache; only misses reach the inventory table
+    for sku in event.get('items', []):
+        available = SKU_CACHE.get(sku, load_availability)
+        if available is not None and available <= 0:
+            raise OutOfStockError(f"SKU {sku} is out of stock")
     
     return {
         'order_id': event['order_id'],
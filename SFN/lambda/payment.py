@@ -1,14 +1,59 @@
+import hashlib
 import json
+import os
+import uuid
 
-def lambda_handler(event, context):
-    print(f"Processing payment for order: {event['order_id']} Amount: {event['amount']}")
-    
+from idempotency import IdempotencyStore
+from runtime import incr, log, traced
+
+# One store per container: duplicates of a payment return the first result instead of charging again
+_payment_store = None
+
+def get_payment_store():
+    """
+    Build the store on first use: in memory by default, backed by SQLite
+    only when IDEMPOTENCY_DB is set, so local runs never replay payments
+    from an earlier run.
+    """
+    global _payment_store
+    if _payment_store is None:
+        _payment_store = IdempotencyStore(
+            os.environ.get('IDEMPOTENCY_DB') or None,
+            ttl_seconds=int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+        )
+    return _payment_store
+
+# The fields that decide what is charged; a replay must match them exactly
+PAYLOAD_FIELDS = ('payment_id', 'order_id', 'customer_id', 'amount')
+
+def idempotency_key(event):
+    """Payments are keyed on payment_id when the caller has one, otherwise on the order"""
+    return f"payment-{event.get('payment_id') or event['order_id']}"
+
+def payload_fingerprint(event):
+    """SHA-256 of the canonical JSON of the payment fields"""
+    payload = {field: event.get(field) for field in PAYLOAD_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+def charge(order_id, customer_id, amount):
     # Simulate payment processing
-    
-    return {
-        'order_id': event['order_id'],
-        'customer_id': event['customer_id'],
-        'amount': event['amount'],
-        'status': 'payment_processed',
-        'transaction_id': 'tx-12345-67890'
-    }
+    return f"tx-{uuid.uuid4().hex[:20]}"
+
+@traced('sfn.handler', handler='payment')
+def lambda_handler(event, context):
+    log(f"Processing payment for order: {event['order_id']} Amount: {event['amount']}")
+
+    def process():
+        return {
+            'order_id': event['order_id'],
+            'customer_id': event['customer_id'],
+            'amount': event['amount'],
+            'status': 'payment_processed',
+            'transaction_id': charge(event['order_id'], event['customer_id'], event['amount'])
+        }
+
+    result, replayed = get_payment_store().run(idempotency_key(event), process, payload_fingerprint(event))
+    if replayed:
+        incr('sfn.payment_replays')
+        log(f"Duplicate payment for order {event['order_id']}: returning {result['transaction_id']}")
+    return dict(result)
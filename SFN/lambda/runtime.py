@@ -0,0 +1,92 @@
+"""
+Shared handler runtime for the SFN Lambda functions.
+
+Everything here lives at module level, so it is created once per container
+and reused by every warm invocation. Heavy imports (boto3) are deferred
+until a client is actually needed, which keeps cold starts short for
+handlers that never call AWS.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from metrics import incr, traced
+except ImportError:  # common/metrics.py was not packaged with the handlers; the hooks are then no-ops
+    def incr(name, value=1, **tags):
+        pass
+
+    def traced(name, **tags):
+        return lambda function: function
+
+LOG_EVENTS = os.environ.get('LOG_EVENTS', 'false').lower() == 'true'
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(service):
+    """Return a pooled boto3 client, created (and boto3 imported) on first use"""
+    client = _clients.get(service)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(service)
+            if client is None:
+                import boto3
+                from botocore.config import Config
+                client = boto3.client(service, config=Config(max_pool_connections=25, retries={'mode': 'standard'}))
+                _clients[service] = client
+    return client
+
+def log(message):
+    """Print only when LOG_EVENTS=true; full event dumps are too costly on the hot path"""
+    if LOG_EVENTS:
+        print(message)
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after ttl_seconds.
+
+    Used for SKU availability so repeated lookups in a warm container skip
+    the database; invalidate() drops an entry as soon as stock changes.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=30):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader=None):
+        """Return a cached value; on a miss call loader(key), cache and return its result"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        if loader is None:
+            return None
+        value = loader(key)
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
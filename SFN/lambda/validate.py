@@ -1,23 +1,100 @@
-import json
+from runtime import log, traced
 
 class OrderValidationError(Exception):
-    pass
+    def __init__(self, violations):
+        violations = [violations] if isinstance(violations, str) else violations
+        super().__init__("; ".join(violations))
+        self.violations = violations
 
-def lambda_handler(event, context):
-    print(f"Validating order: {json.dumps(event)}")
-    
-    # Basic validation
-    if 'order_id' not in event:
-        raise OrderValidationError("Missing order_id")
-    if 'customer_id' not in event:
-        raise OrderValidationError("Missing customer_id")
-    if 'amount' not in event or event['amount'] <= 0:
-        raise OrderValidationError("Invalid amount")
-        
+# Field rules, compiled once per container by compile_schema()
+ORDER_SCHEMA = {
+    'order_id': {'required': True},
+    'customer_id': {'required': True},
+    'amount': {'required': True, 'numeric': True, 'min_exclusive': 0, 'message': "Invalid amount"}
+}
+
+_MISSING = object()
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def compile_schema(schema):
+    """
+    Turn the schema into (field, column check) pairs.
+
+    Each check takes the whole column of values for its field and returns
+    the indexes that violate it, so a batch is validated one column at a
+    time instead of one order at a time.
+    """
+    rules = []
+    for field, spec in schema.items():
+        missing_message = spec.get('message', f"Missing {field}")
+        invalid_message = spec.get('message', f"Invalid {field}")
+        checks = []
+        if spec.get('required'):
+            checks.append((lambda column: [i for i, value in enumerate(column) if value is _MISSING],
+                           missing_message))
+        if spec.get('numeric'):
+            checks.append((lambda column: [i for i, value in enumerate(column)
+                                           if value is not _MISSING and not _is_number(value)],
+                           invalid_message))
+        if 'min_exclusive' in spec:
+            low = spec['min_exclusive']
+            checks.append((lambda column, low=low: [i for i, value in enumerate(column)
+                                                    if _is_number(value) and value <= low],
+                           invalid_message))
+        rules.append((field, checks))
+    return rules
+
+ORDER_RULES = compile_schema(ORDER_SCHEMA)
+
+def validate_orders(orders, rules=ORDER_RULES):
+    """Return one list of violation messages per order (empty when the order is valid)"""
+    violations = [[] if isinstance(order, dict) else ["Order must be a JSON object"] for order in orders]
+    positions = [index for index, order in enumerate(orders) if isinstance(order, dict)]
+    for field, checks in rules:
+        column = [orders[index].get(field, _MISSING) for index in positions]
+        for check, message in checks:
+            for row in check(column):
+                # One message per field, even when several of its checks fail
+                order_violations = violations[positions[row]]
+                if message not in order_violations:
+                    order_violations.append(message)
+    return violations
+
+def validate_order(order, rules=ORDER_RULES):
+    return validate_orders([order], rules)[0]
+
+def _validated(order):
     # Pass through data
     return {
-        'order_id': event['order_id'],
-        'customer_id': event['customer_id'],
-        'amount': event['amount'],
+        'order_id': order['order_id'],
+        'customer_id': order['customer_id'],
+        'amount': order['amount'],
         'status': 'validated'
     }
+
+def validate_batch(orders):
+    """Validate a whole batch; valid orders pass through, invalid ones are reported with every violation"""
+    valid = []
+    invalid = []
+    for index, (order, violations) in enumerate(zip(orders, validate_orders(orders))):
+        if violations:
+            order_id = order.get('order_id') if isinstance(order, dict) else None
+            invalid.append({'index': index, 'order_id': order_id, 'violations': violations})
+        else:
+            valid.append(_validated(order))
+    return {'orders': valid, 'invalid': invalid, 'valid_count': len(valid), 'invalid_count': len(invalid)}
+
+@traced('sfn.handler', handler='validate')
+def lambda_handler(event, context):
+    # Batch input ({"orders": [...]}) from a Map state or an SQS batch front end
+    if isinstance(event, dict) and isinstance(event.get('orders'), list):
+        log(f"Validating {len(event['orders'])} orders")
+        return validate_batch(event['orders'])
+
+    log(f"Validating order: {event.get('order_id') if isinstance(event, dict) else 'N/A'}")
+    violations = validate_order(event)
+    if violations:
+        raise OrderValidationError(violations)
+    return _validated(event)
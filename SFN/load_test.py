@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Step Functions Load Test
+Starts order executions at a target rate and reports latency percentiles by state and outcome
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from cli import get_option
+from execution_tracker import ExecutionTracker
+from metrics import percentile
+
+def latency_summary(values):
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 50, default=None),
+        'p95_ms': percentile(values, 95, default=None),
+        'p99_ms': percentile(values, 99, default=None),
+        'max_ms': max(values) if values else None
+    }
+
+def synthetic_orders(count, invalid_rate=0.05):
+    """Yield random orders; a fraction is missing the amount and should fail validation"""
+    for i in range(count):
+        order = {
+            "order_id": f"ord-{i:07d}",
+            "customer_id": f"cust-{random.randint(1, 5000):04d}",
+            "amount": random.randint(1, 1000)
+        }
+        if random.random() < invalid_rate:
+            del order["amount"]
+        yield order
+
+def recorded_orders(path):
+    """Yield orders from a JSONL file, one order object per line"""
+    with open(path) as orders:
+        for line in orders:
+            if line.strip():
+                yield json.loads(line)
+
+def state_durations(sfn_client, status_response):
+    """{state name: duration in ms} for one finished execution"""
+    if 'states' in status_response:  # The local stand-in reports timing directly
+        return {state['name']: state['duration_ms'] for state in status_response['states']}
+
+    durations = {}
+    entered = {}
+    kwargs = {'executionArn': status_response['executionArn'], 'maxResults': 1000}
+    while True:
+        history = sfn_client.get_execution_history(**kwargs)
+        for event in history['events']:
+            if event['type'].endswith('StateEntered'):
+                entered[event['stateEnteredEventDetails']['name']] = event['timestamp']
+            elif event['type'].endswith('StateExited'):
+                name = event['stateExitedEventDetails']['name']
+                if name in entered:
+                    durations[name] = (event['timestamp'] - entered[name]).total_seconds() * 1000
+        if not history.get('nextToken'):
+            return durations
+        kwargs['nextToken'] = history['nextToken']
+
+def run_load_test(sfn_client, state_machine_arn, orders, rate, history_workers=16):
+    """
+    Start one execution per order at `rate` per second and collect latencies as they finish.
+
+    Per-state durations need get_execution_history calls against AWS, so they
+    are fetched on a pool of history_workers threads while other executions
+    are still finishing.
+    """
+    by_state = {}
+    by_outcome = {}
+    errors = {}
+    started = time.perf_counter()
+
+    with ExecutionTracker(sfn_client) as tracker:
+        futures = []
+        for index, order in enumerate(orders):
+            delay = started + index / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            response = sfn_client.start_execution(stateMachineArn=state_machine_arn, input=json.dumps(order))
+            futures.append(tracker.track(response['executionArn']))
+        send_elapsed = time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=history_workers) as pool:
+            histories = []
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The tracker gave up on this execution; count it and keep the rest of the report
+                    name = f"tracker: {type(e).__name__}"
+                    errors[name] = errors.get(name, 0) + 1
+                    continue
+                total_ms = (result['stopDate'] - result['startDate']).total_seconds() * 1000
+                by_outcome.setdefault(result['status'], []).append(total_ms)
+                if 'error' in result:
+                    errors[result['error']] = errors.get(result['error'], 0) + 1
+                histories.append(pool.submit(state_durations, sfn_client, result))
+            for history in histories:
+                for name, duration in history.result().items():
+                    by_state.setdefault(name, []).append(duration)
+
+    elapsed = time.perf_counter() - started
+    executions = len(futures)
+    return {
+        'executions': executions,
+        'target_rate_per_sec': rate,
+        'achieved_start_rate_per_sec': executions / send_elapsed if send_elapsed > 0 else None,
+        'elapsed_seconds': elapsed,
+        'by_outcome': {status: latency_summary(values) for status, values in by_outcome.items()},
+        'by_state': {name: latency_summary(values) for name, values in by_state.items()},
+        'errors': errors,
+        'tracker_api_calls': tracker.api_calls
+    }
+
+def print_report(report):
+    start_rate = report['achieved_start_rate_per_sec']
+    start_rate = f"{start_rate:.1f}/s" if start_rate is not None else "n/a"
+    print(f"\n📊 {report['executions']} executions in {report['elapsed_seconds']:.1f}s "
+          f"(start rate {start_rate}, target {report['target_rate_per_sec']}/s)")
+    for title, section in (("Outcome", report['by_outcome']), ("State", report['by_state'])):
+        print(f"\n{title:<20} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+        for name, summary in section.items():
+            print(f"{name:<20} {summary['count']:>7} {summary['p50_ms']:>10.2f} "
+                  f"{summary['p95_ms']:>10.2f} {summary['p99_ms']:>10.2f}")
+    if report['errors']:
+        print(f"\nErrors: {report['errors']}")
+
+def main():
+    args = sys.argv[1:]
+    if '--help' in args:
+        print("Usage: python3 load_test.py [--local] [--count N] [--rate N] [--orders orders.jsonl] "
+              "[--latency SECONDS] [--report report.json]")
+        sys.exit(0)
+
+    count = get_option(args, '--count', 500)
+    rate = get_option(args, '--rate', 50.0)
+    if rate <= 0:
+        print(f"❌ --rate must be greater than 0 (got {rate})")
+        sys.exit(1)
+    report_path = get_option(args, '--report', 'load_test_report.json')
+    orders_path = get_option(args, '--orders', '')
+    orders = recorded_orders(orders_path) if orders_path else synthetic_orders(count)
+
+    print("=" * 60)
+    print("🚀 Step Functions Load Test")
+    print("=" * 60)
+
+    if '--local' in args:
+        from local_executor import LOCAL_STATE_MACHINE_ARN, LocalStepFunctionsClient
+        sfn_client = LocalStepFunctionsClient(max_workers=256, latency_seconds=get_option(args, '--latency', 0.0))
+        state_machine_arn = LOCAL_STATE_MACHINE_ARN
+    else:
+        from test_workflow import get_state_machine_arn
+        sfn_client = boto3.client('stepfunctions', region_name='us-east-1')
+        state_machine_arn = get_state_machine_arn()
+    print(f"State Machine ARN: {state_machine_arn}")
+
+    report = run_load_test(sfn_client, state_machine_arn, orders, rate)
+    print_report(report)
+    with open(report_path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"\n📝 Report written to {report_path}")
+
+if __name__ == "__main__":
+    main()
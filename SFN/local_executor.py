@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Local Step Functions Executor
+Runs the order workflow from template.yaml in-process against the handlers in lambda/
+"""
+
+import importlib.util
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+LAB_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(LAB_DIR, 'template.yaml')
+# Modules shared between labs (cfn_template.py, metrics.py); a Lambda zip package carries its own copy
+COMMON_DIR = os.path.join(os.path.dirname(LAB_DIR), 'common')
+sys.path.insert(0, COMMON_DIR)
+from cfn_template import read_template
+
+# Lambda resources in template.yaml and the local handler file that implements each one
+HANDLER_FILES = {
+    'ValidateFunction': os.path.join(LAB_DIR, 'lambda', 'validate.py'),
+    'InventoryFunction': os.path.join(LAB_DIR, 'lambda', 'inventory.py'),
+    'PaymentFunction': os.path.join(LAB_DIR, 'lambda', 'payment.py'),
+}
+
+LOCAL_STATE_MACHINE_ARN = 'arn:aws:states:local:000000000000:stateMachine:OrderProcessingWorkflowCfn'
+
+class ExecutionFailed(Exception):
+    """Raised inside the interpreter when a Fail state or an uncaught error ends the execution"""
+
+    def __init__(self, error, cause):
+        super().__init__(f"{error}: {cause}")
+        self.error = error
+        self.cause = cause
+
+def local_arn(logical_id):
+    return f"arn:local:lambda:{logical_id}"
+
+def load_definition(template_path=TEMPLATE_PATH):
+    """Read the state machine definition from the template, pointing Task resources at local ARNs"""
+    resources = read_template(template_path)['Resources']
+    for resource in resources.values():
+        if resource['Type'] == 'AWS::StepFunctions::StateMachine':
+            definition = resource['Properties']['DefinitionString']
+            if isinstance(definition, dict):
+                definition = definition['Sub']
+            definition = re.sub(r'\$\{(\w+)\.Arn\}', lambda match: local_arn(match.group(1)), definition)
+            return json.loads(definition)
+    raise ValueError(f"No AWS::StepFunctions::StateMachine in {template_path}")
+
+def _silent_print(*args, **kwargs):
+    pass
+
+def load_handlers(handler_files=HANDLER_FILES, quiet=False):
+    """Import each handler module by path (lambda/ is not an importable package name)"""
+    handlers = {}
+    # The handlers import the shared runtime module from their own directory, as they do in Lambda
+    for handler_dir in {os.path.dirname(path) for path in handler_files.values()}:
+        if handler_dir not in sys.path:
+            sys.path.insert(0, handler_dir)
+    for logical_id, path in handler_files.items():
+        spec = importlib.util.spec_from_file_location(f"sfn_{logical_id}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if quiet:
+            # Shadow print in the handler's module only; redirecting sys.stdout is not thread-safe
+            module.print = _silent_print
+        handlers[local_arn(logical_id)] = module.lambda_handler
+    return handlers
+
+def _error_matches(error_equals, error_name):
+    for name in error_equals:
+        if name == 'States.ALL' or name == error_name:
+            return True
+        # Any error raised by the Lambda function itself counts as a task failure
+        if name == 'States.TaskFailed' and not error_name.startswith('States.'):
+            return True
+    return False
+
+def _apply_path(document, path, value):
+    """Apply a ResultPath: "$" replaces the input, "$.a.b" sets a field, None discards the result"""
+    if path is None:
+        return document
+    if path == '$':
+        return value
+    result = dict(document)
+    target = result
+    keys = path[2:].split('.')
+    for key in keys[:-1]:
+        target[key] = dict(target.get(key, {}))
+        target = target[key]
+    target[keys[-1]] = value
+    return result
+
+class LocalExecutor:
+    """
+    In-process interpreter for the workflow's Amazon States Language definition.
+
+    Supports Task (calling the local handlers directly), Retry with
+    IntervalSeconds/MaxAttempts/BackoffRate, Catch, Pass, Succeed and Fail.
+    Retry waits are recorded but not slept unless real_sleep=True, so
+    thousands of executions per second can run on one machine. With
+    quiet=True the handlers' print output is suppressed.
+    """
+
+    def __init__(self, definition=None, handlers=None, real_sleep=False, quiet=True):
+        self.definition = definition or load_definition()
+        self.handlers = handlers or load_handlers(quiet=quiet)
+        self.real_sleep = real_sleep
+
+    def execute_many(self, inputs):
+        """Run many executions back to back"""
+        return [self.execute(input_payload) for input_payload in inputs]
+
+    def execute(self, input_payload):
+        """Run one execution; returns a describe_execution-style dict plus per-state timing"""
+        started = time.perf_counter()
+        states = []
+        result = {'status': 'RUNNING', 'input': json.dumps(input_payload), 'states': states}
+        state_name = self.definition['StartAt']
+        document = input_payload
+        try:
+            while True:
+                state = self.definition['States'][state_name]
+                state_started = time.perf_counter()
+                record = {'name': state_name, 'type': state['Type'], 'attempts': 0, 'retry_wait_seconds': 0.0}
+                states.append(record)
+
+                if state['Type'] == 'Task':
+                    document, next_state = self._run_task(state, document, record)
+                elif state['Type'] == 'Pass':
+                    document = _apply_path(document, state.get('ResultPath', '$'), state.get('Result', document))
+                    next_state = state.get('Next')
+                elif state['Type'] == 'Succeed':
+                    next_state = None
+                elif state['Type'] == 'Fail':
+                    record['duration_ms'] = (time.perf_counter() - state_started) * 1000
+                    raise ExecutionFailed(state.get('Error', 'States.Fail'), state.get('Cause', ''))
+                else:
+                    raise ExecutionFailed('States.Runtime', f"Unsupported state type: {state['Type']}")
+
+                record['duration_ms'] = (time.perf_counter() - state_started) * 1000
+                if next_state is None or state.get('End'):
+                    break
+                state_name = next_state
+
+            result['status'] = 'SUCCEEDED'
+            result['output'] = json.dumps(document)
+        except ExecutionFailed as e:
+            result['status'] = 'FAILED'
+            result['error'] = e.error
+            result['cause'] = e.cause
+        result['duration_ms'] = (time.perf_counter() - started) * 1000
+        return result
+
+    def _run_task(self, state, document, record):
+        """Invoke a Task with its Retry policy; returns (new document, next state name)"""
+        handler = self.handlers[state['Resource']]
+        attempts_by_retrier = {}
+        while True:
+            record['attempts'] += 1
+            try:
+                output = handler(document, None)
+                return _apply_path(document, state.get('ResultPath', '$'), output), state.get('Next')
+            except Exception as e:
+                error_name, cause = type(e).__name__, str(e)
+
+            retrier = next((r for r in state.get('Retry', []) if _error_matches(r['ErrorEquals'], error_name)), None)
+            if retrier is not None:
+                attempt = attempts_by_retrier.get(id(retrier), 0)
+                if attempt < retrier.get('MaxAttempts', 3):
+                    attempts_by_retrier[id(retrier)] = attempt + 1
+                    wait = retrier.get('IntervalSeconds', 1) * retrier.get('BackoffRate', 2.0) ** attempt
+                    record['retry_wait_seconds'] += wait
+                    if self.real_sleep:
+                        time.sleep(wait)
+                    continue
+
+            record['error'] = error_name
+            catcher = next((c for c in state.get('Catch', []) if _error_matches(c['ErrorEquals'], error_name)), None)
+            if catcher is None:
+                raise ExecutionFailed(error_name, cause)
+            error_output = {'Error': error_name, 'Cause': cause}
+            return _apply_path(document, catcher.get('ResultPath', '$'), error_output), catcher['Next']
+
+class LocalStepFunctionsClient:
+    """
+    Stand-in for boto3.client('stepfunctions') backed by LocalExecutor.
+
+    start_execution runs the workflow on a thread pool, optionally after a
+    simulated latency (jittered +/-50%), and describe_execution and
+    list_executions report on it, so code written against the real API
+    (such as ExecutionTracker) runs without AWS.
+    """
+
+    def __init__(self, executor=None, max_workers=32, latency_seconds=0.0,
+                 state_machine_arn=LOCAL_STATE_MACHINE_ARN):
+        self.executor = executor or LocalExecutor()
+        self.latency_seconds = latency_seconds
+        self.state_machine_arn = state_machine_arn
+        self._executions = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def start_execution(self, stateMachineArn, input='{}', name=None):
+        name = name or str(uuid.uuid4())
+        execution_arn = stateMachineArn.replace(':stateMachine:', ':execution:') + f":{name}"
+        execution = {
+            'executionArn': execution_arn,
+            'stateMachineArn': stateMachineArn,
+            'name': name,
+            'status': 'RUNNING',
+            'startDate': datetime.now(timezone.utc),
+            'input': input
+        }
+        with self._lock:
+            self._executions[execution_arn] = execution
+        self._pool.submit(self._run, execution)
+        return {'executionArn': execution_arn, 'startDate': execution['startDate']}
+
+    def _run(self, execution):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds * random.uniform(0.5, 1.5))
+        result = self.executor.execute(json.loads(execution['input']))
+        with self._lock:
+            execution.update({key: value for key, value in result.items() if key in ('output', 'error', 'cause', 'states')})
+            execution['stopDate'] = datetime.now(timezone.utc)
+            execution['status'] = result['status']
+
+    def describe_execution(self, executionArn):
+        with self._lock:
+            return dict(self._executions[executionArn])
+
+    def list_executions(self, stateMachineArn, statusFilter=None, maxResults=100, nextToken=None):
+        with self._lock:
+            matching = [{'executionArn': e['executionArn'], 'status': e['status'], 'startDate': e['startDate']}
+                        for e in self._executions.values()
+                        if e['stateMachineArn'] == stateMachineArn and (statusFilter is None or e['status'] == statusFilter)]
+        start = int(nextToken or 0)
+        response = {'executions': matching[start:start + maxResults]}
+        if start + maxResults < len(matching):
+            response['nextToken'] = str(start + maxResults)
+        return response
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+def timing_by_state(results):
+    """Average duration and attempts per state over many executions"""
+    totals = {}
+    for result in results:
+        for state in result['states']:
+            entry = totals.setdefault(state['name'], {'count': 0, 'total_ms': 0.0, 'attempts': 0})
+            entry['count'] += 1
+            entry['total_ms'] += state.get('duration_ms', 0.0)
+            entry['attempts'] += state['attempts']
+    return {name: {'executions': entry['count'],
+                   'avg_ms': entry['total_ms'] / entry['count'],
+                   'avg_attempts': entry['attempts'] / entry['count']}
+            for name, entry in totals.items()}
+
+def main():
+    executions = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    executor = LocalExecutor()
+
+    print("=" * 60)
+    print("🧪 Local Step Functions Executor")
+    print("=" * 60)
+
+    for name, payload in [("Valid Order", {"order_id": "ord-123", "customer_id": "cust-999", "amount": 150}),
+                          ("Invalid Order (Expect Fail)", {"order_id": "ord-bad", "customer_id": "cust-999"})]:
+        result = executor.execute(payload)
+        print(f"\n--- {name} ---")
+        print(f"Final Status: {result['status']}")
+        if 'output' in result:
+            print(f"Output: {result['output']}")
+        else:
+            print(f"Error: {result['error']}")
+            print(f"Cause: {result['cause']}")
+        print("States: " + " -> ".join(f"{s['name']} ({s['attempts']} attempt(s))" if s['attempts'] else s['name']
+                                        for s in result['states']))
+
+    inputs = [{"order_id": f"ord-{i}", "customer_id": "cust-999", "amount": (i % 500) + 1} for i in range(executions)]
+    started = time.perf_counter()
+    results = executor.execute_many(inputs)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n📊 {executions} executions in {elapsed:.2f}s ({executions / elapsed:.0f} executions/sec)")
+    for name, timing in timing_by_state(results).items():
+        print(f"   {name}: avg {timing['avg_ms'] * 1000:.1f} µs, {timing['avg_attempts']:.2f} attempts")
+
+if __name__ == "__main__":
+    main()
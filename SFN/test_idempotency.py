@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Payment Idempotency Test
+Replays the same payments concurrently from many threads and several processes and checks nothing is charged twice
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+LAB_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(LAB_DIR), 'common'))
+sys.path.insert(0, os.path.join(LAB_DIR, 'lambda'))
+
+def load_payment(db_path):
+    """Import payment.py with its idempotency store pointed at db_path and count real charges"""
+    os.environ['IDEMPOTENCY_DB'] = db_path
+    import payment
+
+    charges = []
+    charge_lock = threading.Lock()
+    original_charge = payment.charge
+
+    def counting_charge(order_id, customer_id, amount):
+        time.sleep(0.002)  # Widen the race window between duplicates
+        with charge_lock:
+            charges.append(order_id)
+        return original_charge(order_id, customer_id, amount)
+
+    payment.charge = counting_charge
+    return payment, charges
+
+def replay_payments(payment, orders, duplicates, threads):
+    """Submit every order `duplicates` times from a thread pool; returns {order_id: set of transaction IDs}"""
+    from idempotency import IdempotencyInProgressError
+
+    def pay(order):
+        # Another process holds the key: retry like a Step Functions Retry would
+        while True:
+            try:
+                return payment.lambda_handler(dict(order), None)
+            except IdempotencyInProgressError:
+                time.sleep(0.005)
+
+    transactions = {}
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for result in pool.map(pay, [order for order in orders for _ in range(duplicates)]):
+            transactions.setdefault(result['order_id'], set()).add(result['transaction_id'])
+    return transactions
+
+def worker(db_path, orders, duplicates, threads):
+    """One process: replay the payments and report what it charged and what it returned"""
+    payment, charges = load_payment(db_path)
+    transactions = replay_payments(payment, orders, duplicates, threads)
+    return charges, transactions
+
+def check_payload_mismatch(db_path, order):
+    """Reusing a payment's key with a different customer and amount must fail, not replay"""
+    from idempotency import IdempotencyKeyMismatchError
+
+    payment, _ = load_payment(db_path)
+    tampered = dict(order, customer_id="cust-other", amount=99999)
+    try:
+        payment.lambda_handler(tampered, None)
+    except IdempotencyKeyMismatchError:
+        return True
+    return False
+
+def main():
+    order_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    duplicates = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    threads = 16
+    orders = [{"order_id": f"ord-{i:05d}", "customer_id": "cust-999", "amount": i + 1} for i in range(order_count)]
+
+    print("=" * 60)
+    print("🔁 Payment Idempotency Test")
+    print("=" * 60)
+    print(f"{order_count} payments x {duplicates} duplicates, {processes} processes x {threads} threads")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'idempotency.db')
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(worker, db_path, orders, duplicates, threads) for _ in range(processes)]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+        mismatch_rejected = check_payload_mismatch(db_path, orders[0])
+
+    charges = [order_id for process_charges, _ in results for order_id in process_charges]
+    transactions = {}
+    for _, process_transactions in results:
+        for order_id, transaction_ids in process_transactions.items():
+            transactions.setdefault(order_id, set()).update(transaction_ids)
+
+    double_charged = len(charges) - len(set(charges))
+    inconsistent = [order_id for order_id, transaction_ids in transactions.items() if len(transaction_ids) != 1]
+    calls = order_count * duplicates * processes
+    print(f"\n📊 {calls} handler calls in {elapsed:.2f}s, {len(charges)} charges")
+
+    passed = len(set(charges)) == order_count and not double_charged and not inconsistent
+    if passed:
+        print("✅ PASS: every payment charged exactly once and every duplicate got the same transaction ID")
+    else:
+        print(f"❌ FAIL: {double_charged} double charges, {order_count - len(set(charges))} missing, "
+              f"{len(inconsistent)} orders with differing transaction IDs")
+    if mismatch_rejected:
+        print("✅ PASS: a replayed key with a different payload is rejected")
+    else:
+        print("❌ FAIL: a replayed key with a different payload returned the cached payment")
+    passed = passed and mismatch_rejected
+    sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
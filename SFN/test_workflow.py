@@ -1,8 +1,9 @@
 import boto3
 import json
-import time
-
 import sys
+from concurrent.futures import as_completed
+
+from execution_tracker import ExecutionTracker
 
 def get_state_machine_arn():
     cf_client = boto3.client('cloudformation', region_name='us-east-1')
@@ -18,55 +19,65 @@ def get_state_machine_arn():
         print(f"Error getting CloudFormation output: {e}")
         sys.exit(1)
 
-def run_test(sfn_client, state_machine_arn, input_payload, test_name):
-    print(f"\n--- Starting Test: {test_name} ---")
-    print(f"Input: {json.dumps(input_payload, indent=2)}")
-    
-    response = sfn_client.start_execution(
-        stateMachineArn=state_machine_arn,
-        input=json.dumps(input_payload)
-    )
-    
-    execution_arn = response['executionArn']
-    print(f"Execution started: {execution_arn}")
-    
-    # Poll for completion
-    while True:
-        status_response = sfn_client.describe_execution(executionArn=execution_arn)
-        status = status_response['status']
-        print(f"Status: {status}")
-        
-        if status in ['SUCCEEDED', 'FAILED', 'TIMED_OUT', 'ABORTED']:
-            break
-        time.sleep(2)
-        
+def print_result(test_name, status_response):
+    print(f"\n--- Finished Test: {test_name} ---")
+    status = status_response['status']
     print(f"Final Status: {status}")
     if 'output' in status_response:
         print(f"Output: {status_response['output']}")
     elif 'error' in status_response: # For failed executions
          print(f"Error: {status_response.get('error')}")
          print(f"Cause: {status_response.get('cause')}")
+    for state in status_response.get('states', []):  # Per-state timing (local executions only)
+        print(f"  {state['name']}: {state['duration_ms']:.3f} ms, attempts: {state['attempts']}")
+
+def run_tests(sfn_client, state_machine_arn, tests):
+    """Start every test execution at once and report each one as soon as it finishes"""
+    with ExecutionTracker(sfn_client) as tracker:
+        futures = {}
+        for test_name, input_payload in tests:
+            print(f"\n--- Starting Test: {test_name} ---")
+            print(f"Input: {json.dumps(input_payload, indent=2)}")
+            response = sfn_client.start_execution(
+                stateMachineArn=state_machine_arn,
+                input=json.dumps(input_payload)
+            )
+            print(f"Execution started: {response['executionArn']}")
+            futures[tracker.track(response['executionArn'])] = test_name
+        
+        for future in as_completed(futures):
+            print_result(futures[future], future.result())
+
+def run_test(sfn_client, state_machine_arn, input_payload, test_name):
+    run_tests(sfn_client, state_machine_arn, [(test_name, input_payload)])
 
 def main():
+    tests = [
+        # Test 1: Valid Order
+        ("Valid Order", {
+            "order_id": "ord-123",
+            "customer_id": "cust-999",
+            "amount": 150
+        }),
+        # Test 2: Invalid Order (Missing Amount)
+        ("Invalid Order (Expect Fail)", {
+            "order_id": "ord-bad",
+            "customer_id": "cust-999"
+        }),
+    ]
+    
+    if '--local' in sys.argv[1:]:
+        from local_executor import LOCAL_STATE_MACHINE_ARN, LocalStepFunctionsClient
+        sfn_client = LocalStepFunctionsClient()
+        run_tests(sfn_client, LOCAL_STATE_MACHINE_ARN, tests)
+        sfn_client.shutdown()
+        return
+    
     state_machine_arn = get_state_machine_arn()
     print(f"State Machine ARN: {state_machine_arn}")
     
     sfn_client = boto3.client('stepfunctions', region_name='us-east-1')
-    
-    # Test 1: Valid Order
-    valid_order = {
-        "order_id": "ord-123",
-        "customer_id": "cust-999",
-        "amount": 150
-    }
-    run_test(sfn_client, state_machine_arn, valid_order, "Valid Order")
-    
-    # Test 2: Invalid Order (Missing Amount)
-    invalid_order = {
-        "order_id": "ord-bad",
-        "customer_id": "cust-999"
-    }
-    run_test(sfn_client, state_machine_arn, invalid_order, "Invalid Order (Expect Fail)")
+    run_tests(sfn_client, state_machine_arn, tests)
 
 if __name__ == "__main__":
     main()
@@ -1,30 +1,182 @@
+import contextlib
 import json
 import logging
+import os
+import time
+from array import array
+from datetime import datetime
+
+from streaming_aggregator import StreamingAggregator
+
+try:
+    import metrics
+    from metrics import incr, span
+except ImportError:  # common/metrics.py was not packaged with the function; the hooks are then no-ops
+    metrics = None
+
+    def incr(name, value=1, **tags):
+        pass
+
+    def span(name, **tags):
+        return contextlib.nullcontext()
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the array-backed path is used without it
+    np = None
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# "batch" decodes and aggregates all records at once; "record" logs each record as before
+PROCESSING_MODE = os.environ.get('PROCESSING_MODE', 'batch')
+WINDOW_SECONDS = int(os.environ.get('WINDOW_SECONDS', '60'))
+# Streaming state survives warm invocations in memory and cold starts through the checkpoint file.
+# Writing the checkpoint costs more than aggregating a small batch, so it is written at most once
+# per interval; a recycled container loses whatever was aggregated since the last checkpoint
+# (0 checkpoints at the end of every invocation)
+CHECKPOINT_PATH = os.environ.get('CHECKPOINT_PATH', '/tmp/analytics_state.json')
+CHECKPOINT_INTERVAL_SECONDS = float(os.environ.get('CHECKPOINT_INTERVAL_SECONDS', '30'))
+_aggregator = None
+_last_checkpoint = 0.0
+
+def get_aggregator():
+    """Return the module-level streaming aggregator, restoring the checkpoint on a cold start"""
+    global _aggregator
+    if _aggregator is None:
+        _aggregator = StreamingAggregator.load(CHECKPOINT_PATH, window_seconds=WINDOW_SECONDS)
+    return _aggregator
+
 def lambda_handler(event, context):
     """
     Lambda function to process analytics messages from SNS
     """
-    logger.info(f"Received event: {json.dumps(event)}")
-    
+    incr('sns.analytics_records', len(event.get('Records', [])), mode=PROCESSING_MODE)
+    with span('sns.analytics', mode=PROCESSING_MODE):
+        if PROCESSING_MODE == 'record':
+            process_records(event)
+            summary = None
+        else:
+            summary = process_batch(event)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps('Analytics processing completed successfully'),
+        'summary': summary
+    }
+
+def process_records(event):
+    """Per-record path: parse and log every record individually (QUIET=true skips the logging)"""
+    quiet = metrics.QUIET if metrics is not None else os.environ.get('QUIET', 'false').lower() == 'true'
+    if not quiet:
+        logger.info(f"Received event: {json.dumps(event)}")
+
     # Process SNS records
     for record in event.get('Records', []):
         if record.get('EventSource') == 'aws:sns':
             sns_message = json.loads(record['Sns']['Message'])
-            logger.info(f"Processing analytics message: {sns_message}")
-            
+
             # Simulate analytics processing
             order_id = sns_message.get('order_id', 'N/A')
             customer_id = sns_message.get('customer_id', 'N/A')
             order_value = sns_message.get('order_value', 0)
-            
-            logger.info(f"Analytics processed - Order ID: {order_id}, Customer: {customer_id}, Value: ${order_value}")
-    
+
+            if not quiet:
+                logger.info(f"Processing analytics message: {sns_message}")
+                logger.info(f"Analytics processed - Order ID: {order_id}, Customer: {customer_id}, "
+                            f"Value: ${order_value}")
+
+def _epoch_seconds(timestamp):
+    """Parse an ISO-8601 timestamp (with or without a trailing Z) into epoch seconds"""
+    if not timestamp:
+        return 0.0
+    if timestamp.endswith('Z'):
+        timestamp = timestamp[:-1] + '+00:00'
+    return datetime.fromisoformat(timestamp).timestamp()
+
+def decode_records(event):
+    """
+    Decode every SNS record of an event into columns.
+
+    Each message is parsed on its own, so a malformed message (not JSON,
+    not an object, or a non-numeric order_value) is skipped and counted
+    in 'rejected' instead of failing the batch or shifting the columns.
+    """
+    columns = {'customer_id': [], 'order_value': array('d'), 'timestamp': array('d'), 'rejected': 0}
+    for record in event.get('Records', []):
+        if record.get('EventSource') != 'aws:sns':
+            continue
+        sns = record['Sns']
+        try:
+            message = json.loads(sns['Message'])
+            if not isinstance(message, dict):
+                raise ValueError(f"expected a JSON object, got {type(message).__name__}")
+            order_value = float(message.get('order_value', 0))
+            timestamp = _epoch_seconds(message.get('timestamp') or sns.get('Timestamp'))
+        except (TypeError, ValueError) as e:
+            columns['rejected'] += 1
+            logger.warning(f"Skipping malformed analytics message {sns.get('MessageId', 'N/A')}: {e}")
+            continue
+        columns['customer_id'].append(message.get('customer_id', 'N/A'))
+        columns['order_value'].append(order_value)
+        columns['timestamp'].append(timestamp)
+    return columns
+
+def _group_totals(keys, values):
+    """Return {key: (count, total, max)} for parallel key/value columns"""
+    if np is not None:
+        unique, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        values = np.frombuffer(values, dtype=np.float64)
+        counts = np.bincount(inverse, minlength=len(unique))
+        totals = np.bincount(inverse, weights=values, minlength=len(unique))
+        maxima = np.full(len(unique), -np.inf)
+        np.maximum.at(maxima, inverse, values)
+        return {key.item(): (int(count), float(total), float(maximum))
+                for key, count, total, maximum in zip(unique, counts, totals, maxima)}
+
+    groups = {}
+    for key, value in zip(keys, values):
+        count, total, maximum = groups.get(key, (0, 0.0, value))
+        groups[key] = (count + 1, total + value, max(maximum, value))
+    return groups
+
+def aggregate(columns, window_seconds=WINDOW_SECONDS):
+    """Compute the invocation summary: totals, per-customer and per-window aggregates"""
+    values = columns['order_value']
+    if not values:
+        return {'orders': 0, 'total_value': 0.0, 'customers': {}, 'windows': {}}
+    windows = [int(ts // window_seconds) * window_seconds for ts in columns['timestamp']]
+
+    def as_summary(groups):
+        return {str(key): {'orders': count, 'total_value': round(total, 2), 'max_value': maximum}
+                for key, (count, total, maximum) in groups.items()}
+
     return {
-        'statusCode': 200,
-        'body': json.dumps('Analytics processing completed successfully')
+        'orders': len(values),
+        'total_value': round(sum(values), 2),
+        'customers': as_summary(_group_totals(columns['customer_id'], values)),
+        'windows': as_summary(_group_totals(windows, values))
     }
 
+def process_batch(event):
+    """
+    Batch path: decode all records at once, update the streaming state and log one summary record.
+
+    The `state` snapshot (totals and latest window) is only built on the
+    invocations that write a checkpoint, so dashboards get it once per
+    CHECKPOINT_INTERVAL_SECONDS; get_aggregator().snapshot() reads it on demand.
+    """
+    columns = decode_records(event)
+    summary = aggregate(columns)
+    summary['rejected'] = columns['rejected']
+
+    global _last_checkpoint
+    aggregator = get_aggregator()
+    aggregator.add_columns(columns)
+    if time.monotonic() - _last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS:
+        aggregator.save(CHECKPOINT_PATH)
+        _last_checkpoint = time.monotonic()
+        summary['state'] = aggregator.snapshot()
+
+    logger.info(json.dumps({'analytics_summary': summary}))
+    return summary
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Analytics Processor Benchmark
+Compares the per-record and batch paths of analytics_processor.py
+"""
+
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+# A fresh checkpoint per run, so no state carries over from earlier runs or a local test invocation
+_state_dir = tempfile.TemporaryDirectory()
+os.environ['CHECKPOINT_PATH'] = os.path.join(_state_dir.name, 'analytics_state.json')
+import analytics_processor
+
+def build_event(record_count):
+    """Build an SNS event shaped like the ones Lambda receives"""
+    records = []
+    for i in range(record_count):
+        message = {
+            "order_id": f"ORD-{i:06d}",
+            "customer_id": f"CUST-{random.randint(1, 50):03d}",
+            "order_value": round(random.uniform(5, 500), 2),
+            "timestamp": f"2024-01-15T10:{random.randint(0, 59):02d}:00Z",
+            "message": "Analytics data for processing"
+        }
+        records.append({
+            "EventSource": "aws:sns",
+            "Sns": {
+                "Message": json.dumps(message),
+                "Timestamp": "2024-01-15T10:30:00.000Z",
+                "MessageAttributes": {"message_type": {"Type": "String", "Value": "analytics"}}
+            }
+        })
+    return {"Records": records}
+
+def time_path(path, event, repeats):
+    """Average seconds per invocation of one processing path"""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        path(event)
+    return (time.perf_counter() - started) / repeats
+
+def main():
+    # Send log output to memory, like the Lambda runtime's log handler, so formatting cost is included
+    sink = io.StringIO()
+    logging.getLogger().addHandler(logging.StreamHandler(sink))
+
+    print("=" * 60)
+    print("⏱️  Analytics Processor Benchmark")
+    print(f"   NumPy: {'enabled' if analytics_processor.np is not None else 'not installed (array fallback)'}")
+    print("=" * 60)
+    print(f"\n{'Records':>8} {'Per-record (ms)':>16} {'Batch (ms)':>12} {'Speedup':>9}")
+
+    for record_count in (10, 100, 1000):
+        event = build_event(record_count)
+        repeats = max(5, 2000 // record_count)
+        per_record = time_path(analytics_processor.process_records, event, repeats)
+        batch = time_path(analytics_processor.process_batch, event, repeats)
+        sink.seek(0)
+        sink.truncate()
+        print(f"{record_count:>8} {per_record * 1000:>16.3f} {batch * 1000:>12.3f} {per_record / batch:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
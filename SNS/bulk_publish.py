@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+SNS Bulk Publisher
+Streams events to the topic with PublishBatch, several batches in flight at once
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from aws_async import AsyncTransport
+from claim_check import ClaimCheck, LocalObjectStore
+from cli import get_option
+from metrics import configure_from_args, incr, span
+
+TOPIC_NAME = 'ecommerce-order-notifications'
+MAX_BATCH_ENTRIES = 10           # PublishBatch accepts at most 10 entries
+MAX_BATCH_BYTES = 256 * 1024     # ...and at most 256 KB in total (also the limit for a single message)
+MESSAGE_TYPES = ["order_confirmation", "order_tracking", "warehouse_processing", "analytics"]
+
+async def get_topic_arn_async(transport):
+    """Get the SNS topic ARN over the asyncio transport"""
+    response = await transport.call('sns', 'list_topics')
+    for topic in response['Topics']:
+        if TOPIC_NAME in topic['TopicArn']:
+            return topic['TopicArn']
+    print("Error finding topic: Topic not found")
+    sys.exit(1)
+
+def build_entry(entry_id, message_type, message_body, claim_check=None):
+    """Build a PublishBatch entry carrying the message_type filter attribute"""
+    message = json.dumps(message_body)
+    message_attributes = {
+        'message_type': {
+            'DataType': 'String',
+            'StringValue': message_type
+        }
+    }
+    if claim_check:
+        message, message_attributes = claim_check.offload(message, message_attributes)
+    return {
+        'Id': entry_id,
+        'Message': message,
+        'Subject': f"Order Notification: {message_type}",
+        'MessageAttributes': message_attributes
+    }
+
+def entry_size(entry):
+    """Size of an entry as SNS counts it (message plus attributes)"""
+    size = len(entry['Message'].encode('utf-8'))
+    for name, attribute in entry['MessageAttributes'].items():
+        size += len(name) + len(attribute['DataType']) + len(attribute['StringValue'].encode('utf-8'))
+    return size
+
+def read_jsonl(path):
+    """Yield (message_type, body) pairs from a JSONL file, one event per line"""
+    with open(path) as events:
+        for line in events:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            message_type = event.pop('message_type')
+            yield message_type, event
+
+def synthetic_events(count):
+    """Yield `count` random order events spread across the four message types"""
+    for i in range(count):
+        message_type = MESSAGE_TYPES[i % len(MESSAGE_TYPES)]
+        yield message_type, {
+            "order_id": f"ORD-{i:08d}",
+            "customer_id": f"CUST-{random.randint(1, 5000):05d}",
+            "order_value": round(random.uniform(5, 500), 2),
+            "message": f"Synthetic {message_type} event"
+        }
+
+def batched(events, claim_check=None, rejected=None):
+    """
+    Group a stream of (message_type, body) pairs into PublishBatch entry lists.
+
+    An entry over the 256 KB limit can never be published, so it is not
+    batched: it is appended to `rejected` as a failure, or raises
+    ValueError when no list is given.
+    """
+    batch = []
+    batch_bytes = 0
+    for message_type, message_body in events:
+        entry = build_entry(str(len(batch)), message_type, message_body, claim_check)
+        size = entry_size(entry)
+        if size > MAX_BATCH_BYTES:
+            error = f"Message of {size} bytes exceeds the {MAX_BATCH_BYTES} byte SNS limit (use --claim-check)"
+            if rejected is None:
+                raise ValueError(error)
+            rejected.append({'Entry': entry, 'Error': {'Code': 'MessageTooLarge', 'Message': error,
+                                                       'SenderFault': True}})
+            incr('sns.batch_entry_failures')
+            continue
+        if batch and (len(batch) == MAX_BATCH_ENTRIES or batch_bytes + size > MAX_BATCH_BYTES):
+            yield batch
+            batch = []
+            batch_bytes = 0
+            entry['Id'] = '0'
+        batch.append(entry)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+class BulkPublisher:
+    """
+    Publishes a stream of events with PublishBatch.
+
+    Up to `concurrency` batches are in flight at once; the event stream is
+    only read as fast as batches complete, so a generator or a large JSONL
+    file is never loaded into memory. Entries returned in Failed[] are
+    retried with backoff unless SNS reports a SenderFault. With a
+    claim_check, events too large to batch are offloaded to the object store;
+    without one they are recorded as failed and never sent.
+    """
+
+    def __init__(self, transport, topic_arn, concurrency=8, max_retries=3, backoff_seconds=0.1, claim_check=None):
+        self.transport = transport
+        self.topic_arn = topic_arn
+        self.claim_check = claim_check
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.published = 0
+        self.failed = []
+        self.api_calls = 0
+        self.elapsed = 0.0
+
+    async def publish_stream(self, events):
+        """Publish every event from an iterable of (message_type, body) pairs"""
+        started = time.perf_counter()
+        batches = batched(events, self.claim_check, rejected=self.failed)
+
+        async def worker():
+            for batch in batches:
+                await self._publish_batch(batch)
+
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+        self.elapsed = time.perf_counter() - started
+        return self.published
+
+    async def _publish_batch(self, entries):
+        attempt = 0
+        while entries:
+            self.api_calls += 1
+            try:
+                with span('sns.publish_batch'):
+                    response = await self.transport.publish_batch(self.topic_arn, entries)
+            except Exception as e:
+                response = {'Failed': [{'Id': entry['Id'], 'SenderFault': False, 'Code': type(e).__name__,
+                                        'Message': str(e)} for entry in entries]}
+            self.published += len(response.get('Successful', []))
+            incr('sns.batch_messages_published', len(response.get('Successful', [])))
+            incr('sns.batch_entry_failures', len(response.get('Failed', [])))
+
+            by_id = {entry['Id']: entry for entry in entries}
+            retry = []
+            for failure in response.get('Failed', []):
+                entry = by_id[failure['Id']]
+                if failure.get('SenderFault') or attempt >= self.max_retries:
+                    self.failed.append({'Entry': entry, 'Error': failure})
+                else:
+                    retry.append(entry)
+
+            entries = retry
+            if entries:
+                await asyncio.sleep(self.backoff_seconds * (2 ** attempt))
+                attempt += 1
+
+    def report(self):
+        """Print publish statistics"""
+        rate = self.published / self.elapsed if self.elapsed > 0 else 0.0
+        print(f"📊 Published {self.published} messages ({len(self.failed)} failed) "
+              f"in {self.api_calls} PublishBatch calls")
+        print(f"   Elapsed: {self.elapsed:.2f}s, throughput: {rate:.1f} msgs/sec")
+        for failure in self.failed[:5]:
+            print(f"   ❌ {failure['Error'].get('Code')}: {failure['Error'].get('Message')}")
+
+async def run(events, concurrency, claim_check=None):
+    async with AsyncTransport(max_connections=concurrency) as transport:
+        topic_arn = await get_topic_arn_async(transport)
+        print(f"\n📢 SNS Topic ARN: {topic_arn}\n")
+        publisher = BulkPublisher(transport, topic_arn, concurrency=concurrency, claim_check=claim_check)
+        await publisher.publish_stream(events)
+        publisher.report()
+        return publisher
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python bulk_publish.py <events.jsonl | --synthetic N> [--concurrency N] [--claim-check DIR] "
+              "[--metrics emf|statsd|prometheus]")
+        print("Each JSONL line is an event object with a message_type field, e.g.")
+        print('  {"message_type": "analytics", "order_id": "ORD-1", "customer_id": "CUST-001", "order_value": 99.99}')
+        sys.exit(1)
+
+    args = sys.argv[1:]
+    concurrency = get_option(args, '--concurrency', 8)
+    claim_check_dir = get_option(args, '--claim-check', '')
+    claim_check = ClaimCheck(LocalObjectStore(claim_check_dir)) if claim_check_dir else None
+    configure_from_args(args)
+    if args[0] == '--synthetic':
+        events = synthetic_events(get_option(args, '--synthetic', 0))
+    else:
+        events = read_jsonl(args[0])
+
+    print("=" * 60)
+    print("🚀 SNS Bulk Publisher")
+    print("=" * 60)
+    publisher = asyncio.run(run(events, concurrency, claim_check))
+    print("\n" + "=" * 60)
+    print("✅ Bulk publish complete!" if not publisher.failed else "⚠️  Bulk publish finished with failures")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+SNS Filter Policy Evaluator
+Routes events to subscriptions locally, using the FilterPolicy definitions in template.yaml
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from cfn_template import read_template
+
+class FilterPolicyError(Exception):
+    pass
+
+def load_template_subscriptions(template_path):
+    """Return {logical_id: subscription properties} for every AWS::SNS::Subscription"""
+    resources = read_template(template_path)['Resources']
+    return {name: resource['Properties'] for name, resource in resources.items()
+            if resource['Type'] == 'AWS::SNS::Subscription'}
+
+def _attribute_values(attribute):
+    """Values of one message attribute, as a list (String.Array expands to its elements)"""
+    if not isinstance(attribute, dict):
+        return attribute if isinstance(attribute, list) else [attribute]
+    data_type = attribute.get('DataType', 'String')
+    value = attribute.get('StringValue')
+    if data_type == 'String.Array':
+        return json.loads(value)
+    if data_type.startswith('Number'):
+        return [float(value)]
+    return [value]
+
+def _as_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _compile_numeric(spec):
+    if not isinstance(spec, list) or len(spec) not in (2, 4):
+        raise FilterPolicyError(f"Invalid numeric condition: {spec}")
+    checks = []
+    for operator, bound in zip(spec[0::2], spec[1::2]):
+        bound = float(bound)
+        if operator == '=':
+            checks.append(lambda v, b=bound: v == b)
+        elif operator == '<':
+            checks.append(lambda v, b=bound: v < b)
+        elif operator == '<=':
+            checks.append(lambda v, b=bound: v <= b)
+        elif operator == '>':
+            checks.append(lambda v, b=bound: v > b)
+        elif operator == '>=':
+            checks.append(lambda v, b=bound: v >= b)
+        else:
+            raise FilterPolicyError(f"Unknown numeric operator: {operator}")
+
+    def numeric(value):
+        number = _as_number(value)
+        return number is not None and all(check(number) for check in checks)
+    return numeric
+
+def _compile_anything_but(spec):
+    if isinstance(spec, dict):
+        if set(spec) != {'prefix'}:
+            raise FilterPolicyError(f"Invalid anything-but condition: {spec}")
+        prefix = spec['prefix']
+        return lambda value: isinstance(value, str) and not value.startswith(prefix)
+    excluded = spec if isinstance(spec, list) else [spec]
+    strings = {item for item in excluded if isinstance(item, str)}
+    numbers = {float(item) for item in excluded if not isinstance(item, str)}
+
+    def anything_but(value):
+        if isinstance(value, str):
+            return value not in strings
+        return _as_number(value) not in numbers
+    return anything_but
+
+def _compile_condition(condition):
+    """Compile one entry of a key's condition list into a predicate on a single value"""
+    if isinstance(condition, str):
+        return lambda value: value == condition
+    if isinstance(condition, bool) or condition is None:
+        raise FilterPolicyError(f"Invalid condition: {condition}")
+    if isinstance(condition, (int, float)):
+        number = float(condition)
+        return lambda value: _as_number(value) == number
+    if not isinstance(condition, dict) or len(condition) != 1:
+        raise FilterPolicyError(f"Invalid condition: {condition}")
+
+    operator, spec = next(iter(condition.items()))
+    if operator == 'prefix':
+        return lambda value: isinstance(value, str) and value.startswith(spec)
+    if operator == 'suffix':
+        return lambda value: isinstance(value, str) and value.endswith(spec)
+    if operator == 'equals-ignore-case':
+        lowered = spec.lower()
+        return lambda value: isinstance(value, str) and value.lower() == lowered
+    if operator == 'numeric':
+        return _compile_numeric(spec)
+    if operator == 'anything-but':
+        return _compile_anything_but(spec)
+    raise FilterPolicyError(f"Unknown filter operator: {operator}")
+
+def compile_policy(policy):
+    """
+    Compile a filter policy into a list of (key, predicate, exists) checks.
+
+    exists is True/False for an `exists` condition and None otherwise.
+    """
+    checks = []
+    for key, conditions in policy.items():
+        if not isinstance(conditions, list) or not conditions:
+            raise FilterPolicyError(f"Conditions for '{key}' must be a non-empty list")
+        exists = [c['exists'] for c in conditions if isinstance(c, dict) and set(c) == {'exists'}]
+        predicates = [_compile_condition(c) for c in conditions if not (isinstance(c, dict) and set(c) == {'exists'})]
+        if exists and predicates:
+            raise FilterPolicyError(f"'exists' cannot be combined with other conditions for '{key}'")
+        if exists:
+            checks.append((key, None, bool(exists[0])))
+        elif len(predicates) == 1:
+            checks.append((key, predicates[0], None))
+        else:
+            checks.append((key, lambda value, p=tuple(predicates): any(check(value) for check in p), None))
+    return checks
+
+def _exact_values(conditions):
+    """The exact string values of a condition list, or None if it has any other kind of condition"""
+    if all(isinstance(c, str) for c in conditions):
+        return conditions
+    return None
+
+class FilterPolicyIndex:
+    """
+    Matches message attributes against many subscription filter policies.
+
+    Each subscription is indexed under one of its keys whose conditions are
+    all exact strings (message_type in this lab), so matching only looks at
+    subscriptions whose anchor value is present in the message; the rest of
+    their policy is then checked with the compiled predicates. Subscriptions
+    without an exact-match key are checked on every message.
+    """
+
+    def __init__(self):
+        self.subscriptions = {}
+        self._index = {}
+        self._scan = []
+
+    def add(self, name, policy):
+        """Register a subscription; a missing or empty policy matches every message"""
+        policy = policy or {}
+        checks = compile_policy(policy)
+        self.subscriptions[name] = (policy, checks)
+        for key, conditions in policy.items():
+            values = _exact_values(conditions)
+            if values:
+                for value in values:
+                    self._index.setdefault(key, {}).setdefault(value, []).append(name)
+                return
+        self._scan.append(name)
+
+    @classmethod
+    def from_template(cls, template_path):
+        """Build an index from the subscriptions defined in a CloudFormation template"""
+        index = cls()
+        for name, properties in load_template_subscriptions(template_path).items():
+            index.add(name, properties.get('FilterPolicy'))
+        return index
+
+    def match(self, message_attributes):
+        """Return the names of the subscriptions that would receive the message"""
+        values = {key: _attribute_values(attribute) for key, attribute in message_attributes.items()}
+        candidates = list(self._scan)
+        for key, by_value in self._index.items():
+            for value in values.get(key, ()):
+                candidates.extend(by_value.get(value, ()))
+
+        matched = []
+        seen = set()
+        for name in candidates:
+            if name in seen:
+                continue
+            seen.add(name)
+            if self._matches(self.subscriptions[name][1], values):
+                matched.append(name)
+        return matched
+
+    @staticmethod
+    def _matches(checks, values):
+        for key, predicate, exists in checks:
+            present = key in values
+            if exists is not None:
+                if present != exists:
+                    return False
+            elif not present or not any(predicate(value) for value in values[key]):
+                return False
+        return True
+
+def route_events(index, events):
+    """Route (message_type, body) pairs; returns per-subscription counts and unrouted events"""
+    counts = {name: 0 for name in index.subscriptions}
+    unrouted = []
+    for message_type, body in events:
+        matched = index.match({'message_type': {'DataType': 'String', 'StringValue': message_type}})
+        if not matched:
+            unrouted.append((message_type, body))
+        for name in matched:
+            counts[name] += 1
+    return counts, unrouted
+
+def main():
+    template_path = 'template.yaml'
+    index = FilterPolicyIndex.from_template(template_path)
+
+    print("=" * 60)
+    print("🔀 SNS Filter Policy Evaluator")
+    print("=" * 60)
+    for name, (policy, _) in index.subscriptions.items():
+        print(f"   {name}: {json.dumps(policy)}")
+
+    if len(sys.argv) > 1:
+        from bulk_publish import read_jsonl
+        events = list(read_jsonl(sys.argv[1]))
+    else:
+        from test_sns import build_test_messages
+        events = build_test_messages() + [("unknown_type", {"message": "Matches no subscription"})]
+
+    started = time.perf_counter()
+    counts, unrouted = route_events(index, events)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n📊 Routed {len(events)} events in {elapsed * 1000:.2f} ms "
+          f"({elapsed / max(len(events), 1) * 1e6:.2f} µs/event)")
+    for name, count in counts.items():
+        print(f"   {name}: {count}")
+    if unrouted:
+        print(f"\n⚠️  {len(unrouted)} event(s) match no subscription, e.g. message_type={unrouted[0][0]}")
+
+if __name__ == "__main__":
+    main()
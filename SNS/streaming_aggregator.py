@@ -0,0 +1,294 @@
+"""
+Streaming Aggregation State
+Incremental, mergeable analytics state for the analytics processor
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+class HyperLogLog:
+    """Approximate distinct counter (about 1.6% standard error with the default p=12)"""
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        hashed = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+        index = hashed >> (64 - self.p)
+        rest = hashed & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        # Registers hold small ranks, so sum 2^-rank over a histogram instead of every register
+        harmonic = sum(self.registers.count(rank) * 2.0 ** -rank for rank in set(self.registers))
+        estimate = alpha * self.m * self.m / harmonic
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            return round(self.m * math.log(self.m / zeros))  # Linear counting for small cardinalities
+        return round(estimate)
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        if not any(self.registers):
+            self.registers = bytearray(other.registers)
+        else:
+            self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def to_dict(self):
+        registers = zlib.compress(bytes(self.registers))
+        return {'p': self.p, 'registers': base64.b64encode(registers).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['p'], bytearray(zlib.decompress(base64.b64decode(data['registers']))))
+
+class QuantileSketch:
+    """
+    DDSketch-style quantile sketch with relative accuracy `alpha`.
+
+    Values are counted in logarithmic buckets, so the state stays small and
+    two sketches merge by adding bucket counts.
+    """
+
+    def __init__(self, alpha=0.01, buckets=None, zeros=0):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = buckets if buckets is not None else {}
+        self.zeros = zeros
+
+    def add(self, value):
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def count(self):
+        return self.zeros + sum(self.buckets.values())
+
+    def quantile(self, q):
+        total = self.count()
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        return self
+
+    def to_dict(self):
+        return {'alpha': self.alpha, 'zeros': self.zeros, 'buckets': {str(k): v for k, v in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['alpha'], {int(k): v for k, v in data['buckets'].items()}, data['zeros'])
+
+class WindowStats:
+    """Aggregates of order_value for one window: count, sum, min, max, distinct customers, quantiles"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.customers = HyperLogLog()
+        self.values = QuantileSketch()
+
+    def add(self, customer_id, order_value):
+        self.count += 1
+        self.total += order_value
+        self.minimum = order_value if self.minimum is None else min(self.minimum, order_value)
+        self.maximum = order_value if self.maximum is None else max(self.maximum, order_value)
+        self.customers.add(customer_id)
+        self.values.add(order_value)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        for attr, pick in (('minimum', min), ('maximum', max)):
+            mine, theirs = getattr(self, attr), getattr(other, attr)
+            setattr(self, attr, theirs if mine is None else mine if theirs is None else pick(mine, theirs))
+        self.customers.merge(other.customers)
+        self.values.merge(other.values)
+        return self
+
+    def summary(self):
+        return {
+            'orders': self.count,
+            'total_value': round(self.total, 2),
+            'min_value': self.minimum,
+            'max_value': self.maximum,
+            'distinct_customers': self.customers.count(),
+            'p50_value': self.values.quantile(0.5),
+            'p95_value': self.values.quantile(0.95),
+            'p99_value': self.values.quantile(0.99)
+        }
+
+    def to_dict(self):
+        return {'count': self.count, 'total': self.total, 'min': self.minimum, 'max': self.maximum,
+                'customers': self.customers.to_dict(), 'values': self.values.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count, stats.total = data['count'], data['total']
+        stats.minimum, stats.maximum = data['min'], data['max']
+        stats.customers = HyperLogLog.from_dict(data['customers'])
+        stats.values = QuantileSketch.from_dict(data['values'])
+        return stats
+
+class StreamingAggregator:
+    """
+    Incremental analytics over tumbling windows.
+
+    Each order lands in the tumbling window (pane) of its timestamp and in
+    the all-time totals. A sliding window is the merge of its most recent
+    panes, so reads touch a fixed number of panes no matter how much
+    history was processed. Panes older than `retention_windows` are dropped.
+    """
+
+    def __init__(self, window_seconds=60, retention_windows=60):
+        self.window_seconds = window_seconds
+        self.retention_windows = retention_windows
+        self.totals = WindowStats()
+        self.windows = {}
+
+    def add(self, customer_id, order_value, timestamp):
+        start = int(timestamp // self.window_seconds) * self.window_seconds
+        window = self.windows.get(start)
+        if window is None:
+            window = self.windows[start] = WindowStats()
+        window.add(customer_id, order_value)
+        self.totals.add(customer_id, order_value)
+
+    def add_columns(self, columns):
+        """Add the columns produced by analytics_processor.decode_records"""
+        for customer_id, order_value, timestamp in zip(columns['customer_id'], columns['order_value'],
+                                                       columns['timestamp']):
+            self.add(customer_id, order_value, timestamp)
+        self._evict()
+
+    def tumbling(self, timestamp):
+        """Summary of the tumbling window containing `timestamp`"""
+        window = self.windows.get(int(timestamp // self.window_seconds) * self.window_seconds)
+        return (window or WindowStats()).summary()
+
+    def sliding(self, end, width_seconds):
+        """Summary of (end - width_seconds, end], merged from the panes it covers"""
+        merged = WindowStats()
+        last = int(end // self.window_seconds) * self.window_seconds
+        for start in range(last, int(end - width_seconds), -self.window_seconds):
+            if start in self.windows:
+                merged.merge(self.windows[start])
+        return merged.summary()
+
+    def latest_window(self):
+        return max(self.windows) if self.windows else None
+
+    def snapshot(self, sliding_seconds=None):
+        """Dashboard view: all-time totals, the latest tumbling window and optionally a sliding window"""
+        latest = self.latest_window()
+        snapshot = {
+            'totals': self.totals.summary(),
+            'latest_window_start': latest,
+            'latest_window': self.tumbling(latest) if latest is not None else None
+        }
+        if sliding_seconds and latest is not None:
+            snapshot[f'last_{sliding_seconds}s'] = self.sliding(latest + self.window_seconds - 1, sliding_seconds)
+        return snapshot
+
+    def merge(self, other):
+        """Fold another aggregator's state into this one (e.g. from a concurrent invocation)"""
+        if other.window_seconds != self.window_seconds:
+            raise ValueError("Cannot merge aggregators with different window sizes")
+        self.totals.merge(other.totals)
+        for start, window in other.windows.items():
+            if start in self.windows:
+                self.windows[start].merge(window)
+            else:
+                self.windows[start] = WindowStats().merge(window)
+        self._evict()
+        return self
+
+    def _evict(self):
+        if len(self.windows) > self.retention_windows:
+            for start in sorted(self.windows)[:-self.retention_windows]:
+                del self.windows[start]
+
+    def to_dict(self):
+        return {
+            'window_seconds': self.window_seconds,
+            'retention_windows': self.retention_windows,
+            'totals': self.totals.to_dict(),
+            'windows': {str(start): window.to_dict() for start, window in self.windows.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregator = cls(data['window_seconds'], data['retention_windows'])
+        aggregator.totals = WindowStats.from_dict(data['totals'])
+        aggregator.windows = {int(start): WindowStats.from_dict(window) for start, window in data['windows'].items()}
+        return aggregator
+
+    def save(self, path):
+        """Checkpoint the state to a local file (written atomically)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as checkpoint:
+            checkpoint.write(json.dumps(self.to_dict(), separators=(',', ':')))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Restore a checkpoint, or start empty if there is none.
+
+        Panes of a different size cannot be re-bucketed, so a checkpoint
+        written with another window_seconds is discarded and the state
+        starts empty. So is a truncated or unreadable checkpoint, which
+        would otherwise fail every later invocation.
+        """
+        try:
+            with open(path) as checkpoint:
+                aggregator = cls.from_dict(json.load(checkpoint))
+        except FileNotFoundError:
+            return cls(**kwargs)
+        except (ValueError, KeyError, TypeError, zlib.error) as e:
+            logger.warning(f"Discarding unreadable checkpoint {path}: {e}; starting with empty state")
+            return cls(**kwargs)
+        window_seconds = kwargs.get('window_seconds', aggregator.window_seconds)
+        if window_seconds != aggregator.window_seconds:
+            logger.warning(f"Checkpoint {path} uses {aggregator.window_seconds}s windows, not {window_seconds}s; "
+                           f"starting with empty state")
+            return cls(**kwargs)
+        aggregator.retention_windows = kwargs.get('retention_windows', aggregator.retention_windows)
+        aggregator._evict()
+        return aggregator
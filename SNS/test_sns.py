@@ -3,50 +3,65 @@
 SNS Testing Script
 Tests various SNS message publishing scenarios
 """
+import asyncio
 import boto3
 import json
+import os
 import sys
 import time
 from botocore.exceptions import ClientError
 
-# Initialize SNS client
-sns_client = boto3.client('sns')
-sqs_client = boto3.client('sqs')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from aws_async import AsyncTransport
+from bulk_publish import TOPIC_NAME, get_topic_arn_async
+from claim_check import ClaimCheck, LocalObjectStore
+from cli import get_option
+from metrics import configure_from_args, incr, say, span
+
+# SNS/SQS clients, created in main() so importing this module has no side effects
+sns_client = None
+sqs_client = None
 
 def get_topic_arn():
     """Get the SNS topic ARN"""
     try:
         response = sns_client.list_topics()
         for topic in response['Topics']:
-            if 'ecommerce-order-notifications' in topic['TopicArn']:
+            if TOPIC_NAME in topic['TopicArn']:
                 return topic['TopicArn']
         raise Exception("Topic not found")
     except Exception as e:
         print(f"Error finding topic: {e}")
         sys.exit(1)
 
-def publish_message(topic_arn, message_type, message_body):
-    """Publish a message to SNS with message attributes"""
+def publish_message(topic_arn, message_type, message_body, claim_check=None):
+    """Publish a message to SNS with message attributes (large bodies go through the claim check)"""
+    message = json.dumps(message_body)
+    message_attributes = {
+        'message_type': {
+            'DataType': 'String',
+            'StringValue': message_type
+        }
+    }
     try:
-        response = sns_client.publish(
-            TopicArn=topic_arn,
-            Message=json.dumps(message_body),
-            Subject=f"Order Notification: {message_type}",
-            MessageAttributes={
-                'message_type': {
-                    'DataType': 'String',
-                    'StringValue': message_type
-                }
-            }
-        )
-        print(f"✅ Published {message_type} message - MessageId: {response['MessageId']}")
+        if claim_check:
+            message, message_attributes = claim_check.offload(message, message_attributes)
+        with span('sns.publish', message_type=message_type):
+            response = sns_client.publish(
+                TopicArn=topic_arn,
+                Message=message,
+                Subject=f"Order Notification: {message_type}",
+                MessageAttributes=message_attributes
+            )
+        incr('sns.messages_published', message_type=message_type)
+        say(f"✅ Published {message_type} message - MessageId: {response['MessageId']}")
         return response['MessageId']
     except ClientError as e:
         print(f"❌ Error publishing message: {e}")
         return None
 
-def check_sqs_messages(queue_url):
-    """Check for messages in the SQS queue"""
+def check_sqs_messages(queue_url, claim_check=None):
+    """Check for messages in the SQS queue, fetching claim-checked bodies from the object store"""
     try:
         response = sqs_client.receive_message(
             QueueUrl=queue_url,
@@ -59,9 +74,12 @@ def check_sqs_messages(queue_url):
             for msg in response['Messages']:
                 body = json.loads(msg['Body'])
                 if 'Message' in body:
-                    sns_message = json.loads(body['Message'])
+                    message = claim_check.resolve(body['Message']) if claim_check else body['Message']
+                    sns_message = json.loads(message)
                     print(f"   Order ID: {sns_message.get('order_id')}")
                     print(f"   Message: {sns_message.get('message')}")
+                    if 'items' in sns_message:
+                        print(f"   Items: {len(sns_message['items'])}")
                 print(f"   ReceiptHandle: {msg['ReceiptHandle'][:50]}...")
             return response['Messages']
         else:
@@ -71,51 +89,137 @@ def check_sqs_messages(queue_url):
         print(f"❌ Error checking SQS queue: {e}")
         return []
 
+def warehouse_items(item_count):
+    """The three demo items, or `item_count` generated ones for a peak-sized warehouse event"""
+    if not item_count:
+        return ["Item-A", "Item-B", "Item-C"]
+    return [f"Item-{i:06d}" for i in range(item_count)]
+
+def build_test_messages(item_count=0):
+    """The four test events, one per subscription filter"""
+    return [
+        ("order_confirmation", {
+            "order_id": "ORD-12345",
+            "customer_id": "CUST-001",
+            "customer_email": "customer@example.com",
+            "order_value": 99.99,
+            "message": "Your order has been confirmed!"
+        }),
+        ("order_tracking", {
+            "order_id": "ORD-12345",
+            "tracking_number": "TRACK-98765",
+            "status": "Shipped",
+            "message": "Your order has been shipped!"
+        }),
+        ("warehouse_processing", {
+            "order_id": "ORD-12345",
+            "items": warehouse_items(item_count),
+            "priority": "Normal",
+            "message": "Order ready for warehouse processing"
+        }),
+        ("analytics", {
+            "order_id": "ORD-12345",
+            "customer_id": "CUST-001",
+            "order_value": 99.99,
+            "timestamp": "2024-01-15T10:30:00Z",
+            "message": "Analytics data for processing"
+        }),
+    ]
+
+async def publish_message_async(transport, topic_arn, message_type, message_body, claim_check=None):
+    """Publish a message over the asyncio transport"""
+    message = json.dumps(message_body)
+    message_attributes = {
+        'message_type': {
+            'DataType': 'String',
+            'StringValue': message_type
+        }
+    }
+    try:
+        if claim_check:
+            # Object store writes block, so they run off the event loop
+            message, message_attributes = await asyncio.to_thread(claim_check.offload, message, message_attributes)
+        with span('sns.publish', message_type=message_type):
+            response = await transport.publish(
+                topic_arn,
+                message,
+                message_attributes=message_attributes,
+                subject=f"Order Notification: {message_type}"
+            )
+        incr('sns.messages_published', message_type=message_type)
+        say(f"✅ Published {message_type} message - MessageId: {response['MessageId']}")
+        return response['MessageId']
+    except ClientError as e:
+        print(f"❌ Error publishing message: {e}")
+        return None
+
+async def async_main(claim_check=None, item_count=0):
+    """Publish all test messages concurrently and drain the warehouse queue"""
+    async with AsyncTransport() as transport:
+        topic_arn = await get_topic_arn_async(transport)
+        print(f"\n📢 SNS Topic ARN: {topic_arn}\n")
+
+        print("⚡ Publishing all test messages concurrently...")
+        await asyncio.gather(*[publish_message_async(transport, topic_arn, message_type, body, claim_check)
+                               for message_type, body in build_test_messages(item_count)])
+
+        try:
+            queue_url = (await transport.call('sqs', 'get_queue_url', QueueName='warehouse-order-processing'))['QueueUrl']
+            messages = await transport.receive(queue_url, wait_seconds=5)
+            print(f"\n📦 Found {len(messages)} message(s) in warehouse queue")
+            if messages:
+                await transport.delete_batch(queue_url, [msg['ReceiptHandle'] for msg in messages])
+                print("✅ Messages processed and deleted from queue")
+        except ClientError as e:
+            print(f"⚠️  Could not check SQS queue: {e}")
+
 def main():
+    global sns_client, sqs_client
+    
     print("=" * 60)
     print("🚀 SNS Lab Testing Script")
     print("=" * 60)
     
+    args = sys.argv[1:]
+    item_count = get_option(args, '--items', 0)
+    # Large messages go to a local object store and SNS carries a pointer
+    claim_check_dir = get_option(args, '--claim-check', '')
+    claim_check = ClaimCheck(LocalObjectStore(claim_check_dir)) if claim_check_dir else None
+    # --metrics emf|statsd|prometheus aggregates publish latency; --quiet drops the per-message prints
+    configure_from_args(args)
+    
+    if '--async' in args:
+        asyncio.run(async_main(claim_check, item_count))
+        print("\n" + "=" * 60)
+        print("✅ Testing Complete!")
+        print("=" * 60)
+        return
+    
+    sns_client = boto3.client('sns')
+    sqs_client = boto3.client('sqs')
+    
     # Get topic ARN
     topic_arn = get_topic_arn()
     print(f"\n📢 SNS Topic ARN: {topic_arn}\n")
+    test_messages = dict(build_test_messages(item_count))
     
     # Test 1: Order Confirmation Email
     print("\n" + "=" * 60)
     print("TEST 1: Publishing Order Confirmation (Email)")
     print("=" * 60)
-    message1 = {
-        "order_id": "ORD-12345",
-        "customer_id": "CUST-001",
-        "customer_email": "customer@example.com",
-        "order_value": 99.99,
-        "message": "Your order has been confirmed!"
-    }
-    publish_message(topic_arn, "order_confirmation", message1)
+    publish_message(topic_arn, "order_confirmation", test_messages["order_confirmation"], claim_check)
     
     # Test 2: Order Tracking SMS
     print("\n" + "=" * 60)
     print("TEST 2: Publishing Order Tracking (SMS)")
     print("=" * 60)
-    message2 = {
-        "order_id": "ORD-12345",
-        "tracking_number": "TRACK-98765",
-        "status": "Shipped",
-        "message": "Your order has been shipped!"
-    }
-    publish_message(topic_arn, "order_tracking", message2)
+    publish_message(topic_arn, "order_tracking", test_messages["order_tracking"], claim_check)
     
     # Test 3: Warehouse Processing (SQS)
     print("\n" + "=" * 60)
     print("TEST 3: Publishing Warehouse Processing (SQS)")
     print("=" * 60)
-    message3 = {
-        "order_id": "ORD-12345",
-        "items": ["Item-A", "Item-B", "Item-C"],
-        "priority": "Normal",
-        "message": "Order ready for warehouse processing"
-    }
-    publish_message(topic_arn, "warehouse_processing", message3)
+    publish_message(topic_arn, "warehouse_processing", test_messages["warehouse_processing"], claim_check)
     
     # Wait a moment for message to arrive
     print("\n⏳ Waiting 3 seconds for message to arrive in SQS...")
@@ -127,7 +231,7 @@ def main():
         queue_url = queue_response['QueueUrl']
         
         # Check for messages
-        messages = check_sqs_messages(queue_url)
+        messages = check_sqs_messages(queue_url, claim_check)
         
         if messages:
             # Delete messages after reading
@@ -144,14 +248,7 @@ def main():
     print("\n" + "=" * 60)
     print("TEST 4: Publishing Analytics Data (Lambda)")
     print("=" * 60)
-    message4 = {
-        "order_id": "ORD-12345",
-        "customer_id": "CUST-001",
-        "order_value": 99.99,
-        "timestamp": "2024-01-15T10:30:00Z",
-        "message": "Analytics data for processing"
-    }
-    publish_message(topic_arn, "analytics", message4)
+    publish_message(topic_arn, "analytics", test_messages["analytics"], claim_check)
     
     print("\n⏳ Waiting 5 seconds for Lambda to process...")
     time.sleep(5)
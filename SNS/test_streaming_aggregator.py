@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Streaming Aggregator Test
+Checks the HyperLogLog and quantile sketch accuracy, window aggregation and checkpointing of the analytics processor
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from streaming_aggregator import HyperLogLog, QuantileSketch, StreamingAggregator
+
+def check(failures, condition, message):
+    print(f"  {'PASS' if condition else 'FAIL'}: {message}")
+    if not condition:
+        failures.append(message)
+
+def relative_error(estimate, actual):
+    return abs(estimate - actual) / actual
+
+def check_hyperloglog(failures):
+    print("\nHyperLogLog:")
+    for distinct in (100, 10000, 200000):
+        hll = HyperLogLog()
+        for i in range(distinct):
+            hll.add(f"cust-{i}")
+        error = relative_error(hll.count(), distinct)
+        check(failures, error < 0.05, f"{distinct} distinct values counted as {hll.count()} ({error:.1%} error)")
+
+    hll = HyperLogLog()
+    for _ in range(5):
+        for i in range(1000):
+            hll.add(f"cust-{i}")
+    check(failures, relative_error(hll.count(), 1000) < 0.05,
+          f"repeated values are not counted twice ({hll.count()})")
+
+    left, right = HyperLogLog(), HyperLogLog()
+    for i in range(6000):
+        left.add(f"cust-{i}")
+    for i in range(4000, 10000):
+        right.add(f"cust-{i}")
+    merged = HyperLogLog.from_dict(left.to_dict()).merge(right)
+    check(failures, relative_error(merged.count(), 10000) < 0.05,
+          f"merging overlapping counters estimates the union ({merged.count()} of 10000)")
+
+def check_quantile_sketch(failures):
+    print("\nQuantile sketch:")
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1) for _ in range(50000)]
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        error = relative_error(sketch.quantile(q), exact)
+        check(failures, error <= 0.02, f"p{int(q * 100)} {sketch.quantile(q):.2f} vs exact {exact:.2f} "
+                                       f"({error:.2%} error)")
+
+    first, second = QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        (first if i % 2 else second).add(value)
+    merged = QuantileSketch.from_dict(json.loads(json.dumps(first.to_dict()))).merge(second)
+    check(failures, merged.count() == len(values) and merged.quantile(0.95) == sketch.quantile(0.95),
+          "merged halves give the same quantiles as one sketch")
+
+    sketch = QuantileSketch()
+    for value in (0, 0, 10, 10):
+        sketch.add(value)
+    check(failures, sketch.quantile(0.25) == 0.0 and sketch.quantile(0.99) > 9.5, "zero values are counted")
+
+def check_windows(failures):
+    print("\nWindows:")
+    aggregator = StreamingAggregator(window_seconds=60, retention_windows=3)
+    # Orders in four consecutive minutes: minute m has m + 1 orders worth 10 * (m + 1) each
+    columns = {'customer_id': [], 'order_value': [], 'timestamp': []}
+    for minute in range(4):
+        for i in range(minute + 1):
+            columns['customer_id'].append(f"cust-{i}")
+            columns['order_value'].append(10.0 * (minute + 1))
+            columns['timestamp'].append(600 + minute * 60 + i)
+    aggregator.add_columns(columns)
+    latest = aggregator.tumbling(780)
+    check(failures, (latest['orders'], latest['total_value'], latest['min_value'], latest['distinct_customers'])
+          == (4, 160.0, 40.0, 4), f"tumbling window of the last minute: {latest['orders']} orders")
+    sliding = aggregator.sliding(839, 120)
+    check(failures, (sliding['orders'], sliding['total_value']) == (7, 250.0),
+          f"2-minute sliding window merges the last two panes ({sliding['orders']} orders)")
+    check(failures, sorted(aggregator.windows) == [660, 720, 780] and aggregator.totals.count == 10,
+          "panes beyond retention are dropped but the totals keep every order")
+
+    other = StreamingAggregator(window_seconds=60, retention_windows=3)
+    other.add("cust-new", 5.0, 790)
+    aggregator.merge(other)
+    check(failures, aggregator.tumbling(780)['orders'] == 5 and aggregator.totals.count == 11,
+          "merging another invocation's state adds to the same pane")
+
+def check_checkpoints(failures, directory):
+    print("\nCheckpoints:")
+    path = os.path.join(directory, 'state.json')
+    aggregator = StreamingAggregator(window_seconds=60)
+    for i in range(100):
+        aggregator.add(f"cust-{i % 30}", float(i), 1000 + i)
+    aggregator.save(path)
+    restored = StreamingAggregator.load(path, window_seconds=60)
+    check(failures, restored.snapshot(sliding_seconds=300) == aggregator.snapshot(sliding_seconds=300),
+          "a restored checkpoint gives the same snapshot")
+
+    logging.disable(logging.WARNING)
+    try:
+        resized = StreamingAggregator.load(path, window_seconds=300)
+    finally:
+        logging.disable(logging.NOTSET)
+    check(failures, resized.window_seconds == 300 and resized.totals.count == 0,
+          "a checkpoint written with another WINDOW_SECONDS is discarded")
+
+    with open(path) as checkpoint:
+        saved = checkpoint.read()
+    with open(path, 'w') as checkpoint:
+        checkpoint.write(saved[:len(saved) // 2])
+    logging.disable(logging.WARNING)
+    try:
+        truncated = StreamingAggregator.load(path, window_seconds=60)
+    finally:
+        logging.disable(logging.NOTSET)
+    check(failures, truncated.totals.count == 0, "a truncated checkpoint is discarded instead of failing the load")
+
+def check_processor(failures, directory):
+    print("\nAnalytics processor:")
+    path = os.path.join(directory, 'analytics_state.json')
+    os.environ['CHECKPOINT_PATH'] = path
+    os.environ['CHECKPOINT_INTERVAL_SECONDS'] = '0'
+    import analytics_processor
+
+    logging.getLogger().setLevel(logging.ERROR)
+    event = {'Records': [
+        {'EventSource': 'aws:sns', 'Sns': {'MessageId': f"m-{i}", 'Timestamp': '2026-01-01T00:00:00Z',
+                                           'Message': json.dumps({'customer_id': f"cust-{i}", 'order_value': 10})}}
+        for i in range(5)
+    ] + [{'EventSource': 'aws:sns', 'Sns': {'MessageId': 'm-bad', 'Message': '1,2'}}]}
+    summary = analytics_processor.lambda_handler(event, None)['summary']
+    check(failures, summary['orders'] == 5 and summary['rejected'] == 1,
+          "a malformed message is rejected without shifting the others")
+    analytics_processor.lambda_handler(event, None)
+    with open(path) as checkpoint:
+        saved = json.load(checkpoint)
+    check(failures, saved['totals']['count'] == 10, "CHECKPOINT_INTERVAL_SECONDS=0 checkpoints every invocation")
+
+    analytics_processor.CHECKPOINT_INTERVAL_SECONDS = 3600
+    summary = analytics_processor.lambda_handler(event, None)['summary']
+    with open(path) as checkpoint:
+        saved = json.load(checkpoint)
+    check(failures, saved['totals']['count'] == 10 and 'state' not in summary,
+          "between checkpoints nothing is written and no state snapshot is built")
+
+def main():
+    print("=" * 60)
+    print("🧪 Streaming Aggregator - Sketches, Windows and Checkpoints")
+    print("=" * 60)
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        check_hyperloglog(failures)
+        check_quantile_sketch(failures)
+        check_windows(failures)
+        check_checkpoints(failures, directory)
+        check_processor(failures, directory)
+
+    print("\n" + "=" * 60)
+    print("✅ All checks passed!" if not failures else f"❌ {len(failures)} check(s) failed")
+    print("=" * 60)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
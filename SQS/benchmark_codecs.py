@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Message Codec Benchmark
+Encode/decode cost and body bytes per codec, and the saving of lazy decoding for attribute-only routing
+"""
+
+import json
+import sys
+import time
+
+from message_codec import CODECS, ENVELOPE_MARKER, LazyMessage, decode_body, encode_body
+from producer import build_standard_message
+
+def sample_payloads():
+    """A small order notification and a warehouse order with a long items list"""
+    order = json.loads(build_standard_message("ORD-001", "customer1@example.com", 99.99)[0])
+    warehouse = dict(order, items=[{"sku": f"SKU-{i:05d}", "name": f"Item {i}", "quantity": i % 7 + 1,
+                                    "price": round(4.99 + i % 50, 2), "warehouse": f"WH-{i % 4}"}
+                                   for i in range(500)])
+    return {'order': order, 'warehouse (500 items)': warehouse}
+
+def time_per_call(function, argument, repeats):
+    """Microseconds per call"""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        function(argument)
+    return (time.perf_counter() - started) / repeats * 1e6
+
+def bench_codecs(repeats):
+    rows = []
+    for payload_name, payload in sample_payloads().items():
+        baseline = len(json.dumps(payload).encode('utf-8'))
+        rows.append((payload_name, 'json.dumps (current)', time_per_call(json.dumps, payload, repeats),
+                     time_per_call(json.loads, json.dumps(payload), repeats), baseline, baseline))
+        for name in CODECS:
+            for compress in (False, True):
+                body = encode_body(payload, name, compress=compress)
+                assert decode_body(body) == json.loads(json.dumps(payload))
+                label = f"{name}{' + zlib' if compress else ''}"
+                # decode_body reads every plain body with the fastest parser, so time the codec's own decoder
+                decode = decode_body if body.startswith(ENVELOPE_MARKER) else CODECS[name].decode
+                rows.append((payload_name, label,
+                             time_per_call(lambda obj: encode_body(obj, name, compress=compress), payload, repeats),
+                             time_per_call(decode, body, repeats), len(body.encode('utf-8')), baseline))
+    return rows
+
+def bench_lazy_routing(count):
+    """Route messages on the OrderType attribute, decoding eagerly vs lazily"""
+    body, attributes = build_standard_message("ORD-001", "customer1@example.com", 99.99, codec='json')
+    messages = [{'MessageId': str(i), 'Body': body, 'MessageAttributes': attributes} for i in range(count)]
+
+    started = time.perf_counter()
+    for message in messages:
+        decode_body(message['Body'])
+        message['MessageAttributes']['OrderType']['StringValue']
+    eager = time.perf_counter() - started
+
+    started = time.perf_counter()
+    decoded = 0
+    for message in messages:
+        lazy = LazyMessage(message)
+        lazy.attribute('OrderType')
+        decoded += lazy.decoded
+    lazy_elapsed = time.perf_counter() - started
+    return eager, lazy_elapsed, decoded
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("=" * 60)
+    print("🧬 Message Codec Benchmark")
+    print("=" * 60)
+    print(f"Codecs available: {', '.join(CODECS)} ({repeats} repetitions per measurement)")
+
+    print(f"\n{'Payload':<22} {'Codec':<22} {'encode µs':>10} {'decode µs':>10} {'bytes':>8} {'vs json':>8}")
+    print("-" * 84)
+    for payload_name, label, encode_us, decode_us, size, baseline in bench_codecs(repeats):
+        print(f"{payload_name:<22} {label:<22} {encode_us:>10.2f} {decode_us:>10.2f} {size:>8} "
+              f"{size / baseline:>7.0%}")
+
+    count = repeats * 10
+    eager, lazy, decoded = bench_lazy_routing(count)
+    print(f"\n🔀 Routing {count} messages on an attribute: eager decode {eager * 1000:.1f} ms, "
+          f"lazy {lazy * 1000:.1f} ms ({decoded} bodies decoded)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+SQS Benchmark Suite
+Runs every producer and consumer mode against the local SQS stand-in and reports
+msgs/sec, latency percentiles and API calls per message
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from aws_async import AsyncTransport
+from cli import get_option
+from consumer import (consume_fifo_parallel, consume_queue, consume_queue_adaptive, consume_queue_async,
+                      consume_queue_concurrent)
+from local_sqs import LocalSQSClient
+from message_codec import decode_body
+from metrics import percentile
+from poll_controller import PollController
+from producer import (build_fifo_message, build_standard_message, send_async, send_batched, send_to_fifo_queue,
+                      send_to_standard_queue)
+
+STANDARD_QUEUE = 'order-notifications-queue'
+FIFO_QUEUE = 'payment-processing-queue.fifo'
+PRODUCER_MODES = ['single', 'batch', 'async']
+CONSUMER_MODES = ['serial', 'concurrent', 'adaptive', 'fifo-lanes', 'async']
+
+class RecordingClient:
+    """
+    Wraps an SQS client and timestamps messages as they pass through it.
+
+    For sends it records the latency of the call that carried each message;
+    for receives it records the time from the ReceiveMessage response to the
+    delete that acknowledged the message. Everything else passes through.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = []
+        self._received = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _record_send(self, started, count):
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.latencies.extend([latency] * count)
+
+    def send_message(self, **kwargs):
+        started = time.perf_counter()
+        response = self.client.send_message(**kwargs)
+        self._record_send(started, 1)
+        return response
+
+    def send_message_batch(self, **kwargs):
+        started = time.perf_counter()
+        response = self.client.send_message_batch(**kwargs)
+        self._record_send(started, len(response.get('Successful', [])))
+        return response
+
+    def receive_message(self, **kwargs):
+        response = self.client.receive_message(**kwargs)
+        now = time.perf_counter()
+        with self._lock:
+            for message in response.get('Messages', []):
+                self._received[message['ReceiptHandle']] = now
+        return response
+
+    def _record_deletes(self, receipt_handles):
+        now = time.perf_counter()
+        with self._lock:
+            for receipt_handle in receipt_handles:
+                received = self._received.pop(receipt_handle, None)
+                if received is not None:
+                    self.latencies.append(now - received)
+
+    def delete_message(self, **kwargs):
+        response = self.client.delete_message(**kwargs)
+        self._record_deletes([kwargs['ReceiptHandle']])
+        return response
+
+    def delete_message_batch(self, **kwargs):
+        response = self.client.delete_message_batch(**kwargs)
+        handles = {entry['Id']: entry['ReceiptHandle'] for entry in kwargs['Entries']}
+        self._record_deletes([handles[entry['Id']] for entry in response.get('Successful', [])])
+        return response
+
+def build_orders(count):
+    return [{"order_id": f"ORD-{i:06d}", "email": f"customer{i}@example.com", "total": round(10 + i % 500 * 0.5, 2),
+             "payment_id": f"PAY-{i:06d}"} for i in range(count)]
+
+def make_backend(latency_seconds):
+    """Fresh local queues from template.yaml; long polls are capped so drained queues return quickly"""
+    client = LocalSQSClient.from_template(latency_seconds=latency_seconds, max_wait_seconds=0.05)
+    return (client, client.get_queue_url(QueueName=STANDARD_QUEUE)['QueueUrl'],
+            client.get_queue_url(QueueName=FIFO_QUEUE)['QueueUrl'])
+
+def make_handler(work_seconds):
+    def handler(queue_name, message):
+        decode_body(message['Body'])
+        if work_seconds:
+            time.sleep(work_seconds)
+        return True
+    return handler
+
+def summarize(mode, kind, messages, elapsed, latencies, api_calls):
+    return {
+        'mode': mode,
+        'kind': kind,
+        'messages': messages,
+        'seconds': elapsed,
+        'msgs_per_sec': messages / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'api_calls_per_msg': api_calls / messages if messages else 0.0
+    }
+
+def run_producer(mode, count, latency_seconds, codec=None):
+    """Send `count` orders to both queues with one producer mode"""
+    client, standard_url, fifo_url = make_backend(latency_seconds)
+    recorder = RecordingClient(client)
+    orders = build_orders(count)
+    baseline = client.total_api_calls()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'single':
+            for order in orders:
+                send_to_standard_queue(recorder, standard_url, order["order_id"], order["email"], order["total"],
+                                       codec)
+                send_to_fifo_queue(recorder, fifo_url, order["order_id"], order["email"], order["total"],
+                                   order["payment_id"], codec)
+        elif mode == 'batch':
+            send_batched(recorder, standard_url, fifo_url, orders, codec)
+        elif mode == 'async':
+            transport = AsyncTransport(clients={'sqs': recorder})
+            try:
+                asyncio.run(send_async(transport, standard_url, fifo_url, orders, codec))
+            finally:
+                transport.close()
+    elapsed = time.perf_counter() - started
+
+    sent = sum(int(client.get_queue_attributes(QueueUrl=url, AttributeNames=['ApproximateNumberOfMessages'])
+                   ['Attributes']['ApproximateNumberOfMessages']) for url in (standard_url, fifo_url))
+    api_calls = client.total_api_calls() - baseline - 2
+    return summarize(mode, 'producer', sent, elapsed, recorder.latencies, api_calls)
+
+def preload(client, queue_url, orders, fifo, codec=None):
+    for start in range(0, len(orders), 10):
+        entries = []
+        for i, order in enumerate(orders[start:start + 10]):
+            if fifo:
+                body, attributes = build_fifo_message(order["order_id"], order["email"], order["total"],
+                                                      order["payment_id"], codec)
+                entries.append({'Id': str(i), 'MessageBody': body, 'MessageAttributes': attributes,
+                                'MessageGroupId': f"payment-{order['order_id']}",
+                                'MessageDeduplicationId': f"payment-{order['payment_id']}"})
+            else:
+                body, attributes = build_standard_message(order["order_id"], order["email"], order["total"], codec)
+                entries.append({'Id': str(i), 'MessageBody': body, 'MessageAttributes': attributes})
+        client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+
+def run_consumer(mode, count, latency_seconds, work_seconds, pollers=4, workers=16, lanes=8, codec=None):
+    """Preload `count` messages and drain them with one consumer mode"""
+    client, standard_url, fifo_url = make_backend(latency_seconds)
+    fifo = mode == 'fifo-lanes'
+    queue_url = fifo_url if fifo else standard_url
+    preload(client, queue_url, build_orders(count), fifo, codec)
+    recorder = RecordingClient(client)
+    handler = make_handler(work_seconds)
+    baseline = client.total_api_calls()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'serial':
+            processed = consume_queue(recorder, queue_url, STANDARD_QUEUE, count, handler)
+        elif mode == 'concurrent':
+            processed = consume_queue_concurrent(recorder, queue_url, STANDARD_QUEUE, count, pollers, workers, handler)
+        elif mode == 'adaptive':
+            controller = PollController(max_pollers=pollers * 2, visibility_timeout=30, depth_interval=0.5,
+                                        target_drain_seconds=1.0)
+            processed = consume_queue_adaptive(recorder, queue_url, STANDARD_QUEUE, count, handler, controller,
+                                               idle_timeout=1.0)
+        elif mode == 'fifo-lanes':
+            processed = consume_fifo_parallel(recorder, queue_url, FIFO_QUEUE, count, lanes, handler)
+        elif mode == 'async':
+            transport = AsyncTransport(clients={'sqs': recorder})
+            try:
+                processed = asyncio.run(consume_queue_async(transport, queue_url, STANDARD_QUEUE, count,
+                                                            pollers, handler))
+            finally:
+                transport.close()
+    elapsed = time.perf_counter() - started
+    return summarize(mode, 'consumer', processed, elapsed, recorder.latencies, client.total_api_calls() - baseline)
+
+def print_results(results):
+    print(f"\n{'Mode':<22} {'msgs':>7} {'sec':>7} {'msgs/sec':>10} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'API/msg':>8}")
+    print("-" * 86)
+    for result in results:
+        print(f"{result['kind'] + ' ' + result['mode']:<22} {result['messages']:>7} {result['seconds']:>7.2f} "
+              f"{result['msgs_per_sec']:>10.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['api_calls_per_msg']:>8.3f}")
+    print("\nProducer latency is per API call; consumer latency is receive-to-delete.")
+
+def main():
+    args = sys.argv[1:]
+    if '--help' in args:
+        print("Usage: python3 benchmark_sqs.py [--count N] [--latency SECONDS] [--work SECONDS] "
+              "[--modes single,batch,async,serial,concurrent,adaptive,fifo-lanes] [--codec NAME] [--report report.json]")
+        sys.exit(0)
+
+    count = get_option(args, '--count', 1000)
+    latency_seconds = get_option(args, '--latency', 0.002)
+    work_seconds = get_option(args, '--work', 0.0)
+    modes = get_option(args, '--modes', ','.join(PRODUCER_MODES + CONSUMER_MODES)).split(',')
+    report_path = get_option(args, '--report', '')
+    codec = get_option(args, '--codec', '') or None
+
+    print("=" * 60)
+    print("🏁 SQS Benchmark Suite (local stand-in)")
+    print("=" * 60)
+    print(f"{count} orders per run, {latency_seconds * 1000:.1f} ms simulated API latency, "
+          f"{work_seconds * 1000:.1f} ms handler work")
+
+    results = []
+    for mode in PRODUCER_MODES:
+        if mode in modes:
+            print(f"⏱️  producer {mode}...")
+            results.append(run_producer(mode, count, latency_seconds, codec))
+    for mode in CONSUMER_MODES:
+        if mode in modes:
+            print(f"⏱️  consumer {mode}...")
+            results.append(run_consumer(mode, count, latency_seconds, work_seconds, codec=codec))
+
+    print_results(results)
+    if report_path:
+        with open(report_path, 'w') as report_file:
+            json.dump(results, report_file, indent=2)
+        print(f"📝 Report written to {report_path}")
+
+if __name__ == "__main__":
+    main()
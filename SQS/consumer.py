@@ -4,65 +4,135 @@ SQS Consumer Script
 Receives and processes messages from SQS queues
 """
 
+import asyncio
 import boto3
 import json
+import os
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from aws_async import AsyncTransport
+from claim_check import ClaimCheck, ClaimCheckMessage, LocalObjectStore
+from cli import get_option, usage_error
+from lease_manager import LeaseManager, get_visibility_timeout
+from message_codec import LazyMessage, decode_body
+from metrics import configure_from_args, incr, observe, percentile, queue_tag, say, span
+from poll_controller import PollController
+from producer import SAMPLE_ORDERS, send_batched
+from scheduler import QueueScheduler
 
 def process_message(queue_name, message):
     """Process a single message"""
-    body = json.loads(message['Body'])
+    body = decode_body(message['Body'])  # Plain JSON or a message_codec envelope
     
-    print(f"\n📨 Processing message from {queue_name}:")
-    print(f"   Message ID: {message['MessageId']}")
-    print(f"   Receipt Handle: {message['ReceiptHandle'][:50]}...")
-    print(f"   Body: {json.dumps(body, indent=2)}")
+    say(f"\n📨 Processing message from {queue_name}:")
+    say(f"   Message ID: {message['MessageId']}")
+    say(f"   Receipt Handle: {message['ReceiptHandle'][:50]}...")
+    say(f"   Body: {json.dumps(body, default=str)}")
     
     if 'MessageAttributes' in message:
-        print(f"   Attributes: {message['MessageAttributes']}")
+        say(f"   Attributes: {message['MessageAttributes']}")
     
     # Simulate processing
     time.sleep(1)
-    print(f"   ✅ Message processed successfully!")
+    say(f"   ✅ Message processed successfully!")
     
     return True
 
-def consume_queue(sqs_client, queue_url, queue_name, max_messages=10):
+def run_handler(handler, queue_name, message, tag):
+    """Call a handler inside a process span; exceptions count as failures"""
+    try:
+        with span('sqs.process', queue=tag):
+            success = handler(queue_name, message)
+    except Exception as e:
+        print(f"❌ Error processing message {message['MessageId']}: {e}")
+        success = False
+    incr('sqs.messages_processed' if success else 'sqs.messages_failed', queue=tag)
+    return success
+
+def route_by_attribute(routes, attribute_name, default=None):
+    """
+    Build a handler that dispatches on a message attribute.
+
+    Each route receives (queue_name, LazyMessage); the body is only decoded
+    if the route reads message.body, so attribute-only routing is cheap.
+    """
+    def handler(queue_name, message):
+        lazy = LazyMessage(message)
+        route = routes.get(lazy.attribute(attribute_name), default)
+        if route is None:
+            print(f"⚠️  No route for {attribute_name}={lazy.attribute(attribute_name)!r}")
+            return False
+        return route(queue_name, lazy)
+    return handler
+
+def with_claim_check(handler, claim_check):
+    """
+    Wrap a handler so claim-check pointers are resolved transparently.
+
+    The stored body is only fetched when the handler reads message['Body'];
+    handlers that route on attributes never touch the object store.
+    """
+    def wrapped(queue_name, message):
+        if not claim_check.is_pointer(message['Body']):
+            return handler(queue_name, message)
+        return handler(queue_name, ClaimCheckMessage(message, claim_check))
+    return wrapped
+
+def consume_queue(sqs_client, queue_url, queue_name, max_messages=10, handler=process_message):
     """Consume messages from a queue"""
     print(f"\n{'='*60}")
     print(f"📬 Consuming from: {queue_name}")
     print(f"{'='*60}")
     
     messages_processed = 0
+    tag = queue_tag(queue_url)
+    # Keep received messages invisible while earlier ones in the batch are processed
+    leases = LeaseManager(sqs_client, queue_url, get_visibility_timeout(sqs_client, queue_url))
     
     while messages_processed < max_messages:
         try:
             # Receive messages with long polling (20 seconds)
-            response = sqs_client.receive_message(
-                QueueUrl=queue_url,
-                MaxNumberOfMessages=10,  # Max 10 messages per request
-                WaitTimeSeconds=20,      # Long polling
-                MessageAttributeNames=['All']
-            )
+            with span('sqs.receive', queue=tag):
+                response = sqs_client.receive_message(
+                    QueueUrl=queue_url,
+                    MaxNumberOfMessages=10,  # Max 10 messages per request
+                    WaitTimeSeconds=20,      # Long polling
+                    MessageAttributeNames=['All']
+                )
             
             if 'Messages' not in response or len(response['Messages']) == 0:
-                print(f"   ⏳ No messages available. Waiting...")
+                incr('sqs.empty_receives', queue=tag)
+                say(f"   ⏳ No messages available. Waiting...")
                 if messages_processed > 0:
                     break  # Exit if we've processed some messages and now queue is empty
                 continue
             
+            incr('sqs.messages_received', len(response['Messages']), queue=tag)
+            for message in response['Messages']:
+                leases.track(message)
+            
             for message in response['Messages']:
                 # Process the message
-                success = process_message(queue_name, message)
+                success = run_handler(handler, queue_name, message, tag)
                 
                 if success:
                     # Delete message from queue after successful processing
-                    sqs_client.delete_message(
-                        QueueUrl=queue_url,
-                        ReceiptHandle=message['ReceiptHandle']
-                    )
+                    leases.complete(message['ReceiptHandle'])
+                    with span('sqs.delete', queue=tag):
+                        sqs_client.delete_message(
+                            QueueUrl=queue_url,
+                            ReceiptHandle=message['ReceiptHandle']
+                        )
                     messages_processed += 1
-                    print(f"   🗑️  Message deleted from queue")
+                    say(f"   🗑️  Message deleted from queue")
+                else:
+                    # Make it visible again right away instead of waiting out the timeout
+                    leases.release(message['ReceiptHandle'])
             
         except KeyboardInterrupt:
             print("\n\n⚠️  Interrupted by user")
@@ -71,30 +141,788 @@ def consume_queue(sqs_client, queue_url, queue_name, max_messages=10):
             print(f"❌ Error consuming messages: {e}")
             break
     
+    leases.close()
     print(f"\n✅ Processed {messages_processed} messages from {queue_name}")
     return messages_processed
 
+class DeleteBatcher:
+    """
+    Collects receipt handles of processed messages and deletes them with
+    DeleteMessageBatch, 10 at a time or after linger_seconds.
+    """
+
+    def __init__(self, sqs_client, queue_url, linger_seconds=0.2):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.linger_seconds = linger_seconds
+        self.tag = queue_tag(queue_url)
+        self.deleted = 0
+        self.failed = []
+        self.api_calls = 0
+        self._pending = []
+        self._next_id = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flusher = threading.Thread(target=self._linger_loop, daemon=True)
+        self._flusher.start()
+
+    def delete(self, receipt_handle):
+        """Schedule a receipt handle for deletion"""
+        with self._lock:
+            self._pending.append({'Id': str(self._next_id), 'ReceiptHandle': receipt_handle})
+            self._next_id += 1
+            if len(self._pending) == 1:
+                self._wakeup.notify()
+            if len(self._pending) < 10:
+                return
+            batch = self._pending[:10]
+            del self._pending[:10]
+        self._delete_batch(batch)
+
+    def flush(self):
+        """Delete everything that is pending"""
+        while True:
+            with self._lock:
+                batch = self._pending[:10]
+                del self._pending[:10]
+            if not batch:
+                return
+            self._delete_batch(batch)
+
+    def close(self):
+        """Flush pending deletes and stop the linger thread"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._flusher.join()
+        self.flush()
+        if self.failed:
+            first = self.failed[0]
+            print(f"⚠️  {len(self.failed)} processed messages could not be deleted from {self.tag} and stay on "
+                  f"the queue ({first.get('Code')}: {first.get('Message')})")
+
+    def _linger_loop(self):
+        while True:
+            with self._lock:
+                while not self._closed and not self._pending:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                self._wakeup.wait(self.linger_seconds)
+            self.flush()
+
+    def _delete_batch(self, entries):
+        try:
+            with span('sqs.delete_batch', queue=self.tag):
+                response = self.sqs_client.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+        except Exception as e:
+            response = {'Failed': [{'Id': entry['Id'], 'Code': type(e).__name__, 'Message': str(e)}
+                                   for entry in entries]}
+        incr('sqs.messages_deleted', len(response.get('Successful', [])), queue=self.tag)
+        with self._lock:
+            self.api_calls += 1
+            self.deleted += len(response.get('Successful', []))
+            self.failed.extend(response.get('Failed', []))
+
+def consume_queue_concurrent(sqs_client, queue_url, queue_name, max_messages=10, pollers=4, workers=16,
+                             handler=process_message, prefetch=10):
+    """
+    Consume messages with several concurrent pollers feeding a bounded worker pool.
+
+    At most workers + prefetch messages are held at once: a poller only
+    asks for as many messages as there are free slots, so receiving slows
+    down as soon as the workers fall behind. Successfully processed
+    messages are deleted in batches of 10.
+    """
+    print(f"\n{'='*60}")
+    print(f"📬 Consuming from: {queue_name} ({pollers} pollers, {workers} workers)")
+    print(f"{'='*60}")
+
+    slots = threading.BoundedSemaphore(workers + prefetch)
+    deleter = DeleteBatcher(sqs_client, queue_url)
+    leases = LeaseManager(sqs_client, queue_url, get_visibility_timeout(sqs_client, queue_url))
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'processed': 0, 'failed': 0, 'in_flight': 0}
+    tag = queue_tag(queue_url)
+    started = time.perf_counter()
+
+    def work(message):
+        success = run_handler(handler, queue_name, message, tag)
+        if success:
+            leases.complete(message['ReceiptHandle'])
+            deleter.delete(message['ReceiptHandle'])
+        else:
+            leases.release(message['ReceiptHandle'])
+        with lock:
+            counts['in_flight'] -= 1
+            counts['processed' if success else 'failed'] += 1
+            if max_messages and counts['processed'] >= max_messages:
+                stop.set()
+        slots.release()
+
+    def poll(executor):
+        while not stop.is_set():
+            # Block until a worker slot frees up, then grab as many as are free
+            if not slots.acquire(timeout=1):
+                continue
+            wanted = 1
+            while wanted < 10 and slots.acquire(blocking=False):
+                wanted += 1
+            try:
+                with span('sqs.receive', queue=tag):
+                    response = sqs_client.receive_message(
+                        QueueUrl=queue_url,
+                        MaxNumberOfMessages=wanted,
+                        WaitTimeSeconds=20,
+                        MessageAttributeNames=['All']
+                    )
+            except Exception as e:
+                print(f"❌ Error consuming messages: {e}")
+                for _ in range(wanted):
+                    slots.release()
+                stop.set()
+                break
+
+            messages = response.get('Messages', [])
+            incr('sqs.messages_received', len(messages), queue=tag)
+            for _ in range(wanted - len(messages)):
+                slots.release()
+            if not messages:
+                incr('sqs.empty_receives', queue=tag)
+                with lock:
+                    drained = counts['processed'] + counts['failed'] > 0 and counts['in_flight'] == 0
+                if drained:
+                    stop.set()  # Queue looks empty and all work is done
+                continue
+
+            with lock:
+                counts['in_flight'] += len(messages)
+            for message in messages:
+                leases.track(message)
+                executor.submit(work, message)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            threads = [threading.Thread(target=poll, args=(executor,), daemon=True) for _ in range(pollers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        stop.set()
+    finally:
+        leases.close()
+        deleter.close()
+    counts['processed'] -= len(deleter.failed)  # Still on the queue, so they will be delivered again
+
+    elapsed = time.perf_counter() - started
+    rate = counts['processed'] / elapsed if elapsed > 0 else 0.0
+    print(f"\n✅ Processed {counts['processed']} messages from {queue_name} "
+          f"({counts['failed']} failed, {rate:.1f} msgs/sec)")
+    print(f"   🗑️  Deleted {deleter.deleted} messages in {deleter.api_calls} DeleteMessageBatch calls")
+    return counts['processed']
+
+def get_queue_depth(sqs_client, queue_url):
+    """ApproximateNumberOfMessages, or None if it cannot be read"""
+    try:
+        response = sqs_client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['ApproximateNumberOfMessages'])
+        return int(response['Attributes']['ApproximateNumberOfMessages'])
+    except Exception as e:
+        print(f"⚠️  Could not read queue depth: {e}")
+        return None
+
+def consume_queue_adaptive(sqs_client, queue_url, queue_name, max_messages=10, handler=process_message,
+                           controller=None, idle_timeout=60):
+    """
+    Consume a queue with a pool of pollers sized by a PollController.
+
+    Each active poller receives a batch and processes it serially; the
+    controller decides how many pollers are active, how long they wait and
+    how many messages they ask for. The consumer keeps running through
+    empty receives and stops once nothing has arrived for idle_timeout
+    seconds (None runs until max_messages or Ctrl-C).
+
+    On a FIFO queue, a failed message hands the rest of its group in the
+    batch back unprocessed, so the group is redelivered in order.
+    """
+    visibility_timeout = get_visibility_timeout(sqs_client, queue_url)
+    fifo = queue_url.endswith('.fifo')
+    controller = controller or PollController(visibility_timeout=visibility_timeout)
+    print(f"\n{'='*60}")
+    print(f"📬 Consuming from: {queue_name} (adaptive, {controller.min_pollers}-{controller.max_pollers} pollers)")
+    print(f"{'='*60}")
+
+    deleter = DeleteBatcher(sqs_client, queue_url)
+    leases = LeaseManager(sqs_client, queue_url, visibility_timeout)
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'processed': 0, 'failed': 0, 'skipped': 0}
+    tag = queue_tag(queue_url)
+    last_message = [time.monotonic()]
+    started = time.perf_counter()
+
+    def poll(index):
+        while not stop.is_set():
+            if not controller.wait_until_active(index, timeout=0.5):
+                continue
+            if controller.sample_due():
+                depth = get_queue_depth(sqs_client, queue_url)
+                if depth is not None:
+                    controller.record_depth(depth)
+
+            wait_seconds, batch_size = controller.plan()
+            receive_started = time.perf_counter()
+            try:
+                with span('sqs.receive', queue=tag):
+                    response = sqs_client.receive_message(
+                        QueueUrl=queue_url,
+                        MaxNumberOfMessages=batch_size,
+                        WaitTimeSeconds=wait_seconds,
+                        MessageAttributeNames=['All'],
+                        AttributeNames=['MessageGroupId'] if fifo else []
+                    )
+            except Exception as e:
+                print(f"❌ Error consuming messages: {e}")
+                stop.set()
+                break
+            messages = response.get('Messages', [])
+            controller.record_receive(batch_size, len(messages), time.perf_counter() - receive_started)
+            incr('sqs.messages_received', len(messages), queue=tag)
+
+            if not messages:
+                incr('sqs.empty_receives', queue=tag)
+                with lock:
+                    idle = time.monotonic() - last_message[0]
+                if idle_timeout is not None and idle >= idle_timeout:
+                    stop.set()
+                continue
+
+            with lock:
+                last_message[0] = time.monotonic()
+            for message in messages:
+                leases.track(message)
+            failed_groups = set()
+            for message in messages:
+                group_id = message.get('Attributes', {}).get('MessageGroupId')
+                if group_id is not None and group_id in failed_groups:
+                    # An earlier message of this group failed; running this one would break the group's order
+                    leases.release(message['ReceiptHandle'])
+                    with lock:
+                        counts['skipped'] += 1
+                    continue
+                handler_started = time.perf_counter()
+                success = run_handler(handler, queue_name, message, tag)
+                controller.record_handler(time.perf_counter() - handler_started)
+                if success:
+                    leases.complete(message['ReceiptHandle'])
+                    deleter.delete(message['ReceiptHandle'])
+                else:
+                    leases.release(message['ReceiptHandle'])
+                    if group_id is not None:
+                        failed_groups.add(group_id)
+                with lock:
+                    counts['processed' if success else 'failed'] += 1
+                    if max_messages and counts['processed'] >= max_messages:
+                        stop.set()
+
+    threads = [threading.Thread(target=poll, args=(index,), daemon=True) for index in range(controller.max_pollers)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        stop.set()
+    finally:
+        leases.close()
+        deleter.close()
+    counts['processed'] -= len(deleter.failed)  # Still on the queue, so they will be delivered again
+
+    elapsed = time.perf_counter() - started
+    rate = counts['processed'] / elapsed if elapsed > 0 else 0.0
+    stats = controller.stats()
+    print(f"\n✅ Processed {counts['processed']} messages from {queue_name} "
+          f"({counts['failed']} failed, {counts['skipped']} left for redelivery, {rate:.1f} msgs/sec)")
+    print(f"   📈 Pollers peaked at {stats['peak_pollers']} ({stats['resizes']} resizes); "
+          f"{stats['receives']} receives, {stats['empty_receives']} empty")
+    return counts['processed']
+
+class GroupDispatcher:
+    """
+    Runs FIFO messages on per-MessageGroupId serial lanes.
+
+    Messages of one group are handled one at a time in the order they were
+    dispatched, while different groups run in parallel on the executor. If
+    a handler fails, the rest of that group's buffered messages are skipped
+    (left on the queue) so they are redelivered in order after the failed one.
+    """
+
+    def __init__(self, executor, handler, on_done):
+        self.executor = executor
+        self.handler = handler
+        self.on_done = on_done
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def dispatch(self, message):
+        """Append a message to its group's lane, starting the lane if idle"""
+        group_id = message.get('Attributes', {}).get('MessageGroupId', '')
+        with self._lock:
+            lane = self._lanes.get(group_id)
+            if lane is not None:
+                lane.append(message)
+                return
+            self._lanes[group_id] = deque([message])
+        self.executor.submit(self._run_lane, group_id)
+
+    def active_groups(self):
+        """Number of groups with buffered or running messages"""
+        with self._lock:
+            return len(self._lanes)
+
+    def _run_lane(self, group_id):
+        failed = False
+        while True:
+            with self._lock:
+                lane = self._lanes[group_id]
+                if not lane:
+                    del self._lanes[group_id]
+                    return
+                message = lane.popleft()
+            if failed:
+                self.on_done(message, None)  # Skipped to keep the group in order
+                continue
+            try:
+                success = self.handler(message)
+            except Exception as e:
+                print(f"❌ Error processing message {message['MessageId']}: {e}")
+                success = False
+            failed = not success
+            self.on_done(message, success)
+
+def consume_fifo_parallel(sqs_client, queue_url, queue_name, max_messages=10, lanes=8,
+                          handler=process_message, max_buffered=100):
+    """
+    Consume a FIFO queue with one serial lane per message group.
+
+    Ordering holds within each MessageGroupId; independent groups (one per
+    payment here) are processed in parallel on up to `lanes` threads.
+    """
+    print(f"\n{'='*60}")
+    print(f"📬 Consuming from: {queue_name} ({lanes} parallel group lanes)")
+    print(f"{'='*60}")
+
+    slots = threading.BoundedSemaphore(max_buffered)
+    deleter = DeleteBatcher(sqs_client, queue_url)
+    leases = LeaseManager(sqs_client, queue_url, get_visibility_timeout(sqs_client, queue_url))
+    lock = threading.Lock()
+    counts = {'processed': 0, 'failed': 0, 'skipped': 0, 'in_flight': 0}
+    tag = queue_tag(queue_url)
+    started = time.perf_counter()
+
+    def on_done(message, success):
+        if success:
+            leases.complete(message['ReceiptHandle'])
+            deleter.delete(message['ReceiptHandle'])
+        else:
+            # Failed and skipped messages go back together, so the group is retried in order
+            leases.release(message['ReceiptHandle'])
+        with lock:
+            counts['in_flight'] -= 1
+            counts['processed' if success else 'skipped' if success is None else 'failed'] += 1
+        slots.release()
+
+    with ThreadPoolExecutor(max_workers=lanes) as executor:
+        dispatcher = GroupDispatcher(executor, lambda message: run_handler(handler, queue_name, message, tag),
+                                     on_done)
+        try:
+            while not max_messages or counts['processed'] < max_messages:
+                slots.acquire()
+                wanted = 1
+                while wanted < 10 and slots.acquire(blocking=False):
+                    wanted += 1
+                with span('sqs.receive', queue=tag):
+                    response = sqs_client.receive_message(
+                        QueueUrl=queue_url,
+                        MaxNumberOfMessages=wanted,
+                        WaitTimeSeconds=20,
+                        AttributeNames=['MessageGroupId', 'SequenceNumber'],
+                        MessageAttributeNames=['All']
+                    )
+                messages = response.get('Messages', [])
+                incr('sqs.messages_received', len(messages), queue=tag)
+                for _ in range(wanted - len(messages)):
+                    slots.release()
+                if not messages:
+                    incr('sqs.empty_receives', queue=tag)
+                    with lock:
+                        drained = counts['in_flight'] == 0 and counts['processed'] + counts['failed'] > 0
+                    if drained:
+                        break
+                    continue
+                with lock:
+                    counts['in_flight'] += len(messages)
+                for message in messages:
+                    leases.track(message)
+                    dispatcher.dispatch(message)
+        except KeyboardInterrupt:
+            print("\n\n⚠️  Interrupted by user")
+        except Exception as e:
+            print(f"❌ Error consuming messages: {e}")
+    leases.close()
+    deleter.close()
+    counts['processed'] -= len(deleter.failed)  # Still on the queue, so they will be delivered again
+
+    elapsed = time.perf_counter() - started
+    rate = counts['processed'] / elapsed if elapsed > 0 else 0.0
+    print(f"\n✅ Processed {counts['processed']} messages from {queue_name} "
+          f"({counts['failed']} failed, {counts['skipped']} left for redelivery, {rate:.1f} msgs/sec)")
+    return counts['processed']
+
+def consume_queues_scheduled(sqs_client, queues, workers=16, policy='weighted', max_messages=10,
+                             handler=process_message, idle_timeout=60):
+    """
+    Consume several queues at once on one shared worker pool.
+
+    `queues` is a list of dicts with queue_url and name, plus optional
+    weight, priority (lower runs first), max_concurrency and prefetch. One
+    poller per queue long-polls whenever its buffer has room, and a
+    QueueScheduler decides which buffered message each free worker runs
+    next. A queue stops after max_messages, once it drains, or after
+    idle_timeout seconds without messages. Returns processed counts by name.
+    """
+    scheduler = QueueScheduler(workers, policy)
+    lanes = {}
+    for spec in queues:
+        visibility_timeout = get_visibility_timeout(sqs_client, spec['queue_url'])
+        queue = scheduler.add_queue(spec['name'], spec.get('weight', 1), spec.get('priority', 0),
+                                    spec.get('max_concurrency'), spec.get('prefetch'),
+                                    fifo=spec['queue_url'].endswith('.fifo'))
+        lanes[queue] = {
+            'queue_url': spec['queue_url'],
+            'tag': queue_tag(spec['queue_url']),
+            'leases': LeaseManager(sqs_client, spec['queue_url'], visibility_timeout),
+            'deleter': DeleteBatcher(sqs_client, spec['queue_url']),
+            'processed': 0, 'failed': 0, 'released': 0, 'latencies': [],
+            'last_message': time.monotonic()
+        }
+
+    print(f"\n{'='*60}")
+    print(f"📬 Consuming from {len(queues)} queues ({policy} scheduling, {workers} shared workers)")
+    for queue in scheduler.queues:
+        print(f"   {queue.name}: priority {queue.priority}, weight {queue.weight}, "
+              f"up to {queue.max_concurrency} workers")
+    print(f"{'='*60}")
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def poll(queue):
+        lane = lanes[queue]
+        while not stop.is_set():
+            with lock:
+                if max_messages and lane['processed'] >= max_messages:
+                    break
+            wanted = scheduler.wait_for_room(queue, timeout=0.5)
+            if not wanted:
+                continue
+            try:
+                with span('sqs.receive', queue=lane['tag']):
+                    response = sqs_client.receive_message(
+                        QueueUrl=lane['queue_url'],
+                        MaxNumberOfMessages=wanted,
+                        WaitTimeSeconds=20,
+                        AttributeNames=['MessageGroupId'],
+                        MessageAttributeNames=['All']
+                    )
+            except Exception as e:
+                print(f"❌ Error consuming messages from {queue.name}: {e}")
+                break
+            messages = response.get('Messages', [])
+            incr('sqs.messages_received', len(messages), queue=lane['tag'])
+            if not messages:
+                incr('sqs.empty_receives', queue=lane['tag'])
+                with lock:
+                    handled = lane['processed'] + lane['failed'] > 0
+                    idle = time.monotonic() - lane['last_message']
+                if (handled and scheduler.idle(queue)) or (idle_timeout is not None and idle >= idle_timeout):
+                    break
+                continue
+            with lock:
+                lane['last_message'] = time.monotonic()
+            for message in messages:
+                lane['leases'].track(message)
+            scheduler.push(queue, messages)
+        scheduler.finish(queue)
+
+    def work():
+        while True:
+            picked = scheduler.next_message(timeout=0.5)
+            if picked is None:
+                if stop.is_set() or scheduler.drained():
+                    return
+                continue
+            queue, message, received_at = picked
+            lane = lanes[queue]
+            observe('sqs.schedule_wait', (time.monotonic() - received_at) * 1000, queue=lane['tag'])
+            success = run_handler(handler, queue.name, message, lane['tag'])
+            released = scheduler.complete(queue, message, success)
+            if success:
+                lane['leases'].complete(message['ReceiptHandle'])
+                lane['deleter'].delete(message['ReceiptHandle'])
+            else:
+                lane['leases'].release(message['ReceiptHandle'])
+            for follower in released:
+                # The rest of a failed FIFO group goes back so it is redelivered in order
+                lane['leases'].release(follower['ReceiptHandle'])
+            with lock:
+                lane['processed' if success else 'failed'] += 1
+                lane['released'] += len(released)
+                lane['latencies'].append(time.monotonic() - received_at)
+
+    threads = [threading.Thread(target=poll, args=(queue,), daemon=True) for queue in scheduler.queues]
+    threads += [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        stop.set()
+        scheduler.close()
+    finally:
+        for lane in lanes.values():
+            lane['leases'].close()
+            lane['deleter'].close()
+            lane['processed'] -= len(lane['deleter'].failed)  # Still on the queue, so they will be delivered again
+
+    elapsed = time.perf_counter() - started
+    stats = scheduler.stats()
+    print(f"\n✅ Scheduled consumer finished in {elapsed:.1f}s")
+    for queue, lane in lanes.items():
+        print(f"   {queue.name}: {lane['processed']} processed, {lane['failed']} failed, "
+              f"{lane['released']} left for redelivery")
+        p50, p95 = (percentile(lane['latencies'], pct) * 1000 for pct in (50, 95))
+        print(f"      receive-to-done p50 {p50:.1f} ms, p95 {p95:.1f} ms; "
+              f"peak {stats[queue.name]['peak_running']} workers")
+    return {queue.name: lane['processed'] for queue, lane in lanes.items()}
+
+async def delete_batch_async(transport, queue_url, receipt_handles, tag, attempts=2):
+    """
+    Delete up to 10 messages over the async transport; returns how many were deleted.
+
+    Failed entries are retried once and then logged. Those messages become
+    visible again when their visibility timeout runs out, so they are
+    processed a second time.
+    """
+    deleted = 0
+    pending = list(receipt_handles)
+    for attempt in range(attempts):
+        try:
+            with span('sqs.delete_batch', queue=tag):
+                response = await transport.delete_batch(queue_url, pending)
+        except Exception as e:
+            response = {'Failed': [{'Id': str(i), 'Code': type(e).__name__, 'Message': str(e)}
+                                   for i in range(len(pending))]}
+        succeeded = len(response.get('Successful', []))
+        incr('sqs.messages_deleted', succeeded, queue=tag)
+        deleted += succeeded
+        failed = response.get('Failed', [])
+        if not failed:
+            break
+        if attempt == attempts - 1:
+            for entry in failed:
+                print(f"⚠️  Could not delete message: {entry.get('Code')} {entry.get('Message', '')}")
+        pending = [pending[int(entry['Id'])] for entry in failed]
+    return deleted
+
+async def consume_queue_async(transport, queue_url, queue_name, max_messages=10, pollers=8,
+                              handler=process_message):
+    """
+    Consume a queue with several long-poll coroutines on the asyncio transport.
+
+    Messages of one receive are grouped by MessageGroupId: groups run
+    concurrently, messages within a group one after another, so the same
+    loop serves Standard and FIFO queues. Handlers run on a thread pool.
+    """
+    print(f"\n{'='*60}")
+    print(f"📬 Consuming from: {queue_name} ({pollers} async pollers)")
+    print(f"{'='*60}")
+
+    loop = asyncio.get_running_loop()
+    sqs_client = transport.client('sqs')
+    visibility_timeout = await loop.run_in_executor(None, get_visibility_timeout, sqs_client, queue_url)
+    leases = LeaseManager(sqs_client, queue_url, visibility_timeout)
+    counts = {'processed': 0, 'failed': 0}
+    tag = queue_tag(queue_url)
+    stop = asyncio.Event()
+
+    async def run_group(messages):
+        done = []
+        for index, message in enumerate(messages):
+            success = await loop.run_in_executor(None, run_handler, handler, queue_name, message, tag)
+            if not success:
+                # Hand the rest of the group back so it is redelivered in order
+                for failed in messages[index:]:
+                    leases.release(failed['ReceiptHandle'])
+                counts['failed'] += 1
+                break
+            leases.complete(message['ReceiptHandle'])
+            done.append(message['ReceiptHandle'])
+        return done
+
+    async def poll():
+        while not stop.is_set():
+            try:
+                with span('sqs.receive', queue=tag):
+                    messages = await transport.receive(queue_url, AttributeNames=['MessageGroupId'])
+            except Exception as e:
+                print(f"❌ Error consuming messages: {e}")
+                stop.set()
+                break
+            incr('sqs.messages_received', len(messages), queue=tag)
+            if not messages:
+                incr('sqs.empty_receives', queue=tag)
+                if counts['processed'] > 0:
+                    stop.set()
+                continue
+
+            groups = {}
+            for message in messages:
+                leases.track(message)
+                group_id = message.get('Attributes', {}).get('MessageGroupId', message['MessageId'])
+                groups.setdefault(group_id, []).append(message)
+            results = await asyncio.gather(*[run_group(group) for group in groups.values()])
+            done = [receipt_handle for group_done in results for receipt_handle in group_done]
+            if done:
+                deleted = await delete_batch_async(transport, queue_url, done, tag)
+                counts['processed'] += deleted
+            if max_messages and counts['processed'] >= max_messages:
+                stop.set()
+
+    try:
+        await asyncio.gather(*[poll() for _ in range(pollers)])
+    finally:
+        leases.close()
+
+    print(f"\n✅ Processed {counts['processed']} messages from {queue_name} ({counts['failed']} failed)")
+    return counts['processed']
+
+async def consume_async(standard_queue_url, fifo_queue_url, max_messages, pollers, handler=process_message,
+                        sqs_client=None):
+    """Drain both queues at the same time over one pooled transport (sqs_client, e.g. local, is reused)"""
+    async with AsyncTransport(clients={'sqs': sqs_client} if sqs_client else None) as transport:
+        await asyncio.gather(
+            consume_queue_async(transport, standard_queue_url, "Standard Queue (Order Notifications)",
+                                max_messages, pollers, handler),
+            consume_queue_async(transport, fifo_queue_url, "FIFO Queue (Payment Processing)",
+                                max_messages, pollers, handler)
+        )
+
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 consumer.py <standard_queue_url> <fifo_queue_url> [max_messages]")
+    local = '--local' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--local']
+    if len(args) < 2 and not local:
+        print("Usage: python3 consumer.py (<standard_queue_url> <fifo_queue_url> | --local) [max_messages] "
+              "[--concurrent | --async | --adaptive | --scheduled] [--policy weighted|strict] [--pollers N] "
+              "[--workers N] [--lanes N] [--claim-check DIR] "
+              "[--metrics emf|statsd|prometheus] [--quiet]")
         print("Example: python3 consumer.py https://sqs.us-east-1.amazonaws.com/123456789/order-notifications-queue https://sqs.us-east-1.amazonaws.com/123456789/payment-processing-queue.fifo 10")
         sys.exit(1)
     
-    standard_queue_url = sys.argv[1]
-    fifo_queue_url = sys.argv[2]
-    max_messages = int(sys.argv[3]) if len(sys.argv) > 3 else 10
-    
-    sqs_client = boto3.client('sqs')
+    options = args if local else args[2:]
+    max_messages = 10
+    if options and not options[0].startswith('--'):
+        if not options[0].isdigit():
+            usage_error(f"Invalid max_messages: {options[0]!r}")
+        max_messages = int(options[0])
+    concurrent = '--concurrent' in options
+    async_mode = '--async' in options
+    adaptive = '--adaptive' in options
+    scheduled = '--scheduled' in options
+    policy = get_option(options, '--policy', 'weighted', choices=('weighted', 'strict'))
+    pollers = get_option(options, '--pollers', 4)
+    workers = get_option(options, '--workers', 16)
+    lanes = get_option(options, '--lanes', 8)
+    handler = process_message
+    claim_check_dir = get_option(options, '--claim-check', '')
+    if claim_check_dir:
+        handler = with_claim_check(process_message, ClaimCheck(LocalObjectStore(claim_check_dir)))
+    configure_from_args(options)
+
+    if local:
+        # In-process queues built from template.yaml live only for this run, so they start with the sample orders
+        from local_sqs import local_lab_queues  # Needs PyYAML, so only imported for --local
+        sqs_client, standard_queue_url, fifo_queue_url = local_lab_queues()
+        send_batched(sqs_client, standard_queue_url, fifo_queue_url, SAMPLE_ORDERS)
+    else:
+        sqs_client = None
+        standard_queue_url, fifo_queue_url = args[:2]
     
     print("=" * 60)
     print("📥 SQS Consumer - Processing Messages")
     print("=" * 60)
     
+    if async_mode:
+        asyncio.run(consume_async(standard_queue_url, fifo_queue_url, max_messages, pollers, handler, sqs_client))
+        print("\n" + "=" * 60)
+        print("✅ Consumer finished!")
+        print("=" * 60)
+        return
+    
+    sqs_client = sqs_client or boto3.client('sqs')
+    
+    if scheduled:
+        # Both queues at once on one worker pool: payments are served first (strict) or 4:1 (weighted),
+        # and notifications can hold at most 3/4 of the workers, so a flood never blocks payments
+        queues = [
+            {'queue_url': fifo_queue_url, 'name': "FIFO Queue (Payment Processing)", 'priority': 0, 'weight': 4},
+            {'queue_url': standard_queue_url, 'name': "Standard Queue (Order Notifications)", 'priority': 1,
+             'weight': 1, 'max_concurrency': max(1, workers * 3 // 4)}
+        ]
+        consume_queues_scheduled(sqs_client, queues, workers, policy, max_messages, handler)
+        print("\n" + "=" * 60)
+        print("✅ Consumer finished!")
+        print("=" * 60)
+        return
+    
+    if adaptive:
+        # Pollers scale between 1 and --pollers with the backlog; idle queues fall back to one long poll
+        for queue_url, queue_name in [(standard_queue_url, "Standard Queue (Order Notifications)"),
+                                      (fifo_queue_url, "FIFO Queue (Payment Processing)")]:
+            controller = PollController(max_pollers=pollers,
+                                        visibility_timeout=get_visibility_timeout(sqs_client, queue_url))
+            consume_queue_adaptive(sqs_client, queue_url, queue_name, max_messages, handler, controller)
+        print("\n" + "=" * 60)
+        print("✅ Consumer finished!")
+        print("=" * 60)
+        return
+    
+    if concurrent:
+        consume_queue_concurrent(sqs_client, standard_queue_url, "Standard Queue (Order Notifications)",
+                                 max_messages, pollers, workers, handler)
+        # FIFO ordering only has to hold per payment, so groups run on parallel lanes
+        consume_fifo_parallel(sqs_client, fifo_queue_url, "FIFO Queue (Payment Processing)", max_messages, lanes,
+                              handler)
+        print("\n" + "=" * 60)
+        print("✅ Consumer finished!")
+        print("=" * 60)
+        return
+    
     # Consume from Standard Queue
-    consume_queue(sqs_client, standard_queue_url, "Standard Queue (Order Notifications)", max_messages)
+    consume_queue(sqs_client, standard_queue_url, "Standard Queue (Order Notifications)", max_messages, handler)
     
     # Consume from FIFO Queue
-    consume_queue(sqs_client, fifo_queue_url, "FIFO Queue (Payment Processing)", max_messages)
+    consume_queue(sqs_client, fifo_queue_url, "FIFO Queue (Payment Processing)", max_messages, handler)
     
     print("\n" + "=" * 60)
     print("✅ Consumer finished!")
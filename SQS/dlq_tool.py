@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+SQS Dead-Letter Queue Tool
+Snapshots a DLQ, groups its messages by failure signature and message type,
+and redrives selected messages back to their source queue at a controlled rate
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from cli import get_option
+from consumer import DeleteBatcher, get_queue_depth
+from message_codec import decode_body
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional; only Parquet snapshots need it
+    pyarrow = None
+
+TYPE_ATTRIBUTES = ['message_type', 'OrderType', 'PaymentType']
+# Ids, numbers and hex strings vary between otherwise identical errors
+VOLATILE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|0x[0-9a-f]+|\d+', re.IGNORECASE)
+
+def attribute_values(message_attributes):
+    """{name: value} for SQS ({'StringValue': ...}) or SNS envelope ({'Value': ...}) attributes"""
+    return {name: value.get('StringValue', value.get('Value', value.get('BinaryValue')))
+            for name, value in (message_attributes or {}).items()}
+
+def unwrap(message):
+    """(body, decode error, attributes) of a message, looking inside SNS notification envelopes"""
+    attributes = attribute_values(message.get('MessageAttributes'))
+    try:
+        body = decode_body(message['Body'])
+    except Exception as e:
+        return None, e, attributes
+    if isinstance(body, dict) and body.get('Type') == 'Notification' and 'Message' in body:
+        attributes.update(attribute_values(body.get('MessageAttributes')))
+        try:
+            return decode_body(body['Message']), None, attributes
+        except Exception as e:
+            return None, e, attributes
+    return body, None, attributes
+
+def error_signature(body, error, attributes):
+    """
+    Group key for why a message failed.
+
+    Lambda async-invocation DLQs carry ErrorCode/ErrorMessage attributes,
+    which are used with their volatile parts masked. Otherwise the shape
+    of the body stands in for the error: undecodable bodies, non-object
+    bodies, and objects by their set of top-level fields.
+    """
+    if 'ErrorMessage' in attributes or 'ErrorCode' in attributes:
+        return f"{attributes.get('ErrorCode', 'Error')}: {VOLATILE.sub('#', attributes.get('ErrorMessage', ''))}"
+    if error is not None:
+        return f"undecodable body ({type(error).__name__})"
+    if not isinstance(body, dict):
+        return f"non-object body ({type(body).__name__})"
+    return "fields: " + ",".join(sorted(body))
+
+def message_type(body, attributes):
+    for name in TYPE_ATTRIBUTES:
+        if attributes.get(name):
+            return attributes[name]
+    if isinstance(body, dict) and body.get('type'):
+        return body['type']
+    return 'unknown'
+
+def classify(message):
+    """A snapshot record for one DLQ message"""
+    body, error, attributes = unwrap(message)
+    system = message.get('Attributes', {})
+    return {
+        'message_id': message['MessageId'],
+        'message_type': message_type(body, attributes),
+        'signature': error_signature(body, error, attributes),
+        'receive_count': int(system.get('ApproximateReceiveCount', 0)),
+        'sent_timestamp': int(system.get('SentTimestamp', 0)),
+        'source_arn': system.get('DeadLetterQueueSourceArn'),
+        'group_id': system.get('MessageGroupId'),
+        'message_attributes': message.get('MessageAttributes', {}),
+        'body': message['Body']
+    }
+
+class SnapshotWriter:
+    """
+    Writes snapshot records to JSONL as they arrive, or to Parquet on close.
+
+    Parquet needs pyarrow; attribute maps are stored as JSON strings so
+    every row has the same flat schema.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self.written = 0
+        self._rows = []
+        self._lock = threading.Lock()
+        if self.parquet:
+            if pyarrow is None:
+                raise RuntimeError("Parquet snapshots need pyarrow (pip install pyarrow); use a .jsonl path instead")
+            self._file = None
+        else:
+            self._file = open(path, 'w')
+
+    def write(self, records):
+        with self._lock:
+            if self.parquet:
+                self._rows.extend(dict(record, message_attributes=json.dumps(record['message_attributes']))
+                                  for record in records)
+            else:
+                for record in records:
+                    self._file.write(json.dumps(record) + '\n')
+            self.written += len(records)
+
+    def close(self):
+        if self.parquet:
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(self._rows), self.path)
+        else:
+            self._file.close()
+
+class RateLimiter:
+    """
+    Token bucket shared by all pollers; rate=None means unlimited.
+
+    A batch takes all of its tokens at once and may drive the bucket into
+    debt; the caller then sleeps until the debt is paid off, so rates below
+    1/sec or below the batch size still average out to `rate`.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = float(rate or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, count):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= count
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+def drain(sqs_client, queue_url, on_batch, pollers=8, hold_seconds=900, wait_seconds=2, empty_receives=2):
+    """
+    Receive every visible message of a queue with parallel pollers.
+
+    Received messages stay hidden for hold_seconds, so each one is seen
+    once per pass. on_batch(messages) returns (keep_going, held), where
+    held are the receipt handles it left on the queue. Pollers stop after
+    `empty_receives` consecutive empty long polls, or once on_batch says
+    not to keep going. Returns every held receipt handle.
+    """
+    stop = threading.Event()
+    lock = threading.Lock()
+    held = []
+
+    def poll():
+        empties = 0
+        while not stop.is_set() and empties < empty_receives:
+            try:
+                response = sqs_client.receive_message(
+                    QueueUrl=queue_url,
+                    MaxNumberOfMessages=10,
+                    WaitTimeSeconds=wait_seconds,
+                    VisibilityTimeout=hold_seconds,
+                    AttributeNames=['All'],
+                    MessageAttributeNames=['All']
+                )
+            except Exception as e:
+                print(f"❌ Error receiving from DLQ: {e}")
+                stop.set()
+                break
+            messages = response.get('Messages', [])
+            if not messages:
+                empties += 1
+                continue
+            empties = 0
+            keep_going, kept = on_batch(messages)
+            with lock:
+                held.extend(kept)
+            if not keep_going:
+                stop.set()
+
+    threads = [threading.Thread(target=poll, daemon=True) for _ in range(pollers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return held
+
+def release(sqs_client, queue_url, receipt_handles):
+    """Make held messages visible again, 10 per ChangeMessageVisibilityBatch call"""
+    for start in range(0, len(receipt_handles), 10):
+        entries = [{'Id': str(i), 'ReceiptHandle': receipt_handle, 'VisibilityTimeout': 0}
+                   for i, receipt_handle in enumerate(receipt_handles[start:start + 10])]
+        try:
+            sqs_client.change_message_visibility_batch(QueueUrl=queue_url, Entries=entries)
+        except Exception as e:
+            print(f"⚠️  Could not release {len(entries)} messages: {e}")
+
+def analyze(sqs_client, dlq_url, snapshot_path=None, pollers=8, hold_seconds=900):
+    """
+    Snapshot every message of a DLQ and count them per (message type, signature); nothing is deleted.
+
+    On a FIFO DLQ, SQS returns no further messages of a MessageGroupId
+    while its first ones are in flight, and returns those same first ones
+    again once they are released. Only the first batch of each group can be
+    read without deleting, so a shortfall against the queue depth is
+    reported instead of being silently left out of the counts.
+    """
+    writer = SnapshotWriter(snapshot_path) if snapshot_path else None
+    groups = {}
+    message_groups = set()
+    lock = threading.Lock()
+    fifo = dlq_url.endswith('.fifo')
+    depth = get_queue_depth(sqs_client, dlq_url) if fifo else None
+
+    def on_batch(messages):
+        records = [classify(message) for message in messages]
+        with lock:
+            for record in records:
+                add_to_group(groups, record)
+                message_groups.add(record['group_id'])
+        if writer:
+            writer.write(records)
+        return True, [message['ReceiptHandle'] for message in messages]
+
+    started = time.perf_counter()
+    held = drain(sqs_client, dlq_url, on_batch, pollers, hold_seconds)
+    elapsed = time.perf_counter() - started
+    release(sqs_client, dlq_url, held)
+    if writer:
+        writer.close()
+        print(f"📝 Snapshot of {writer.written} messages written to {snapshot_path}")
+    print(f"⏱️  Read {len(held)} messages in {elapsed:.1f}s ({len(held) / elapsed if elapsed else 0:.0f} msgs/sec)")
+    if depth and len(held) < depth:
+        print(f"⚠️  Only {len(held)} of ~{depth} messages could be read: SQS holds back the rest of a FIFO message "
+              f"group while its first messages are in flight, so the counts cover the first batch of each of "
+              f"{len(message_groups)} groups. `redrive` deletes as it goes and walks whole groups in order.")
+    return groups
+
+def add_to_group(groups, record):
+    key = (record['message_type'], record['signature'])
+    group = groups.get(key)
+    if group is None:
+        group = groups[key] = {'count': 0, 'oldest': record['sent_timestamp'], 'max_receives': 0,
+                               'sample': record['message_id']}
+    group['count'] += 1
+    group['oldest'] = min(group['oldest'], record['sent_timestamp'])
+    group['max_receives'] = max(group['max_receives'], record['receive_count'])
+
+def print_report(groups):
+    total = sum(group['count'] for group in groups.values())
+    print(f"\n{'Count':>7}  {'Type':<22} {'Oldest (UTC)':<20} {'Receives':>8}  Signature")
+    print("-" * 100)
+    for (kind, signature), group in sorted(groups.items(), key=lambda item: -item[1]['count']):
+        oldest = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(group['oldest'] / 1000))
+        print(f"{group['count']:>7}  {kind:<22} {oldest:<20} {group['max_receives']:>8}  {signature}")
+        print(f"{'':>9}sample: {group['sample']}")
+    print(f"\n📊 {total} messages in {len(groups)} groups")
+
+def redrive_entry(entry_id, message, fifo):
+    """A SendMessageBatch entry that recreates a DLQ message on its source queue"""
+    entry = {'Id': entry_id, 'MessageBody': message['Body']}
+    attributes = {name: {key: value[key] for key in ('DataType', 'StringValue', 'BinaryValue') if key in value}
+                  for name, value in message.get('MessageAttributes', {}).items()}
+    if attributes:
+        entry['MessageAttributes'] = attributes
+    if fifo:
+        entry['MessageGroupId'] = message.get('Attributes', {}).get('MessageGroupId', message['MessageId'])
+        # The original deduplication id may still be inside its 5-minute window on the source queue
+        entry['MessageDeduplicationId'] = f"redrive-{message['MessageId']}"
+    return entry
+
+def redrive(sqs_client, dlq_url, target_url=None, select=None, rate=None, limit=0, pollers=8,
+            hold_seconds=900, snapshot_path=None):
+    """
+    Move selected DLQ messages back to a queue.
+
+    Messages go to target_url, or to the queue named by their
+    DeadLetterQueueSourceArn. Each received batch is filtered with
+    select(record), sent with one SendMessageBatch call per target (no
+    faster than `rate` messages/sec overall) and deleted from the DLQ only
+    once the send succeeded. Unselected and failed messages are made
+    visible again at the end.
+
+    On a FIFO DLQ a message that stays behind also holds back the rest of
+    its MessageGroupId (SQS delivers a group in order), so those later
+    messages stay on the DLQ, still in order; blocked_groups counts them.
+    """
+    writer = SnapshotWriter(snapshot_path) if snapshot_path else None
+    limiter = RateLimiter(rate)
+    deleter = DeleteBatcher(sqs_client, dlq_url)
+    urls = {}
+    lock = threading.Lock()
+    counts = {'redriven': 0, 'skipped': 0, 'failed': 0, 'reserved': 0}
+    blocked_groups = set()
+
+    def target_for(record):
+        if target_url:
+            return target_url
+        arn = record['source_arn']
+        if not arn:
+            return None
+        with lock:
+            if arn not in urls:
+                parts = arn.split(':')
+                urls[arn] = sqs_client.get_queue_url(QueueName=parts[5], QueueOwnerAWSAccountId=parts[4])['QueueUrl']
+            return urls[arn]
+
+    def on_batch(messages):
+        kept = []
+        by_target = {}
+        for message in messages:
+            record = classify(message)
+            target = target_for(record) if select is None or select(record) else None
+            with lock:
+                # A FIFO group stays in order: nothing after a message that stays behind is redriven
+                if record['group_id'] in blocked_groups:
+                    target = None
+                # Reserve a slot under the limit so parallel pollers cannot overshoot it
+                if target and limit and counts['reserved'] >= limit:
+                    target = None
+                if target is None:
+                    counts['skipped'] += 1
+                    if record['group_id']:
+                        blocked_groups.add(record['group_id'])
+                else:
+                    counts['reserved'] += 1
+            if target is None:
+                kept.append(message['ReceiptHandle'])
+                continue
+            by_target.setdefault(target, []).append((message, record))
+
+        for target, selected in by_target.items():
+            limiter.acquire(len(selected))
+            entries = [redrive_entry(str(i), message, target.endswith('.fifo'))
+                       for i, (message, _) in enumerate(selected)]
+            try:
+                response = sqs_client.send_message_batch(QueueUrl=target, Entries=entries)
+            except Exception as e:
+                response = {'Failed': [{'Id': entry['Id'], 'Message': str(e)} for entry in entries]}
+            sent = {entry['Id'] for entry in response.get('Successful', [])}
+            for i, (message, record) in enumerate(selected):
+                if str(i) in sent:
+                    deleter.delete(message['ReceiptHandle'])
+                else:
+                    kept.append(message['ReceiptHandle'])
+                    if record['group_id']:
+                        with lock:
+                            blocked_groups.add(record['group_id'])
+            if writer:
+                writer.write([record for i, (_, record) in enumerate(selected) if str(i) in sent])
+            with lock:
+                counts['redriven'] += len(sent)
+                counts['failed'] += len(selected) - len(sent)
+                counts['reserved'] -= len(selected) - len(sent)
+        with lock:
+            done = bool(limit) and counts['reserved'] >= limit
+        return not done, kept
+
+    started = time.perf_counter()
+    try:
+        held = drain(sqs_client, dlq_url, on_batch, pollers, hold_seconds)
+    finally:
+        deleter.close()
+    elapsed = time.perf_counter() - started
+    release(sqs_client, dlq_url, held)
+    if writer:
+        writer.close()
+    del counts['reserved']
+    # Sent but still on the DLQ: a later redrive would send them again
+    counts['not_deleted'] = len(deleter.failed)
+    counts['redriven'] -= counts['not_deleted']
+    counts['blocked_groups'] = len(blocked_groups)
+    counts['seconds'] = elapsed
+    counts['msgs_per_sec'] = counts['redriven'] / elapsed if elapsed else 0.0
+    return counts
+
+def build_selector(message_type_filter=None, signature_filter=None):
+    """Select by exact message type and/or a substring of the signature; None selects everything"""
+    if not message_type_filter and not signature_filter:
+        return None
+
+    def select(record):
+        if message_type_filter and record['message_type'] != message_type_filter:
+            return False
+        return not signature_filter or signature_filter in record['signature']
+    return select
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in ('analyze', 'redrive'):
+        print("Usage: python3 dlq_tool.py analyze <dlq_url> [--snapshot dlq.jsonl|dlq.parquet] [--pollers N] "
+              "[--hold SECONDS]")
+        print("       python3 dlq_tool.py redrive <dlq_url> [--to target_queue_url] [--type TYPE] "
+              "[--signature TEXT] [--rate MSGS_PER_SEC] [--limit N] [--pollers N] [--snapshot redriven.jsonl]")
+        sys.exit(1)
+
+    command, dlq_url = args[0], args[1]
+    pollers = get_option(args, '--pollers', 8)
+    hold_seconds = get_option(args, '--hold', 900)
+    snapshot_path = get_option(args, '--snapshot', '') or None
+    sqs_client = boto3.client('sqs')
+
+    print("=" * 60)
+    print(f"☠️  SQS Dead-Letter Queue Tool - {command}")
+    print("=" * 60)
+
+    if command == 'analyze':
+        print_report(analyze(sqs_client, dlq_url, snapshot_path, pollers, hold_seconds))
+        return
+
+    select = build_selector(get_option(args, '--type', ''), get_option(args, '--signature', ''))
+    counts = redrive(sqs_client, dlq_url, get_option(args, '--to', '') or None, select,
+                     get_option(args, '--rate', 0.0) or None, get_option(args, '--limit', 0), pollers,
+                     hold_seconds, snapshot_path)
+    print(f"\n✅ Redrove {counts['redriven']} messages in {counts['seconds']:.1f}s "
+          f"({counts['msgs_per_sec']:.0f} msgs/sec); {counts['skipped']} not selected, {counts['failed']} failed")
+    if counts['not_deleted']:
+        print(f"⚠️  {counts['not_deleted']} messages were sent but could not be deleted from the DLQ; "
+              f"a later redrive sends them again")
+    if counts['blocked_groups']:
+        print(f"⚠️  {counts['blocked_groups']} FIFO message groups stop at a message that was not redriven; "
+              f"their later messages stay on the DLQ in order")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+SQS Lease Manager
+Keeps in-flight messages invisible while their handlers are still running
+"""
+
+import threading
+import time
+
+MAX_VISIBILITY_SECONDS = 12 * 60 * 60  # SQS caps a message's total visibility at 12 hours
+
+def get_visibility_timeout(sqs_client, queue_url, default=30):
+    """Read the queue's VisibilityTimeout attribute"""
+    try:
+        response = sqs_client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['VisibilityTimeout'])
+        return int(response['Attributes']['VisibilityTimeout'])
+    except Exception as e:
+        print(f"⚠️  Could not read VisibilityTimeout, assuming {default}s: {e}")
+        return default
+
+class LeaseManager:
+    """
+    Renews the visibility timeout of in-flight receipt handles.
+
+    A background thread extends every lease that has used up more than half
+    of its visibility timeout, 10 handles per ChangeMessageVisibilityBatch
+    call. Releasing a lease sets its visibility to 0 so a failed message is
+    redelivered right away instead of after the timeout.
+    """
+
+    def __init__(self, sqs_client, queue_url, visibility_timeout=30, check_interval=None):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.visibility_timeout = visibility_timeout
+        self.check_interval = check_interval or max(0.5, visibility_timeout / 6.0)
+        self.renewed = 0
+        self.released = 0
+        self.api_calls = 0
+        self._leases = {}
+        self._releases = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def track(self, message):
+        """Start renewing a freshly received message"""
+        now = time.monotonic()
+        with self._lock:
+            self._leases[message['ReceiptHandle']] = {'received': now, 'expires': now + self.visibility_timeout}
+
+    def complete(self, receipt_handle):
+        """Stop renewing a message that was processed (and is being deleted)"""
+        with self._lock:
+            self._leases.pop(receipt_handle, None)
+
+    def release(self, receipt_handle):
+        """Stop renewing a message and make it visible again immediately"""
+        with self._lock:
+            self._leases.pop(receipt_handle, None)
+            self._releases.append(receipt_handle)
+            self._wakeup.notify()
+
+    def in_flight(self):
+        """Number of leases being renewed"""
+        with self._lock:
+            return len(self._leases)
+
+    def close(self):
+        """Send pending releases and stop the renewal thread"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        self._change_visibility(self._take_releases(), 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _take_releases(self):
+        with self._lock:
+            releases = self._releases
+            self._releases = []
+        return releases
+
+    def _due_for_renewal(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for receipt_handle, lease in list(self._leases.items()):
+                if lease['expires'] - now > self.visibility_timeout / 2.0:
+                    continue
+                if now - lease['received'] + self.visibility_timeout > MAX_VISIBILITY_SECONDS:
+                    del self._leases[receipt_handle]  # Cannot be extended any further
+                    continue
+                lease['expires'] = now + self.visibility_timeout
+                due.append(receipt_handle)
+        return due
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and not self._releases:
+                    self._wakeup.wait(self.check_interval)
+                if self._closed:
+                    return
+            self._change_visibility(self._take_releases(), 0)
+            self.renewed += self._change_visibility(self._due_for_renewal(), self.visibility_timeout)
+
+    def _change_visibility(self, receipt_handles, timeout):
+        """Apply a visibility timeout in batches of 10; returns how many succeeded"""
+        succeeded = 0
+        for start in range(0, len(receipt_handles), 10):
+            chunk = receipt_handles[start:start + 10]
+            entries = [{'Id': str(i), 'ReceiptHandle': receipt_handle, 'VisibilityTimeout': timeout}
+                       for i, receipt_handle in enumerate(chunk)]
+            self.api_calls += 1
+            try:
+                response = self.sqs_client.change_message_visibility_batch(QueueUrl=self.queue_url, Entries=entries)
+            except Exception as e:
+                print(f"⚠️  Could not change message visibility: {e}")
+                continue
+            succeeded += len(response.get('Successful', []))
+            for failure in response.get('Failed', []):
+                # Usually an expired or already-deleted receipt handle: nothing left to renew
+                self.complete(chunk[int(failure['Id'])])
+        if timeout == 0:
+            self.released += succeeded
+        return succeeded
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Local SQS Stand-in
+An in-process, boto3-compatible SQS client for running the producer and consumer without AWS
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from cfn_template import read_template
+
+LAB_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(LAB_DIR, 'template.yaml')
+DEDUPLICATION_WINDOW_SECONDS = 300   # FIFO deduplication interval
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+MAX_MESSAGE_BYTES = 256 * 1024
+REGION = 'us-east-1'
+ACCOUNT_ID = '000000000000'
+
+def _error(operation, code, message):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+def _md5(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+class LocalQueue:
+    """
+    State of one queue.
+
+    Standard queues deliver from a single ready deque. FIFO queues keep one
+    deque per MessageGroupId and never deliver from a group while one of
+    its messages is in flight, so each group is processed strictly in order.
+    Messages that are in flight (or delayed) sit in a heap keyed by the
+    time they become visible again; each receive or visibility change bumps
+    the message's lease so stale heap entries are ignored.
+    """
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.url = f"https://sqs.{REGION}.amazonaws.com/{ACCOUNT_ID}/{name}"
+        self.arn = f"arn:aws:sqs:{REGION}:{ACCOUNT_ID}:{name}"
+        self.fifo = name.endswith('.fifo')
+        self.attributes = {}
+        self.set_attributes(attributes)
+        self.messages = {}
+        self.ready = deque()
+        self.groups = OrderedDict()
+        self.group_in_flight = {}
+        self.timers = []
+        self.deduplication = OrderedDict()
+        self.sequence = 0
+        self.in_flight = 0
+
+    def set_attributes(self, attributes):
+        for key, value in attributes.items():
+            if key == 'RedrivePolicy' and isinstance(value, dict):
+                value = json.dumps(value)
+            self.attributes[key] = str(value).lower() if isinstance(value, bool) else str(value)
+        self.visibility_timeout = int(self.attributes.get('VisibilityTimeout', 30))
+        self.delay_seconds = int(self.attributes.get('DelaySeconds', 0))
+        self.content_deduplication = self.attributes.get('ContentBasedDeduplication', 'false') == 'true'
+        redrive = self.attributes.get('RedrivePolicy')
+        self.redrive = json.loads(redrive) if redrive else None
+
+class LocalSQSClient:
+    """
+    Drop-in replacement for boto3.client('sqs') backed by in-memory queues.
+
+    Supports standard and FIFO queues, visibility timeouts, long polling,
+    delay seconds, the 5-minute FIFO deduplication window (explicit IDs or
+    content-based) and redrive to a dead-letter queue after maxReceiveCount
+    receives. Every call can be given an artificial latency_seconds to
+    mimic the network, and long polls are capped at max_wait_seconds so
+    benchmarks do not sit out 20-second waits. api_calls counts calls per
+    operation.
+    """
+
+    def __init__(self, latency_seconds=0.0, max_wait_seconds=None):
+        self.latency_seconds = latency_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.api_calls = {}
+        self._queues = {}
+        self._by_arn = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @classmethod
+    def from_template(cls, path=TEMPLATE_PATH, **kwargs):
+        """Create the queues declared in a CloudFormation template (DLQs first)"""
+        template = read_template(path)
+        client = cls(**kwargs)
+        queues = {logical_id: resource for logical_id, resource in template['Resources'].items()
+                  if resource['Type'] == 'AWS::SQS::Queue'}
+        created = {}
+
+        def create(logical_id):
+            if logical_id in created:
+                return created[logical_id]
+            properties = dict(queues[logical_id].get('Properties', {}))
+            attributes = {key: value for key, value in properties.items()
+                          if key not in ('QueueName', 'Tags', 'RedrivePolicy')}
+            redrive = properties.get('RedrivePolicy')
+            if redrive:
+                target = redrive['deadLetterTargetArn']['GetAtt'].split('.')[0]
+                attributes['RedrivePolicy'] = {'deadLetterTargetArn': client._queue(create(target)).arn,
+                                               'maxReceiveCount': redrive['maxReceiveCount']}
+            url = client.create_queue(QueueName=properties.get('QueueName', logical_id),
+                                      Attributes=attributes)['QueueUrl']
+            created[logical_id] = url
+            return url
+
+        for logical_id in queues:
+            create(logical_id)
+        return client
+
+    # --- helpers -------------------------------------------------------------
+
+    def _call(self, operation):
+        with self._lock:
+            self.api_calls[operation] = self.api_calls.get(operation, 0) + 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def _queue(self, queue_url, operation='GetQueueAttributes'):
+        queue = self._queues.get(queue_url.rsplit('/', 1)[-1])
+        if queue is None:
+            raise _error(operation, 'AWS.SimpleQueueService.NonExistentQueue',
+                         'The specified queue does not exist.')
+        return queue
+
+    def total_api_calls(self):
+        with self._lock:
+            return sum(self.api_calls.values())
+
+    def _schedule(self, queue, message, visible_at):
+        message['lease'] += 1
+        heapq.heappush(queue.timers, (visible_at, message['lease'], message['id']))
+
+    def _make_visible(self, queue, message):
+        if message['state'] == 'in_flight':
+            queue.in_flight -= 1
+            if queue.fifo:
+                queue.group_in_flight[message['group']] -= 1
+        message['state'] = 'ready'
+        message['receipt'] = None
+        message['lease'] += 1
+        if not queue.fifo:
+            queue.ready.append(message['id'])
+
+    def _expire_timers(self, queue, now):
+        """Make delayed messages and expired leases visible"""
+        timers = queue.timers
+        while timers and timers[0][0] <= now:
+            _, lease, message_id = heapq.heappop(timers)
+            message = queue.messages.get(message_id)
+            if message is not None and message['lease'] == lease:
+                self._make_visible(queue, message)
+
+    def _remove(self, queue, message):
+        del queue.messages[message['id']]
+        if message['state'] == 'in_flight':
+            queue.in_flight -= 1
+        if queue.fifo:
+            group = queue.groups[message['group']]
+            if group and group[0] == message['id']:
+                group.popleft()
+            else:
+                group.remove(message['id'])
+            if message['state'] == 'in_flight':
+                queue.group_in_flight[message['group']] -= 1
+            if not group:
+                del queue.groups[message['group']]
+                del queue.group_in_flight[message['group']]
+        message['state'] = 'deleted'
+
+    def _enqueue(self, queue, body, message_attributes, delay_seconds, group_id, deduplication_id,
+                 system=None, operation='SendMessage'):
+        """Store a message; the caller holds the lock. Returns the SendMessage response fields"""
+        if len(body.encode('utf-8')) > MAX_MESSAGE_BYTES:
+            raise _error(operation, 'InvalidParameterValue',
+                         f'One or more parameters are invalid. Reason: Message must be shorter than '
+                         f'{MAX_MESSAGE_BYTES} bytes.')
+        now = time.time()
+        if queue.fifo:
+            if not group_id:
+                raise _error(operation, 'MissingParameter',
+                             'The request must contain the parameter MessageGroupId.')
+            if not deduplication_id:
+                if not queue.content_deduplication:
+                    raise _error(operation, 'InvalidParameterValue',
+                                 'The queue should either have ContentBasedDeduplication enabled or '
+                                 'MessageDeduplicationId provided explicitly')
+                deduplication_id = hashlib.sha256(body.encode('utf-8')).hexdigest()
+            while queue.deduplication and next(iter(queue.deduplication.values()))[0] <= now:
+                queue.deduplication.popitem(last=False)
+            duplicate = queue.deduplication.get(deduplication_id)
+            if duplicate is not None:
+                # Accepted but not delivered again: same MessageId and SequenceNumber as the original
+                return {'MessageId': duplicate[1], 'MD5OfMessageBody': _md5(body), 'SequenceNumber': duplicate[2]}
+
+        queue.sequence += 1
+        message = {
+            'id': str(uuid.uuid4()),
+            'body': body,
+            'md5': _md5(body),
+            'message_attributes': message_attributes or {},
+            'sent': now,
+            'receive_count': 0,
+            'first_receive': None,
+            'group': group_id,
+            'deduplication_id': deduplication_id,
+            'sequence': f"{queue.sequence:020d}",
+            'receipt': None,
+            'lease': 0,
+            'state': 'ready'
+        }
+        if system:
+            message.update(system)
+        queue.messages[message['id']] = message
+        if queue.fifo:
+            queue.deduplication[deduplication_id] = (now + DEDUPLICATION_WINDOW_SECONDS, message['id'],
+                                                     message['sequence'])
+            queue.groups.setdefault(group_id, deque()).append(message['id'])
+            queue.group_in_flight.setdefault(group_id, 0)
+
+        delay = queue.delay_seconds if delay_seconds is None else delay_seconds
+        if delay and not queue.fifo:
+            message['state'] = 'delayed'
+            self._schedule(queue, message, now + delay)
+        elif not queue.fifo:
+            queue.ready.append(message['id'])
+        self._changed.notify_all()
+
+        response = {'MessageId': message['id'], 'MD5OfMessageBody': message['md5']}
+        if queue.fifo:
+            response['SequenceNumber'] = message['sequence']
+        return response
+
+    def _dead_letter(self, queue, message):
+        """Move a message that exceeded maxReceiveCount to the queue's DLQ"""
+        dlq = self._by_arn.get(queue.redrive['deadLetterTargetArn'])
+        self._remove(queue, message)
+        if dlq is None:
+            return
+        self._enqueue(dlq, message['body'], message['message_attributes'], 0, message['group'],
+                      message['deduplication_id'] or message['id'],
+                      system={'sent': message['sent'], 'dead_letter_source': queue.arn})
+
+    def _candidates(self, queue):
+        """Yield visible messages in delivery order"""
+        if not queue.fifo:
+            while queue.ready:
+                message = queue.messages.get(queue.ready.popleft())
+                if message is not None and message['state'] == 'ready':
+                    yield message
+            return
+        for group_id, group in list(queue.groups.items()):
+            if queue.group_in_flight.get(group_id):
+                continue
+            for message_id in list(group):
+                yield queue.messages[message_id]
+
+    def _take(self, queue, max_messages, visibility_timeout):
+        now = time.time()
+        self._expire_timers(queue, now)
+        taken = []
+        max_receives = int(queue.redrive['maxReceiveCount']) if queue.redrive else None
+        for message in self._candidates(queue):
+            if max_receives is not None and message['receive_count'] >= max_receives:
+                self._dead_letter(queue, message)
+                continue
+            message['state'] = 'in_flight'
+            message['receive_count'] += 1
+            message['first_receive'] = message['first_receive'] or now
+            message['receipt'] = f"{uuid.uuid4().hex}{message['id']}"
+            queue.in_flight += 1
+            if queue.fifo:
+                queue.group_in_flight[message['group']] += 1
+            self._schedule(queue, message, now + visibility_timeout)
+            taken.append(message)
+            if len(taken) >= max_messages:
+                break
+        return taken
+
+    def _format(self, queue, message, attribute_names, message_attribute_names):
+        result = {
+            'MessageId': message['id'],
+            'ReceiptHandle': message['receipt'],
+            'MD5OfBody': message['md5'],
+            'Body': message['body']
+        }
+        if attribute_names:
+            attributes = {
+                'SenderId': ACCOUNT_ID,
+                'SentTimestamp': str(int(message['sent'] * 1000)),
+                'ApproximateReceiveCount': str(message['receive_count']),
+                'ApproximateFirstReceiveTimestamp': str(int(message['first_receive'] * 1000))
+            }
+            if queue.fifo:
+                attributes['MessageGroupId'] = message['group']
+                attributes['MessageDeduplicationId'] = message['deduplication_id']
+                attributes['SequenceNumber'] = message['sequence']
+            if message.get('dead_letter_source'):
+                attributes['DeadLetterQueueSourceArn'] = message['dead_letter_source']
+            if 'All' not in attribute_names:
+                attributes = {key: value for key, value in attributes.items() if key in attribute_names}
+            result['Attributes'] = attributes
+        if message_attribute_names and message['message_attributes']:
+            if 'All' in message_attribute_names or '.*' in message_attribute_names:
+                result['MessageAttributes'] = message['message_attributes']
+            else:
+                selected = {name: value for name, value in message['message_attributes'].items()
+                            if name in message_attribute_names}
+                if selected:
+                    result['MessageAttributes'] = selected
+        return result
+
+    def _find_receipt(self, queue, receipt_handle, operation):
+        message = queue.messages.get(receipt_handle[32:])
+        if message is None or message['receipt'] != receipt_handle:
+            raise _error(operation, 'ReceiptHandleIsInvalid',
+                         f'The input receipt handle "{receipt_handle}" is not a valid receipt handle.')
+        return message
+
+    def _batch(self, operation, entries, action):
+        """Run a per-entry action and collect Successful/Failed like the batch APIs do"""
+        if not entries:
+            raise _error(operation, 'AWS.SimpleQueueService.EmptyBatchRequest',
+                         'There should be at least one entry in the request.')
+        if len(entries) > MAX_BATCH_ENTRIES:
+            raise _error(operation, 'AWS.SimpleQueueService.TooManyEntriesInBatchRequest',
+                         f'Maximum number of entries per request are {MAX_BATCH_ENTRIES}.')
+        if len({entry['Id'] for entry in entries}) != len(entries):
+            raise _error(operation, 'AWS.SimpleQueueService.BatchEntryIdsNotDistinct',
+                         'Two or more batch entries in the request have the same Id.')
+        successful = []
+        failed = []
+        for entry in entries:
+            try:
+                result = action(entry)
+                successful.append(dict(result or {}, Id=entry['Id']))
+            except ClientError as e:
+                error = e.response['Error']
+                failed.append({'Id': entry['Id'], 'SenderFault': True, 'Code': error['Code'],
+                               'Message': error['Message']})
+        response = {'Successful': successful}
+        if failed:
+            response['Failed'] = failed
+        return response
+
+    # --- queue management --------------------------------------------------------
+
+    def create_queue(self, QueueName, Attributes=None, **kwargs):
+        self._call('CreateQueue')
+        with self._lock:
+            queue = self._queues.get(QueueName)
+            if queue is None:
+                queue = LocalQueue(QueueName, Attributes or {})
+                self._queues[QueueName] = queue
+                self._by_arn[queue.arn] = queue
+            return {'QueueUrl': queue.url}
+
+    def get_queue_url(self, QueueName, **kwargs):
+        self._call('GetQueueUrl')
+        return {'QueueUrl': self._queue(QueueName, 'GetQueueUrl').url}
+
+    def list_queues(self, QueueNamePrefix='', **kwargs):
+        self._call('ListQueues')
+        return {'QueueUrls': [queue.url for name, queue in self._queues.items() if name.startswith(QueueNamePrefix)]}
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames=None, **kwargs):
+        self._call('GetQueueAttributes')
+        queue = self._queue(QueueUrl)
+        with self._lock:
+            self._expire_timers(queue, time.time())
+            delayed = sum(1 for message in queue.messages.values() if message['state'] == 'delayed')
+            attributes = dict(queue.attributes)
+            attributes.update({
+                'QueueArn': queue.arn,
+                'VisibilityTimeout': str(queue.visibility_timeout),
+                'ApproximateNumberOfMessages': str(len(queue.messages) - queue.in_flight - delayed),
+                'ApproximateNumberOfMessagesNotVisible': str(queue.in_flight),
+                'ApproximateNumberOfMessagesDelayed': str(delayed),
+                'FifoQueue': str(queue.fifo).lower()
+            })
+        names = AttributeNames or []
+        if 'All' not in names:
+            attributes = {key: value for key, value in attributes.items() if key in names}
+        return {'Attributes': attributes}
+
+    def set_queue_attributes(self, QueueUrl, Attributes, **kwargs):
+        self._call('SetQueueAttributes')
+        queue = self._queue(QueueUrl, 'SetQueueAttributes')
+        with self._lock:
+            queue.set_attributes(Attributes)
+        return {}
+
+    def purge_queue(self, QueueUrl, **kwargs):
+        self._call('PurgeQueue')
+        queue = self._queue(QueueUrl, 'PurgeQueue')
+        with self._lock:
+            for message in list(queue.messages.values()):
+                self._remove(queue, message)
+            queue.ready.clear()
+            queue.timers = []
+        return {}
+
+    # --- messages ------------------------------------------------------------------
+
+    def send_message(self, QueueUrl, MessageBody, MessageAttributes=None, DelaySeconds=None,
+                     MessageGroupId=None, MessageDeduplicationId=None, **kwargs):
+        self._call('SendMessage')
+        queue = self._queue(QueueUrl, 'SendMessage')
+        with self._lock:
+            return self._enqueue(queue, MessageBody, MessageAttributes, DelaySeconds,
+                                 MessageGroupId, MessageDeduplicationId)
+
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        self._call('SendMessageBatch')
+        queue = self._queue(QueueUrl, 'SendMessageBatch')
+        total = sum(len(entry['MessageBody'].encode('utf-8')) for entry in Entries)
+        if total > MAX_BATCH_BYTES:
+            raise _error('SendMessageBatch', 'AWS.SimpleQueueService.BatchRequestTooLong',
+                         f'Batch requests cannot be longer than {MAX_BATCH_BYTES} bytes.')
+        with self._lock:
+            return self._batch('SendMessageBatch', Entries, lambda entry: self._enqueue(
+                queue, entry['MessageBody'], entry.get('MessageAttributes'), entry.get('DelaySeconds'),
+                entry.get('MessageGroupId'), entry.get('MessageDeduplicationId'), operation='SendMessageBatch'))
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=None, VisibilityTimeout=None,
+                        AttributeNames=None, MessageAttributeNames=None, MessageSystemAttributeNames=None,
+                        **kwargs):
+        self._call('ReceiveMessage')
+        queue = self._queue(QueueUrl, 'ReceiveMessage')
+        if not 1 <= MaxNumberOfMessages <= 10:
+            raise _error('ReceiveMessage', 'InvalidParameterValue',
+                         'Value for parameter MaxNumberOfMessages is invalid. Reason: Must be between 1 and 10.')
+        wait = int(queue.attributes.get('ReceiveMessageWaitTimeSeconds', 0)) if WaitTimeSeconds is None \
+            else WaitTimeSeconds
+        if self.max_wait_seconds is not None:
+            wait = min(wait, self.max_wait_seconds)
+        visibility_timeout = queue.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout
+        attribute_names = list(AttributeNames or []) + list(MessageSystemAttributeNames or [])
+        deadline = time.monotonic() + wait
+
+        with self._lock:
+            while True:
+                taken = self._take(queue, MaxNumberOfMessages, visibility_timeout)
+                remaining = deadline - time.monotonic()
+                if taken or remaining <= 0:
+                    break
+                # Wake up for new messages or when the next lease/delay expires
+                if queue.timers:
+                    remaining = min(remaining, max(0.0, queue.timers[0][0] - time.time()) + 0.001)
+                self._changed.wait(remaining)
+            messages = [self._format(queue, message, attribute_names, MessageAttributeNames) for message in taken]
+        return {'Messages': messages} if messages else {}
+
+    def delete_message(self, QueueUrl, ReceiptHandle, **kwargs):
+        self._call('DeleteMessage')
+        queue = self._queue(QueueUrl, 'DeleteMessage')
+        with self._lock:
+            self._remove(queue, self._find_receipt(queue, ReceiptHandle, 'DeleteMessage'))
+            self._changed.notify_all()  # A FIFO group may have been unblocked
+        return {}
+
+    def delete_message_batch(self, QueueUrl, Entries, **kwargs):
+        self._call('DeleteMessageBatch')
+        queue = self._queue(QueueUrl, 'DeleteMessageBatch')
+        with self._lock:
+            response = self._batch('DeleteMessageBatch', Entries, lambda entry: self._remove(
+                queue, self._find_receipt(queue, entry['ReceiptHandle'], 'DeleteMessageBatch')))
+            self._changed.notify_all()
+        return response
+
+    def _change_visibility(self, queue, receipt_handle, timeout, operation):
+        message = self._find_receipt(queue, receipt_handle, operation)
+        if timeout == 0:
+            self._make_visible(queue, message)
+            self._changed.notify_all()
+        else:
+            self._schedule(queue, message, time.time() + timeout)
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout, **kwargs):
+        self._call('ChangeMessageVisibility')
+        queue = self._queue(QueueUrl, 'ChangeMessageVisibility')
+        with self._lock:
+            self._change_visibility(queue, ReceiptHandle, VisibilityTimeout, 'ChangeMessageVisibility')
+        return {}
+
+    def change_message_visibility_batch(self, QueueUrl, Entries, **kwargs):
+        self._call('ChangeMessageVisibilityBatch')
+        queue = self._queue(QueueUrl, 'ChangeMessageVisibilityBatch')
+        with self._lock:
+            return self._batch('ChangeMessageVisibilityBatch', Entries, lambda entry: self._change_visibility(
+                queue, entry['ReceiptHandle'], entry['VisibilityTimeout'], 'ChangeMessageVisibilityBatch'))
+
+def local_lab_queues(max_wait_seconds=1, **kwargs):
+    """(client, standard_queue_url, fifo_queue_url) for the lab's queues on a fresh in-process stand-in"""
+    client = LocalSQSClient.from_template(max_wait_seconds=max_wait_seconds, **kwargs)
+    return (client, client.get_queue_url(QueueName='order-notifications-queue')['QueueUrl'],
+            client.get_queue_url(QueueName='payment-processing-queue.fifo')['QueueUrl'])
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Message Codecs
+Pluggable body encodings for the SQS scripts: compact JSON (orjson when installed),
+MessagePack (when installed) and a base64 binary envelope for binary or compressed payloads
+"""
+
+import base64
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used without it
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; the msgpack codec is only registered when installed
+    msgpack = None
+
+MAX_BODY_BYTES = 256 * 1024      # SQS (and SNS) message size limit
+ENVELOPE_MARKER = '~'            # A JSON document can never start with this character
+ENVELOPE_VERSION = 1
+FLAG_COMPRESSED = 0x01
+COMPRESS_MIN_BYTES = 1024        # Smaller payloads rarely shrink enough to pay for base64
+
+class CodecError(ValueError):
+    pass
+
+class MessageTooLargeError(CodecError):
+    pass
+
+class Codec:
+    """A named encoding; text codecs can be sent as-is, binary ones always travel in the envelope"""
+
+    def __init__(self, name, codec_id, encode, decode, text):
+        self.name = name
+        self.codec_id = codec_id
+        self.encode = encode
+        self.decode = decode
+        self.text = text
+
+CODECS = {}
+_CODECS_BY_ID = {}
+
+def register_codec(codec):
+    if not 0 < codec.codec_id < 16:
+        raise CodecError("codec_id must fit in 4 bits (1-15)")
+    CODECS[codec.name] = codec
+    _CODECS_BY_ID[codec.codec_id] = codec
+
+# Built once and reused for every message
+_json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=str)
+
+def _json_encode(obj):
+    return _json_encoder.encode(obj).encode('utf-8')
+
+def _json_decode(data):
+    # Plain bodies arrive as str; enveloped payloads as bytes or a memoryview
+    return json.loads(data if isinstance(data, str) else bytes(data))
+
+# Plain JSON bodies do not say which text codec wrote them, so read them with the fastest one
+_plain_decode = orjson.loads if orjson is not None else _json_decode
+
+register_codec(Codec('json', 1, _json_encode, _json_decode, text=True))
+if orjson is not None:
+    register_codec(Codec('orjson', 2, lambda obj: orjson.dumps(obj, default=str), orjson.loads, text=True))
+if msgpack is not None:
+    register_codec(Codec('msgpack', 3,
+                         lambda obj: msgpack.packb(obj, use_bin_type=True, default=str),
+                         lambda data: msgpack.unpackb(data, raw=False), text=False))
+
+def default_codec():
+    return 'orjson' if 'orjson' in CODECS else 'json'
+
+def get_codec(name):
+    codec = CODECS.get(name)
+    if codec is None:
+        raise CodecError(f"Unknown or unavailable codec {name!r}; available: {', '.join(CODECS)}")
+    return codec
+
+def encode_body(obj, codec='json', compress=None, max_bytes=MAX_BODY_BYTES):
+    """
+    Encode a message body as SQS-safe text.
+
+    Text codecs produce plain JSON, which every existing consumer can read.
+    Binary or compressed payloads are framed as ENVELOPE_MARKER + base64 of
+    a two-byte header (version/codec, flags) and the payload. compress=None
+    compresses payloads of COMPRESS_MIN_BYTES or more when that saves at
+    least 10%. max_bytes=None skips the size check (for bodies that will
+    go through a claim check).
+    """
+    codec = get_codec(codec) if isinstance(codec, str) else codec
+    payload = codec.encode(obj)
+    flags = 0
+    if compress or (compress is None and len(payload) >= COMPRESS_MIN_BYTES):
+        compressed = zlib.compress(payload, 1)
+        if len(compressed) < len(payload) * 0.9:
+            payload = compressed
+            flags |= FLAG_COMPRESSED
+
+    if codec.text and not flags:
+        size = len(payload)
+        body = payload.decode('utf-8')
+    else:
+        header = bytes(((ENVELOPE_VERSION << 4) | codec.codec_id, flags))
+        body = ENVELOPE_MARKER + base64.b64encode(header + payload).decode('ascii')
+        size = len(body)
+    if max_bytes is not None and size > max_bytes:
+        raise MessageTooLargeError(f"Encoded body is {size} bytes; the limit is {max_bytes}")
+    return body
+
+def decode_body(body):
+    """Decode a body produced by encode_body, or any plain JSON body"""
+    if not body.startswith(ENVELOPE_MARKER):
+        return _plain_decode(body)
+    raw = base64.b64decode(body[1:])
+    version, codec_id, flags = raw[0] >> 4, raw[0] & 0x0F, raw[1]
+    if version != ENVELOPE_VERSION:
+        raise CodecError(f"Unsupported envelope version {version}")
+    codec = _CODECS_BY_ID.get(codec_id)
+    if codec is None:
+        raise CodecError(f"Body was encoded with codec {codec_id}, which is not available here")
+    payload = memoryview(raw)[2:]  # Slice without copying the payload
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    return codec.decode(payload)
+
+class LazyMessage:
+    """
+    Wraps a received SQS message and decodes its body only on first access.
+
+    Handlers that route on message attributes never pay for parsing the
+    body; item access (message['MessageId'], ...) reads the raw message.
+    """
+
+    __slots__ = ('message', '_body', 'decoded')
+
+    def __init__(self, message):
+        self.message = message
+        self._body = None
+        self.decoded = False
+
+    def __getitem__(self, key):
+        return self.message[key]
+
+    def get(self, key, default=None):
+        return self.message.get(key, default)
+
+    def attribute(self, name, default=None):
+        """String (or binary) value of a message attribute, without touching the body"""
+        value = self.message.get('MessageAttributes', {}).get(name)
+        if value is None:
+            return default
+        return value.get('StringValue', value.get('BinaryValue'))
+
+    @property
+    def body(self):
+        if not self.decoded:
+            self._body = decode_body(self.message['Body'])
+            self.decoded = True
+        return self._body
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+SQS Poll Controller
+Sizes the number of pollers, the long-poll wait and the receive batch from queue depth and handler latency
+"""
+
+import math
+import threading
+import time
+
+MAX_RECEIVE_MESSAGES = 10       # ReceiveMessage returns at most 10 messages
+MAX_WAIT_SECONDS = 20           # ...and long-polls for at most 20 seconds
+
+class PollController:
+    """
+    Adapts polling to the backlog.
+
+    Queue depth (ApproximateNumberOfMessages, sampled every depth_interval
+    seconds) and the average handler and receive latency give the number
+    of pollers needed to drain the backlog in target_drain_seconds. The
+    controller scales up to that number immediately and steps down one
+    poller at a time after consecutive empty receives. The long-poll wait
+    drops to min_wait_seconds while messages flow and doubles on every
+    empty receive, so an idle queue settles at one poller making one
+    20-second long poll at a time. Batches shrink when handlers are slow,
+    so a batch never takes more than half the visibility timeout.
+    """
+
+    def __init__(self, min_pollers=1, max_pollers=8, min_wait_seconds=1, max_wait_seconds=MAX_WAIT_SECONDS,
+                 target_drain_seconds=10.0, visibility_timeout=30, depth_interval=2.0, shrink_after_empty=2):
+        self.min_pollers = min_pollers
+        self.max_pollers = max_pollers
+        self.min_wait_seconds = min_wait_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.target_drain_seconds = target_drain_seconds
+        self.visibility_timeout = visibility_timeout
+        self.depth_interval = depth_interval
+        self.shrink_after_empty = shrink_after_empty
+
+        self.pollers = min_pollers
+        self.wait_seconds = max_wait_seconds
+        self.batch_size = MAX_RECEIVE_MESSAGES
+        self.depth = 0
+        self.handler_latency = 0.0
+        self.receive_latency = 0.0
+        self.receives = 0
+        self.empty_receives = 0
+        self.peak_pollers = min_pollers
+        self.resizes = 0
+
+        self._empty_streak = 0
+        self._next_sample = 0.0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def sample_due(self):
+        """True (once) when it is time to read the queue depth again"""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sample:
+                return False
+            self._next_sample = now + self.depth_interval
+            return True
+
+    def record_depth(self, depth):
+        with self._lock:
+            self.depth = depth
+            self._resize(self._pollers_for_depth())
+
+    def record_receive(self, requested, received, seconds):
+        with self._lock:
+            self.receives += 1
+            if received:
+                self.receive_latency = _ewma(self.receive_latency, seconds)
+                self.wait_seconds = self.min_wait_seconds
+                if self._empty_streak and self.pollers == self.min_pollers:
+                    self._next_sample = 0.0  # Traffic is back: read the depth on the next poll
+                self._empty_streak = 0
+                return
+            self.empty_receives += 1
+            self._empty_streak += 1
+            self.wait_seconds = min(self.max_wait_seconds, max(1, self.wait_seconds * 2))
+            if self._empty_streak >= self.shrink_after_empty:
+                self._empty_streak = 0
+                self.depth = 0
+                self._resize(self.pollers - 1)
+
+    def record_handler(self, seconds):
+        with self._lock:
+            self.handler_latency = _ewma(self.handler_latency, seconds)
+            if self.handler_latency > 0:
+                fits = int(self.visibility_timeout / 2.0 / self.handler_latency)
+                self.batch_size = max(1, min(MAX_RECEIVE_MESSAGES, fits))
+
+    def plan(self):
+        """(wait_seconds, max_messages) for the next ReceiveMessage call"""
+        with self._lock:
+            return self.wait_seconds, self.batch_size
+
+    def wait_until_active(self, index, timeout):
+        """Park an idle poller until the controller scales up to include it"""
+        with self._lock:
+            if index >= self.pollers:
+                self._changed.wait(timeout)
+            return index < self.pollers
+
+    def _pollers_for_depth(self):
+        if self.depth <= 0:
+            return self.pollers
+        cycle = self.receive_latency + self.batch_size * self.handler_latency
+        per_poller = self.batch_size / cycle if cycle > 0 else float('inf')
+        needed = self.depth / self.target_drain_seconds
+        desired = math.ceil(needed / per_poller) if per_poller != float('inf') else self.min_pollers
+        # Scale up at once, scale down one step per sample
+        return desired if desired > self.pollers else max(desired, self.pollers - 1)
+
+    def _resize(self, pollers):
+        pollers = max(self.min_pollers, min(self.max_pollers, pollers))
+        if pollers != self.pollers:
+            self.pollers = pollers
+            self.peak_pollers = max(self.peak_pollers, pollers)
+            self.resizes += 1
+            self._changed.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pollers': self.pollers,
+                'peak_pollers': self.peak_pollers,
+                'resizes': self.resizes,
+                'receives': self.receives,
+                'empty_receives': self.empty_receives,
+                'batch_size': self.batch_size,
+                'wait_seconds': self.wait_seconds,
+                'handler_latency_ms': self.handler_latency * 1000
+            }
+
+def _ewma(current, sample, alpha=0.2):
+    return sample if current == 0 else current + alpha * (sample - current)
@@ -4,14 +4,43 @@ SQS Producer Script
 Sends messages to both Standard and FIFO queues
 """
 
+import asyncio
 import boto3
 import json
+import os
 import sys
+import threading
 import time
 from datetime import datetime
 
-def send_to_standard_queue(sqs_client, queue_url, order_id, customer_email, order_total):
-    """Send message to Standard Queue"""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+from aws_async import AsyncTransport
+from claim_check import ClaimCheck, LocalObjectStore
+from cli import get_option
+from message_codec import CODECS, MAX_BODY_BYTES, encode_body
+from metrics import configure_from_args, incr, observe, percentile, queue_tag, say, span
+
+MAX_BATCH_ENTRIES = 10           # SendMessageBatch accepts at most 10 entries
+MAX_BATCH_BYTES = 256 * 1024     # ...and at most 256 KB across all entries
+
+# Orders sent by main() to demonstrate the queues' behaviour
+SAMPLE_ORDERS = [
+    {"order_id": "ORD-001", "email": "customer1@example.com", "total": 99.99, "payment_id": "PAY-001"},
+    {"order_id": "ORD-002", "email": "customer2@example.com", "total": 149.50, "payment_id": "PAY-002"},
+    {"order_id": "ORD-003", "email": "customer3@example.com", "total": 75.25, "payment_id": "PAY-003"},
+]
+
+def build_standard_message(order_id, customer_email, order_total, codec=None, items=None,
+                           max_bytes=MAX_BODY_BYTES):
+    """
+    Build the body and attributes for an order notification.
+
+    With a codec the body is encoded by message_codec instead of json.dumps;
+    the fields and attributes are the same either way, so consumers see one
+    message shape. Line items, when given, are carried in the body;
+    max_bytes=None lifts the encoded size limit for bodies that go through
+    a claim check.
+    """
     message_body = {
         "order_id": order_id,
         "customer_email": customer_email,
@@ -19,30 +48,25 @@ def send_to_standard_queue(sqs_client, queue_url, order_id, customer_email, orde
         "timestamp": datetime.now().isoformat(),
         "type": "order_notification"
     }
-    
-    try:
-        response = sqs_client.send_message(
-            QueueUrl=queue_url,
-            MessageBody=json.dumps(message_body),
-            MessageAttributes={
-                'OrderType': {
-                    'StringValue': 'standard',
-                    'DataType': 'String'
-                },
-                'OrderTotal': {
-                    'StringValue': str(order_total),
-                    'DataType': 'Number'
-                }
-            }
-        )
-        print(f"✅ Standard Queue: Message sent! MessageId: {response['MessageId']}")
-        return response
-    except Exception as e:
-        print(f"❌ Error sending to Standard Queue: {e}")
-        return None
+    if items:
+        message_body["items"] = items
+    message_attributes = {
+        'OrderType': {
+            'StringValue': 'standard',
+            'DataType': 'String'
+        },
+        'OrderTotal': {
+            'StringValue': str(order_total),
+            'DataType': 'Number'
+        }
+    }
+    if codec:
+        return encode_body(message_body, codec, max_bytes=max_bytes), message_attributes
+    return json.dumps(message_body), message_attributes
 
-def send_to_fifo_queue(sqs_client, queue_url, order_id, customer_email, order_total, payment_id):
-    """Send message to FIFO Queue with Message Group ID"""
+def build_fifo_message(order_id, customer_email, order_total, payment_id, codec=None, items=None,
+                       max_bytes=MAX_BODY_BYTES):
+    """Build the body and attributes for a payment message (encoded by message_codec with a codec)"""
     message_body = {
         "order_id": order_id,
         "payment_id": payment_id,
@@ -51,51 +75,398 @@ def send_to_fifo_queue(sqs_client, queue_url, order_id, customer_email, order_to
         "timestamp": datetime.now().isoformat(),
         "type": "payment_processing"
     }
+    if items:
+        message_body["items"] = items
+    message_attributes = {
+        'PaymentType': {
+            'StringValue': 'credit_card',
+            'DataType': 'String'
+        },
+        'Amount': {
+            'StringValue': str(order_total),
+            'DataType': 'Number'
+        }
+    }
+    if codec:
+        return encode_body(message_body, codec, max_bytes=max_bytes), message_attributes
+    return json.dumps(message_body), message_attributes
+
+def body_limit(claim_check):
+    """Encoded bodies are capped at the SQS limit unless a claim check will offload the large ones"""
+    return None if claim_check else MAX_BODY_BYTES
+
+def send_to_standard_queue(sqs_client, queue_url, order_id, customer_email, order_total, codec=None,
+                           claim_check=None, items=None):
+    """Send message to Standard Queue (large bodies go through the claim check when one is given)"""
+    message_body, message_attributes = build_standard_message(order_id, customer_email, order_total, codec, items,
+                                                              body_limit(claim_check))
     
     try:
-        response = sqs_client.send_message(
-            QueueUrl=queue_url,
-            MessageBody=json.dumps(message_body),
-            MessageGroupId=f"payment-{order_id}",  # Required for FIFO
-            MessageDeduplicationId=f"payment-{payment_id}",  # For deduplication
-            MessageAttributes={
-                'PaymentType': {
-                    'StringValue': 'credit_card',
-                    'DataType': 'String'
-                },
-                'Amount': {
-                    'StringValue': str(order_total),
-                    'DataType': 'Number'
-                }
-            }
-        )
-        print(f"✅ FIFO Queue: Message sent! MessageId: {response['MessageId']}")
+        if claim_check:
+            message_body, message_attributes = claim_check.offload(message_body, message_attributes)
+        with span('sqs.send', queue=queue_tag(queue_url)):
+            response = sqs_client.send_message(
+                QueueUrl=queue_url,
+                MessageBody=message_body,
+                MessageAttributes=message_attributes
+            )
+        incr('sqs.messages_sent', queue=queue_tag(queue_url))
+        say(f"✅ Standard Queue: Message sent! MessageId: {response['MessageId']}")
+        return response
+    except Exception as e:
+        print(f"❌ Error sending to Standard Queue: {e}")
+        return None
+
+def send_to_fifo_queue(sqs_client, queue_url, order_id, customer_email, order_total, payment_id, codec=None,
+                       claim_check=None, items=None):
+    """Send message to FIFO Queue with Message Group ID"""
+    message_body, message_attributes = build_fifo_message(order_id, customer_email, order_total, payment_id, codec,
+                                                          items, body_limit(claim_check))
+    
+    try:
+        if claim_check:
+            message_body, message_attributes = claim_check.offload(message_body, message_attributes)
+        with span('sqs.send', queue=queue_tag(queue_url)):
+            response = sqs_client.send_message(
+                QueueUrl=queue_url,
+                MessageBody=message_body,
+                MessageGroupId=f"payment-{order_id}",  # Required for FIFO
+                MessageDeduplicationId=f"payment-{payment_id}",  # For deduplication
+                MessageAttributes=message_attributes
+            )
+        incr('sqs.messages_sent', queue=queue_tag(queue_url))
+        say(f"✅ FIFO Queue: Message sent! MessageId: {response['MessageId']}")
         return response
     except Exception as e:
         print(f"❌ Error sending to FIFO Queue: {e}")
         return None
 
+def entry_size(entry):
+    """Size of a batch entry as SQS counts it (body plus attributes)"""
+    size = len(entry['MessageBody'].encode('utf-8'))
+    for name, attribute in entry.get('MessageAttributes', {}).items():
+        size += len(name.encode('utf-8')) + len(attribute['DataType'].encode('utf-8'))
+        size += len(attribute.get('StringValue', '').encode('utf-8'))
+        size += len(attribute.get('BinaryValue', b''))
+    return size
+
+class BatchProducer:
+    """
+    Buffers messages and sends them with SendMessageBatch.
+
+    A batch is flushed when it reaches 10 entries or 256 KB, or when the
+    oldest buffered message has waited longer than linger_seconds. Entries
+    reported in Failed[] are retried with exponential backoff; entries
+    that failed because of the request itself (SenderFault) are not.
+    With a claim_check, large bodies are offloaded before they are buffered.
+    """
+
+    def __init__(self, sqs_client, queue_url, linger_seconds=0.05, max_retries=3,
+                 backoff_seconds=0.1, max_entries=MAX_BATCH_ENTRIES, max_bytes=MAX_BATCH_BYTES, claim_check=None):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.claim_check = claim_check
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.sent = []
+        self.failed = []
+        self.batch_latencies = []
+        self.api_calls = 0
+
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._oldest = None
+        self._next_id = 0
+        self._started = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flusher = threading.Thread(target=self._linger_loop, daemon=True)
+        self._flusher.start()
+
+    def send(self, message_body, message_attributes=None, group_id=None, deduplication_id=None):
+        """Queue a message for the next batch"""
+        if self.claim_check:
+            message_body, message_attributes = self.claim_check.offload(message_body, message_attributes)
+        entry = {'MessageBody': message_body}
+        if message_attributes:
+            entry['MessageAttributes'] = message_attributes
+        if group_id:
+            entry['MessageGroupId'] = group_id
+        if deduplication_id:
+            entry['MessageDeduplicationId'] = deduplication_id
+        size = entry_size(entry)
+        if size > self.max_bytes:
+            raise ValueError(f"Message of {size} bytes exceeds the {self.max_bytes} byte SQS limit")
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchProducer is closed")
+            if self._started is None:
+                self._started = time.perf_counter()
+            entry['Id'] = str(self._next_id)
+            self._next_id += 1
+            self._buffer.append((entry, size))
+            self._buffer_bytes += size
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._wakeup.notify()
+            full = len(self._buffer) >= self.max_entries or self._buffer_bytes > self.max_bytes
+
+        if full:
+            self.flush(full_only=True)
+
+    def flush(self, full_only=False):
+        """Send buffered messages; with full_only, leave a partial batch buffered"""
+        # Batches go out one at a time so FIFO groups keep their order
+        with self._send_lock:
+            while True:
+                with self._lock:
+                    ready = self._take_batch(full_only)
+                if not ready:
+                    return
+                self._send_batch(ready)
+
+    def close(self):
+        """Flush the remaining messages and stop the linger thread"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._flusher.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _take_batch(self, full_only):
+        """Remove the next batch that fits the entry and byte limits"""
+        count = 0
+        batch_bytes = 0
+        for _, size in self._buffer:
+            if count == self.max_entries or batch_bytes + size > self.max_bytes:
+                break
+            count += 1
+            batch_bytes += size
+        if count == 0 or (full_only and count == len(self._buffer) and count < self.max_entries):
+            return None
+        batch = [entry for entry, _ in self._buffer[:count]]
+        del self._buffer[:count]
+        self._buffer_bytes -= batch_bytes
+        self._oldest = time.monotonic() if self._buffer else None
+        return batch
+
+    def _linger_loop(self):
+        while True:
+            with self._lock:
+                while not self._closed and self._oldest is None:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                remaining = self._oldest + self.linger_seconds - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+            self.flush()
+
+    def _send_batch(self, entries):
+        """Send one batch, retrying only the entries that failed"""
+        attempt = 0
+        while entries:
+            started = time.perf_counter()
+            self.api_calls += 1
+            try:
+                response = self.sqs_client.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            except Exception as e:
+                response = {'Failed': [{'Id': entry['Id'], 'SenderFault': False, 'Code': type(e).__name__,
+                                        'Message': str(e)} for entry in entries]}
+            latency = time.perf_counter() - started
+            tag = queue_tag(self.queue_url)
+            observe('sqs.send_batch', latency * 1000, queue=tag)
+            incr('sqs.messages_sent', len(response.get('Successful', [])), queue=tag)
+            incr('sqs.batch_entry_failures', len(response.get('Failed', [])), queue=tag)
+
+            by_id = {entry['Id']: entry for entry in entries}
+            retry = []
+            self.batch_latencies.append(latency)
+            self.sent.extend(response.get('Successful', []))
+            for failure in response.get('Failed', []):
+                entry = by_id[failure['Id']]
+                if failure.get('SenderFault') or attempt >= self.max_retries:
+                    self.failed.append({'Entry': entry, 'Error': failure})
+                else:
+                    retry.append(entry)
+
+            entries = retry
+            if entries:
+                time.sleep(self.backoff_seconds * (2 ** attempt))
+                attempt += 1
+
+    def stats(self):
+        """Per-batch latency and overall throughput"""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        latencies = self.batch_latencies
+        return {
+            'messages_sent': len(self.sent),
+            'messages_failed': len(self.failed),
+            'api_calls': self.api_calls,
+            'batch_latency_avg_ms': (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+            'batch_latency_p50_ms': percentile(latencies, 50) * 1000,
+            'batch_latency_p95_ms': percentile(latencies, 95) * 1000,
+            'throughput_msgs_per_sec': len(self.sent) / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def report(self, label):
+        """Print the batch statistics"""
+        stats = self.stats()
+        print(f"📊 {label}: {stats['messages_sent']} sent, {stats['messages_failed']} failed "
+              f"in {stats['api_calls']} SendMessageBatch calls")
+        print(f"   Batch latency: avg {stats['batch_latency_avg_ms']:.1f} ms, "
+              f"p50 {stats['batch_latency_p50_ms']:.1f} ms, p95 {stats['batch_latency_p95_ms']:.1f} ms")
+        print(f"   Throughput: {stats['throughput_msgs_per_sec']:.1f} msgs/sec")
+
+def send_batched(sqs_client, standard_queue_url, fifo_queue_url, orders, codec=None, claim_check=None):
+    """Send all orders to both queues through SendMessageBatch"""
+    print("\n📦 Batching to Standard Queue (Order Notifications)...")
+    with BatchProducer(sqs_client, standard_queue_url, claim_check=claim_check) as producer:
+        for order in orders:
+            body, attributes = build_standard_message(order["order_id"], order["email"], order["total"], codec,
+                                                      order.get("items"), body_limit(claim_check))
+            producer.send(body, attributes)
+    producer.report("Standard Queue")
+
+    print("\n💳 Batching to FIFO Queue (Payment Processing)...")
+    with BatchProducer(sqs_client, fifo_queue_url, claim_check=claim_check) as producer:
+        for order in orders:
+            body, attributes = build_fifo_message(order["order_id"], order["email"], order["total"],
+                                                  order["payment_id"], codec, order.get("items"),
+                                                  body_limit(claim_check))
+            producer.send(
+                body,
+                attributes,
+                group_id=f"payment-{order['order_id']}",
+                deduplication_id=f"payment-{order['payment_id']}"
+            )
+    producer.report("FIFO Queue")
+
+async def send_async(transport, standard_queue_url, fifo_queue_url, orders, codec=None, claim_check=None):
+    """Send every order to both queues concurrently over the asyncio transport"""
+    async def offload(body, attributes):
+        # Object store writes block, so they run off the event loop
+        if claim_check:
+            return await asyncio.to_thread(claim_check.offload, body, attributes)
+        return body, attributes
+
+    async def send_standard(order):
+        body, attributes = build_standard_message(order["order_id"], order["email"], order["total"], codec,
+                                                  order.get("items"), body_limit(claim_check))
+        try:
+            body, attributes = await offload(body, attributes)
+            with span('sqs.send', queue=queue_tag(standard_queue_url)):
+                response = await transport.send(standard_queue_url, body, attributes)
+            incr('sqs.messages_sent', queue=queue_tag(standard_queue_url))
+            say(f"✅ Standard Queue: Message sent! MessageId: {response['MessageId']}")
+            return response
+        except Exception as e:
+            print(f"❌ Error sending to Standard Queue: {e}")
+            return None
+
+    async def send_fifo(order):
+        body, attributes = build_fifo_message(order["order_id"], order["email"], order["total"],
+                                              order["payment_id"], codec, order.get("items"),
+                                              body_limit(claim_check))
+        try:
+            body, attributes = await offload(body, attributes)
+            with span('sqs.send', queue=queue_tag(fifo_queue_url)):
+                response = await transport.send(
+                    fifo_queue_url,
+                    body,
+                    attributes,
+                    MessageGroupId=f"payment-{order['order_id']}",
+                    MessageDeduplicationId=f"payment-{order['payment_id']}"
+                )
+            incr('sqs.messages_sent', queue=queue_tag(fifo_queue_url))
+            say(f"✅ FIFO Queue: Message sent! MessageId: {response['MessageId']}")
+            return response
+        except Exception as e:
+            print(f"❌ Error sending to FIFO Queue: {e}")
+            return None
+
+    # Every order is its own message group, so the FIFO sends can overlap too
+    print("\n⚡ Sending to both queues concurrently...")
+    return await asyncio.gather(*[send_standard(order) for order in orders], *[send_fifo(order) for order in orders])
+
+def usage(error=None):
+    if error:
+        print(f"❌ {error}")
+    print("Usage: python3 producer.py (<standard_queue_url> <fifo_queue_url> | --local) [--batch | --async] "
+          "[--codec json|orjson|msgpack] [--claim-check DIR] [--items N] "
+          "[--metrics emf|statsd|prometheus] [--quiet]")
+    print("Example: python3 producer.py https://sqs.us-east-1.amazonaws.com/123456789/order-notifications-queue https://sqs.us-east-1.amazonaws.com/123456789/payment-processing-queue.fifo")
+    sys.exit(1)
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 producer.py <standard_queue_url> <fifo_queue_url>")
-        print("Example: python3 producer.py https://sqs.us-east-1.amazonaws.com/123456789/order-notifications-queue https://sqs.us-east-1.amazonaws.com/123456789/payment-processing-queue.fifo")
-        sys.exit(1)
+    local = '--local' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--local']
+    if len(args) < 2 and not local:
+        usage()
     
-    standard_queue_url = sys.argv[1]
-    fifo_queue_url = sys.argv[2]
-    
-    sqs_client = boto3.client('sqs')
+    if local:
+        # In-process queues built from template.yaml; nothing is sent to AWS
+        from local_sqs import local_lab_queues  # Needs PyYAML, so only imported for --local
+        sqs_client, standard_queue_url, fifo_queue_url = local_lab_queues()
+        options = args
+    else:
+        sqs_client = None
+        standard_queue_url, fifo_queue_url = args[:2]
+        options = args[2:]
+    batch_mode = '--batch' in options
+    async_mode = '--async' in options
+    codec = get_option(options, '--codec', '', choices=sorted(CODECS), usage=usage) or None
+    claim_check_dir = get_option(options, '--claim-check', '', usage=usage) or None
+    item_count = get_option(options, '--items', 0, usage=usage)
+    # Large bodies go to a local object store and the queue carries a pointer
+    claim_check = ClaimCheck(LocalObjectStore(claim_check_dir)) if claim_check_dir else None
+    configure_from_args(options)
     
     print("=" * 60)
     print("🚀 SQS Producer - Sending Messages")
     print("=" * 60)
     
     # Send multiple messages to demonstrate behavior
-    orders = [
-        {"order_id": "ORD-001", "email": "customer1@example.com", "total": 99.99, "payment_id": "PAY-001"},
-        {"order_id": "ORD-002", "email": "customer2@example.com", "total": 149.50, "payment_id": "PAY-002"},
-        {"order_id": "ORD-003", "email": "customer3@example.com", "total": 75.25, "payment_id": "PAY-003"},
-    ]
+    orders = [dict(order) for order in SAMPLE_ORDERS]
+    if item_count:
+        # Warehouse-sized orders: enough line items to push the body past the claim-check threshold
+        for order in orders:
+            order["items"] = [{"sku": f"SKU-{i:06d}", "quantity": i % 5 + 1, "warehouse": f"WH-{i % 4}"}
+                              for i in range(item_count)]
+    
+    if async_mode:
+        transport = AsyncTransport(clients={'sqs': sqs_client} if sqs_client else None)
+        try:
+            asyncio.run(send_async(transport, standard_queue_url, fifo_queue_url, orders, codec, claim_check))
+        finally:
+            transport.close()
+        print("\n" + "=" * 60)
+        print("✅ All messages sent successfully!")
+        print("=" * 60)
+        return
+    
+    sqs_client = sqs_client or boto3.client('sqs')
+    
+    if batch_mode:
+        send_batched(sqs_client, standard_queue_url, fifo_queue_url, orders, codec, claim_check)
+        print("\n" + "=" * 60)
+        print("✅ All messages sent successfully!")
+        print("=" * 60)
+        return
     
     print("\n📦 Sending to Standard Queue (Order Notifications)...")
     for order in orders:
@@ -104,7 +475,10 @@ def main():
             standard_queue_url,
             order["order_id"],
             order["email"],
-            order["total"]
+            order["total"],
+            codec,
+            claim_check,
+            order.get("items")
         )
         time.sleep(0.5)
     
@@ -116,7 +490,10 @@ def main():
             order["order_id"],
             order["email"],
             order["total"],
-            order["payment_id"]
+            order["payment_id"],
+            codec,
+            claim_check,
+            order.get("items")
         )
         time.sleep(0.5)
     
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+SQS Queue Scheduler
+Shares one worker pool across several queues with strict-priority or weighted fair scheduling
+"""
+
+import threading
+import time
+from collections import deque
+
+MAX_RECEIVE_MESSAGES = 10
+
+class ScheduledQueue:
+    """Per-queue scheduling state: buffered messages, running count and limits"""
+
+    def __init__(self, name, weight=1, priority=0, max_concurrency=None, prefetch=None, fifo=False):
+        self.name = name
+        self.weight = weight
+        self.priority = priority
+        self.max_concurrency = max_concurrency
+        self.prefetch = prefetch
+        self.fifo = fifo
+        self.ready = deque()
+        self.running = 0
+        self.peak_running = 0
+        self.busy_groups = set()
+        self.finished = False
+        self.pass_value = 0.0  # Stride scheduling: lower passes are served first
+        self.started = 0
+
+class QueueScheduler:
+    """
+    Decides which buffered message a free worker runs next.
+
+    Pollers push received messages into their queue's buffer and only
+    receive when the buffer has room (prefetch), so low-priority messages
+    never pile up on the client while their visibility timeout runs. A
+    free worker takes the next message from the eligible queue chosen by
+    the policy:
+
+    - 'strict': the lowest priority number with work always goes first.
+    - 'weighted': stride scheduling; while several queues have work,
+      each is served in proportion to its weight.
+
+    A queue is eligible while it has buffered work and fewer than
+    max_concurrency messages running, so a flood on one queue cannot take
+    every worker. On FIFO queues only one message per MessageGroupId runs
+    at a time, and a failure hands the rest of the group back (via
+    complete()) so it is redelivered in order.
+    """
+
+    def __init__(self, workers, policy='weighted'):
+        if policy not in ('strict', 'weighted'):
+            raise ValueError(f"Unknown scheduling policy: {policy} (use strict or weighted)")
+        self.workers = workers
+        self.policy = policy
+        self.queues = []
+        self._virtual_time = 0.0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def add_queue(self, name, weight=1, priority=0, max_concurrency=None, prefetch=None, fifo=False):
+        max_concurrency = min(max_concurrency or self.workers, self.workers)
+        queue = ScheduledQueue(name, weight, priority, max_concurrency,
+                               prefetch or max(MAX_RECEIVE_MESSAGES, max_concurrency), fifo)
+        self.queues.append(queue)
+        return queue
+
+    def wait_for_room(self, queue, timeout):
+        """Number of messages the queue's poller may receive now (0 after timeout)"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                room = queue.prefetch - len(queue.ready) - queue.running
+                if room > 0 or self._closed:
+                    return max(0, min(MAX_RECEIVE_MESSAGES, room))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 0
+                self._changed.wait(remaining)
+
+    def push(self, queue, messages):
+        """Buffer received messages; each is stored with its receive time"""
+        now = time.monotonic()
+        with self._lock:
+            if not queue.ready and not queue.running:
+                # A queue returning from idle must not spend credit it built up while empty
+                queue.pass_value = max(queue.pass_value, self._virtual_time)
+            queue.ready.extend((message, now) for message in messages)
+            self._changed.notify_all()
+
+    def next_message(self, timeout):
+        """(queue, message, received_at) for a free worker, or None after timeout or close()"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while not self._closed:
+                picked = self._pick()
+                if picked is not None:
+                    return picked
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+            return None
+
+    def complete(self, queue, message, success):
+        """Mark a message done; returns buffered FIFO messages to release after a failure"""
+        released = []
+        with self._lock:
+            queue.running -= 1
+            if queue.fifo:
+                group_id = _group_id(message)
+                queue.busy_groups.discard(group_id)
+                if not success:
+                    kept = deque()
+                    for entry in queue.ready:
+                        (released if _group_id(entry[0]) == group_id else kept).append(entry)
+                    queue.ready = kept
+            self._changed.notify_all()
+        return [entry[0] for entry in released]
+
+    def idle(self, queue):
+        """True when nothing is buffered or running for the queue"""
+        with self._lock:
+            return not queue.ready and not queue.running
+
+    def finish(self, queue):
+        """Mark a queue's poller as done; close() once every queue has finished and drained"""
+        with self._lock:
+            queue.finished = True
+            if all(q.finished and not q.ready and not q.running for q in self.queues):
+                self._closed = True
+            self._changed.notify_all()
+
+    def drained(self):
+        with self._lock:
+            return all(q.finished and not q.ready and not q.running for q in self.queues)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._changed.notify_all()
+
+    def _pick(self):
+        best = None
+        best_index = None
+        for queue in self.queues:
+            if not queue.ready or queue.running >= queue.max_concurrency:
+                continue
+            index = self._first_runnable(queue)
+            if index is None:
+                continue
+            if best is None or self._before(queue, best):
+                best, best_index = queue, index
+        if best is None:
+            return None
+        message, received_at = best.ready[best_index]
+        del best.ready[best_index]
+        best.running += 1
+        best.started += 1
+        best.peak_running = max(best.peak_running, best.running)
+        if best.fifo:
+            best.busy_groups.add(_group_id(message))
+        self._virtual_time = best.pass_value
+        best.pass_value += 1.0 / best.weight
+        return best, message, received_at
+
+    def _before(self, queue, other):
+        if self.policy == 'strict':
+            return queue.priority < other.priority
+        return (queue.pass_value, queue.priority) < (other.pass_value, other.priority)
+
+    def _first_runnable(self, queue):
+        if not queue.fifo:
+            return 0
+        for index, (message, _) in enumerate(queue.ready):
+            if _group_id(message) not in queue.busy_groups:
+                return index
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {queue.name: {'started': queue.started, 'peak_running': queue.peak_running,
+                                 'max_concurrency': queue.max_concurrency} for queue in self.queues}
+
+def _group_id(message):
+    return message.get('Attributes', {}).get('MessageGroupId', message['MessageId'])
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+DLQ Tool Test
+Poisons messages into the local DLQs, then checks the analysis, a filtered redrive and a bulk redrive
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from dlq_tool import analyze, build_selector, redrive
+from local_sqs import LocalSQSClient
+
+def poison(client, queue_url):
+    """Receive everything without deleting it until redrive moves it all to the DLQ"""
+    while True:
+        response = client.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=0,
+                                          VisibilityTimeout=0)
+        if not response.get('Messages'):
+            return
+
+def send_all(client, queue_url, bodies, fifo=False, group_id=None):
+    for start in range(0, len(bodies), 10):
+        entries = []
+        for i, (body, attributes) in enumerate(bodies[start:start + 10]):
+            entry = {'Id': str(i), 'MessageBody': body, 'MessageAttributes': attributes}
+            if fifo:
+                entry['MessageGroupId'] = group_id or f"payment-{start + i}"
+                entry['MessageDeduplicationId'] = f"dedup-{start + i}"
+            entries.append(entry)
+        client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+
+def depth(client, queue_url):
+    attributes = client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['All'])['Attributes']
+    return int(attributes['ApproximateNumberOfMessages'])
+
+def order(i, **extra):
+    body = {"order_id": f"ORD-{i:06d}", "customer_email": f"customer{i}@example.com", "order_total": 10.0,
+            "type": "order_notification"}
+    body.update(extra)
+    return json.dumps(body), {'OrderType': {'StringValue': 'standard', 'DataType': 'String'}}
+
+class FailingDeletes:
+    """Wraps a client so the first DeleteMessageBatch calls fail for every entry"""
+
+    def __init__(self, client, failing_calls):
+        self.client = client
+        self.failing_calls = failing_calls
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        if self.failing_calls > 0:
+            self.failing_calls -= 1
+            return {'Successful': [], 'Failed': [{'Id': entry['Id'], 'Code': 'InternalError', 'SenderFault': False,
+                                                  'Message': 'injected failure'} for entry in Entries]}
+        return self.client.delete_message_batch(QueueUrl=QueueUrl, Entries=Entries)
+
+def check(failures, condition, message):
+    print(f"  {'PASS' if condition else 'FAIL'}: {message}")
+    if not condition:
+        failures.append(message)
+
+def main():
+    print("=" * 60)
+    print("🧪 DLQ Tool - Analysis and Redrive Test")
+    print("=" * 60)
+    failures = []
+    client = LocalSQSClient.from_template(max_wait_seconds=0.05)
+    source = client.get_queue_url(QueueName='order-notifications-queue')['QueueUrl']
+    dlq = client.get_queue_url(QueueName='order-notifications-dlq')['QueueUrl']
+
+    # 600 good-looking orders, 300 with an unexpected field, 100 that are not JSON
+    bodies = [order(i) for i in range(600)] + [order(i, coupon="X") for i in range(600, 900)]
+    bodies += [("not-json-%d" % i, {'OrderType': {'StringValue': 'standard', 'DataType': 'String'}})
+               for i in range(100)]
+    send_all(client, source, bodies)
+    poison(client, source)
+    print(f"\n☠️  {depth(client, dlq)} messages dead-lettered")
+
+    snapshot = os.path.join(tempfile.mkdtemp(), 'dlq.jsonl')
+    with contextlib.redirect_stdout(io.StringIO()):
+        groups = analyze(client, dlq, snapshot, pollers=4, hold_seconds=60)
+    counts = {signature: group['count'] for (_, signature), group in groups.items()}
+    print("\nAnalysis:")
+    check(failures, len(groups) == 3, f"3 failure groups found ({len(groups)})")
+    check(failures, counts.get('undecodable body (JSONDecodeError)') == 100, "100 undecodable bodies")
+    check(failures, counts.get('fields: coupon,customer_email,order_id,order_total,type') == 300,
+          "300 orders with an extra field")
+    with open(snapshot) as snapshot_file:
+        check(failures, sum(1 for _ in snapshot_file) == 1000, "snapshot has one line per message")
+    check(failures, depth(client, dlq) == 1000, "analysis leaves every message visible on the DLQ")
+
+    print("\nFiltered redrive:")
+    result = redrive(client, dlq, select=build_selector(signature_filter='coupon'), pollers=4, hold_seconds=60)
+    check(failures, result['redriven'] == 300, f"300 messages redriven to the source ({result['redriven']})")
+    check(failures, depth(client, source) == 300, "source queue holds the redriven messages")
+    check(failures, depth(client, dlq) == 700, "unselected messages are visible again on the DLQ")
+
+    print("\nLimited, rate-controlled redrive:")
+    started = time.perf_counter()
+    result = redrive(client, dlq, select=build_selector(message_type_filter='standard'), rate=200, limit=500,
+                     pollers=4, hold_seconds=60)
+    elapsed = time.perf_counter() - started
+    check(failures, result['redriven'] == 500, f"limit of 500 respected ({result['redriven']})")
+    # The bucket starts with one second of budget, so 500 messages at 200/sec take at least 1.5s
+    check(failures, elapsed >= 1.4, f"rate of 200 msgs/sec respected ({elapsed:.2f}s)")
+
+    slow = LocalSQSClient.from_template(max_wait_seconds=0.05)
+    slow_source = slow.get_queue_url(QueueName='order-notifications-queue')['QueueUrl']
+    slow_dlq = slow.get_queue_url(QueueName='order-notifications-dlq')['QueueUrl']
+    send_all(slow, slow_dlq, [order(i) for i in range(12)])
+    started = time.perf_counter()
+    result = redrive(slow, slow_dlq, target_url=slow_source, rate=4, pollers=1, hold_seconds=60)
+    elapsed = time.perf_counter() - started
+    # One batch of 12 at 4/sec: 4 tokens in the bucket, then 2s to pay off the other 8
+    check(failures, result['redriven'] == 12 and elapsed >= 1.9,
+          f"a rate below the batch size is respected ({elapsed:.2f}s for 12 at 4/sec)")
+
+    print("\nFailed deletes:")
+    flaky = LocalSQSClient.from_template(max_wait_seconds=0.05)
+    flaky_source = flaky.get_queue_url(QueueName='order-notifications-queue')['QueueUrl']
+    flaky_dlq = flaky.get_queue_url(QueueName='order-notifications-dlq')['QueueUrl']
+    send_all(flaky, flaky_dlq, [order(i) for i in range(30)])
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = redrive(FailingDeletes(flaky, 1), flaky_dlq, target_url=flaky_source, pollers=1, hold_seconds=60)
+    check(failures, result['not_deleted'] == 10 and result['redriven'] == 20,
+          f"messages whose delete failed are not counted as redriven ({result['redriven']} redriven, "
+          f"{result['not_deleted']} not deleted)")
+
+    print("\nFIFO redrive:")
+    fifo_source = client.get_queue_url(QueueName='payment-processing-queue.fifo')['QueueUrl']
+    fifo_dlq = client.get_queue_url(QueueName='payment-processing-dlq.fifo')['QueueUrl']
+    send_all(client, fifo_source, [order(i) for i in range(50)], fifo=True)
+    poison(client, fifo_source)
+    result = redrive(client, fifo_dlq, pollers=2, hold_seconds=60)
+    check(failures, result['redriven'] == 50 and depth(client, fifo_source) == 50,
+          "FIFO messages are not dropped by deduplication on the way back")
+
+    print("\nShared FIFO group:")
+    shared = LocalSQSClient.from_template(max_wait_seconds=0.05)
+    shared_source = shared.get_queue_url(QueueName='payment-processing-queue.fifo')['QueueUrl']
+    shared_dlq = shared.get_queue_url(QueueName='payment-processing-dlq.fifo')['QueueUrl']
+    # Position 20 of the group has an unexpected field and is not selected for the second redrive
+    send_all(shared, shared_dlq, [order(i, coupon="X") if i == 20 else order(i) for i in range(50)], fifo=True,
+             group_id="payment-shared")
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        groups = analyze(shared, shared_dlq, pollers=4, hold_seconds=60)
+    read = sum(group['count'] for group in groups.values())
+    check(failures, read < 50 and "Only %d of ~50 messages could be read" % read in output.getvalue(),
+          f"analyze warns that it read {read} of the 50 messages in one group")
+    check(failures, depth(shared, shared_dlq) == 50, "the whole group is visible again after analyze")
+    result = redrive(shared, shared_dlq, target_url=shared_source, select=lambda record: 'coupon' not in
+                     record['signature'], pollers=4, hold_seconds=60)
+    check(failures, result['redriven'] == 20 and result['blocked_groups'] == 1 and depth(shared, shared_dlq) == 30,
+          f"selective redrive stops the group at the unselected message ({result['redriven']} redriven)")
+    result = redrive(shared, shared_dlq, target_url=shared_source, pollers=4, hold_seconds=60)
+    check(failures, result['redriven'] == 30 and depth(shared, shared_dlq) == 0,
+          f"a full redrive walks the rest of the group ({result['redriven']} redriven)")
+    received = []
+    while True:
+        response = shared.receive_message(QueueUrl=shared_source, MaxNumberOfMessages=10, WaitTimeSeconds=0)
+        if not response.get('Messages'):
+            break
+        for message in response['Messages']:
+            received.append(json.loads(message['Body'])['order_id'])
+            shared.delete_message(QueueUrl=shared_source, ReceiptHandle=message['ReceiptHandle'])
+    check(failures, received == [f"ORD-{i:06d}" for i in range(50)], "the group arrives on the source in order")
+
+    print("\nBulk redrive:")
+    bulk = LocalSQSClient.from_template(latency_seconds=0.002, max_wait_seconds=0.05)
+    bulk_source = bulk.get_queue_url(QueueName='order-notifications-queue')['QueueUrl']
+    bulk_dlq = bulk.get_queue_url(QueueName='order-notifications-dlq')['QueueUrl']
+    send_all(bulk, bulk_dlq, [order(i) for i in range(20000)])
+    result = redrive(bulk, bulk_dlq, target_url=bulk_source, pollers=16, hold_seconds=300)
+    print(f"  {result['redriven']} messages in {result['seconds']:.1f}s ({result['msgs_per_sec']:.0f} msgs/sec)")
+    check(failures, result['redriven'] == 20000 and depth(bulk, bulk_dlq) == 0, "20000 messages redriven")
+
+    print("\n" + "=" * 60)
+    print("✅ All checks passed!" if not failures else f"❌ {len(failures)} check(s) failed")
+    print("=" * 60)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
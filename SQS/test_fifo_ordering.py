@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+FIFO Ordering Stress Test
+Checks that the GroupDispatcher keeps per-group ordering under contention
+"""
+
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from consumer import GroupDispatcher
+
+def build_messages(groups, per_group):
+    """Interleave sequenced messages from many groups, as a FIFO queue would"""
+    messages = []
+    for seq in range(per_group):
+        for group in range(groups):
+            messages.append({
+                'MessageId': f"g{group}-m{seq}",
+                'ReceiptHandle': f"rh-g{group}-m{seq}",
+                'Attributes': {'MessageGroupId': f"payment-{group}"},
+                'Body': str(seq)
+            })
+    return messages
+
+def run_stress(groups=50, per_group=40, lanes=16, fail_rate=0.0):
+    """Dispatch all messages and return (violations, peak parallel groups, elapsed)"""
+    processed = {}
+    running = {}
+    lock = threading.Lock()
+    stats = {'concurrent': 0, 'peak': 0, 'violations': []}
+    done = threading.Semaphore(0)
+
+    def handler(message):
+        group_id = message['Attributes']['MessageGroupId']
+        with lock:
+            if running.get(group_id):
+                stats['violations'].append(f"{group_id}: two messages running at once")
+            running[group_id] = True
+            stats['concurrent'] += 1
+            stats['peak'] = max(stats['peak'], stats['concurrent'])
+        time.sleep(random.uniform(0, 0.002))
+        with lock:
+            seen = processed.setdefault(group_id, [])
+            seq = int(message['Body'])
+            if seen and seq <= seen[-1]:
+                stats['violations'].append(f"{group_id}: {seq} processed after {seen[-1]}")
+            seen.append(seq)
+            running[group_id] = False
+            stats['concurrent'] -= 1
+        return random.random() >= fail_rate
+
+    def on_done(message, success):
+        done.release()
+
+    messages = build_messages(groups, per_group)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=lanes) as executor:
+        dispatcher = GroupDispatcher(executor, handler, on_done)
+        for message in messages:
+            dispatcher.dispatch(message)
+        for _ in messages:
+            done.acquire()
+    return stats['violations'], stats['peak'], time.perf_counter() - started
+
+def main():
+    print("=" * 60)
+    print("🧪 FIFO Group Dispatcher - Ordering Stress Test")
+    print("=" * 60)
+
+    failures = 0
+    for fail_rate in (0.0, 0.05):
+        violations, peak, elapsed = run_stress(fail_rate=fail_rate)
+        print(f"\nFailure rate {fail_rate:.0%}: {elapsed:.2f}s, up to {peak} groups in parallel")
+        if violations:
+            failures += 1
+            print(f"  FAIL: {len(violations)} ordering violations, e.g. {violations[0]}")
+        else:
+            print("  PASS: Every group processed in order, one message at a time.")
+        if peak < 2:
+            failures += 1
+            print("  FAIL: Groups never ran in parallel.")
+
+    print("\n" + "=" * 60)
+    print("✅ All checks passed!" if not failures else f"❌ {failures} check(s) failed")
+    print("=" * 60)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Message Codec Test
+Checks that every available codec round-trips, and that plain JSON bodies decode without the optional packages
+"""
+
+import importlib
+import json
+import sys
+
+import message_codec
+
+def check(failures, condition, message):
+    print(f"  {'PASS' if condition else 'FAIL'}: {message}")
+    if not condition:
+        failures.append(message)
+
+SAMPLE = {'orderId': 'ORD-001', 'customerEmail': 'customer1@example.com', 'amount': 99.99,
+          'items': [{'sku': f"SKU-{i}", 'quantity': i} for i in range(200)]}
+
+def check_round_trips(failures, codec_module):
+    for name in codec_module.CODECS:
+        for compress in (False, True):
+            body = codec_module.encode_body(SAMPLE, name, compress=compress)
+            check(failures, codec_module.decode_body(body) == SAMPLE,
+                  f"{name}{' + zlib' if compress else ''} round-trips")
+    plain = json.dumps(SAMPLE)
+    check(failures, codec_module.decode_body(plain) == SAMPLE, "a plain json.dumps body decodes")
+    check(failures, codec_module.LazyMessage({'Body': plain}).body == SAMPLE, "LazyMessage decodes a plain body")
+
+def main():
+    print("=" * 60)
+    print("🧪 Message Codecs - Round Trips")
+    print("=" * 60)
+    failures = []
+
+    print(f"\nInstalled codecs ({', '.join(message_codec.CODECS)}):")
+    check_round_trips(failures, message_codec)
+
+    print("\nWithout orjson and msgpack:")
+    saved = {name: sys.modules.get(name) for name in ('orjson', 'msgpack')}
+    sys.modules.update({'orjson': None, 'msgpack': None})  # None makes the import raise ImportError
+    try:
+        bare = importlib.reload(message_codec)
+        check(failures, list(bare.CODECS) == ['json'], "only the json codec is registered")
+        check_round_trips(failures, bare)
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        importlib.reload(message_codec)
+
+    print("\n" + "=" * 60)
+    print("✅ All checks passed!" if not failures else f"❌ {len(failures)} check(s) failed")
+    print("=" * 60)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
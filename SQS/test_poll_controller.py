@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Poll Controller Test
+Checks how the PollController sizes pollers, waits and batches, then runs the adaptive consumer on local queues
+"""
+
+import contextlib
+import io
+import json
+import sys
+import threading
+import time
+
+from consumer import consume_queue_adaptive
+from local_sqs import LocalSQSClient
+from poll_controller import MAX_RECEIVE_MESSAGES, MAX_WAIT_SECONDS, PollController
+
+def check(failures, condition, message):
+    print(f"  {'PASS' if condition else 'FAIL'}: {message}")
+    if not condition:
+        failures.append(message)
+
+def check_waits(failures):
+    print("\nLong-poll wait:")
+    controller = PollController(min_wait_seconds=1)
+    check(failures, controller.plan() == (MAX_WAIT_SECONDS, MAX_RECEIVE_MESSAGES),
+          "an idle controller starts with one full-length long poll of 10 messages")
+    controller.record_receive(10, 10, 0.02)
+    check(failures, controller.plan()[0] == 1, "the wait drops to min_wait_seconds while messages flow")
+    waits = []
+    for _ in range(6):
+        controller.record_receive(10, 0, 1.0)
+        waits.append(controller.plan()[0])
+    check(failures, waits == [2, 4, 8, 16, 20, 20], f"empty receives double the wait up to 20s ({waits})")
+
+def check_pollers(failures):
+    print("\nPoller count:")
+    controller = PollController(max_pollers=8, target_drain_seconds=10.0, shrink_after_empty=2)
+    controller.record_receive(10, 10, 0.02)
+    controller.record_handler(0.01)
+    # One poller drains 10 messages per 0.02 + 10 * 0.01 seconds, about 83/s; 5000 in 10s needs 6
+    controller.record_depth(5000)
+    check(failures, controller.pollers == 6, f"a 5000-message backlog scales up at once ({controller.pollers})")
+    controller.record_depth(100000)
+    check(failures, controller.pollers == 8, "the poller count is capped at max_pollers")
+    controller.record_depth(10)
+    check(failures, controller.pollers == 7, "a small backlog steps down one poller per sample")
+    controller.record_receive(10, 0, 1.0)
+    controller.record_receive(10, 0, 1.0)
+    check(failures, controller.pollers == 6, "two empty receives in a row remove a poller")
+
+    controller = PollController(min_pollers=1, max_pollers=4)
+    check(failures, not controller.wait_until_active(2, timeout=0.01), "an inactive poller stays parked")
+    woken = []
+    waiter = threading.Thread(target=lambda: woken.append(controller.wait_until_active(2, timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    controller.record_receive(10, 10, 0.01)
+    controller.record_handler(0.01)
+    controller.record_depth(100000)
+    waiter.join()
+    check(failures, woken == [True], "scaling up wakes a parked poller")
+
+    controller = PollController(depth_interval=60)
+    check(failures, [controller.sample_due(), controller.sample_due()] == [True, False],
+          "the depth is sampled once per depth_interval")
+
+def check_batches(failures):
+    print("\nBatch size:")
+    controller = PollController(visibility_timeout=30)
+    controller.record_handler(6.0)
+    check(failures, controller.plan()[1] == 2, "6s handlers get 2 messages, half of a 30s visibility timeout")
+    controller = PollController(visibility_timeout=30)
+    controller.record_handler(0.001)
+    check(failures, controller.plan()[1] == MAX_RECEIVE_MESSAGES, "fast handlers get full batches")
+
+def run_adaptive(client, queue_url, handler, pollers=4):
+    controller = PollController(max_pollers=pollers, visibility_timeout=30, depth_interval=0.2,
+                                target_drain_seconds=0.5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        processed = consume_queue_adaptive(client, queue_url, queue_url.rsplit('/', 1)[-1], 0, handler, controller,
+                                           idle_timeout=1.0)
+    return processed, controller.stats()
+
+def check_standard_drain(failures):
+    print("\nAdaptive consumer (standard queue):")
+    client = LocalSQSClient.from_template(latency_seconds=0.001, max_wait_seconds=0.2)
+    queue_url = client.get_queue_url(QueueName='order-notifications-queue')['QueueUrl']
+    for start in range(0, 2000, 10):
+        client.send_message_batch(QueueUrl=queue_url, Entries=[
+            {'Id': str(i), 'MessageBody': json.dumps({'n': start + i})} for i in range(10)])
+    processed, stats = run_adaptive(client, queue_url, lambda queue_name, message: time.sleep(0.001) or True)
+    check(failures, processed == 2000, f"2000 messages drained ({processed})")
+    check(failures, stats['peak_pollers'] > 1, f"pollers scaled up for the backlog (peak {stats['peak_pollers']})")
+
+def check_fifo_order(failures):
+    print("\nAdaptive consumer (FIFO queue with failures):")
+    client = LocalSQSClient.from_template(latency_seconds=0.001, max_wait_seconds=0.2)
+    queue_url = client.get_queue_url(QueueName='payment-processing-queue.fifo')['QueueUrl']
+    groups, per_group = 10, 30
+    for seq in range(per_group):
+        client.send_message_batch(QueueUrl=queue_url, Entries=[
+            {'Id': str(group), 'MessageBody': json.dumps({'group': group, 'seq': seq}),
+             'MessageGroupId': f"payment-{group}", 'MessageDeduplicationId': f"{group}-{seq}"}
+            for group in range(groups)])
+
+    lock = threading.Lock()
+    attempts = {}
+    succeeded = {}
+
+    def handler(queue_name, message):
+        body = json.loads(message['Body'])
+        key = (body['group'], body['seq'])
+        with lock:
+            attempts[key] = attempts.get(key, 0) + 1
+            # Every seventh message fails on its first attempt
+            if (body['group'] + body['seq']) % 7 == 0 and attempts[key] == 1:
+                return False
+            succeeded.setdefault(body['group'], []).append(body['seq'])
+        return True
+
+    processed, _ = run_adaptive(client, queue_url, handler)
+    in_order = all(succeeded.get(group) == list(range(per_group)) for group in range(groups))
+    check(failures, processed == groups * per_group, f"every payment processed once ({processed})")
+    check(failures, in_order, "each group succeeds in sequence order although some messages failed first")
+
+def main():
+    print("=" * 60)
+    print("🧪 Poll Controller - Sizing and Adaptive Consumer Test")
+    print("=" * 60)
+    failures = []
+    check_waits(failures)
+    check_pollers(failures)
+    check_batches(failures)
+    check_standard_drain(failures)
+    check_fifo_order(failures)
+
+    print("\n" + "=" * 60)
+    print("✅ All checks passed!" if not failures else f"❌ {len(failures)} check(s) failed")
+    print("=" * 60)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Queue Scheduler Test
+Checks the scheduling policies, then floods the notification queue and measures payment latency
+"""
+
+import contextlib
+import io
+import json
+import sys
+import threading
+import time
+
+from consumer import consume_queues_scheduled
+from local_sqs import LocalSQSClient
+from scheduler import QueueScheduler
+
+def check(failures, condition, message):
+    print(f"  {'PASS' if condition else 'FAIL'}: {message}")
+    if not condition:
+        failures.append(message)
+
+def fake_messages(prefix, count, groups=None):
+    messages = []
+    for i in range(count):
+        message = {'MessageId': f"{prefix}-{i}", 'ReceiptHandle': f"rh-{prefix}-{i}"}
+        if groups:
+            message['Attributes'] = {'MessageGroupId': f"group-{i % groups}"}
+        messages.append(message)
+    return messages
+
+def drain_order(scheduler, count):
+    """Pick `count` messages one at a time (one worker), returning the queue name of each"""
+    order = []
+    for _ in range(count):
+        queue, message, _ = scheduler.next_message(timeout=0)
+        order.append(queue.name)
+        scheduler.complete(queue, message, True)
+    return order
+
+def check_policies(failures):
+    print("\nPolicies:")
+    scheduler = QueueScheduler(workers=1, policy='strict')
+    low = scheduler.add_queue('notifications', priority=1, prefetch=1000)
+    high = scheduler.add_queue('payments', priority=0, prefetch=1000)
+    scheduler.push(low, fake_messages('n', 50))
+    scheduler.push(high, fake_messages('p', 50))
+    order = drain_order(scheduler, 100)
+    check(failures, order == ['payments'] * 50 + ['notifications'] * 50,
+          "strict: every payment runs before any notification")
+
+    scheduler = QueueScheduler(workers=1, policy='weighted')
+    low = scheduler.add_queue('notifications', weight=1, prefetch=1000)
+    high = scheduler.add_queue('payments', weight=3, prefetch=1000)
+    scheduler.push(low, fake_messages('n', 400))
+    scheduler.push(high, fake_messages('p', 400))
+    order = drain_order(scheduler, 400)
+    check(failures, abs(order.count('payments') - 300) <= 1,
+          f"weighted 3:1: {order.count('payments')} payments, {order.count('notifications')} notifications of 400")
+
+    scheduler = QueueScheduler(workers=8, policy='weighted')
+    limited = scheduler.add_queue('notifications', max_concurrency=2, prefetch=100)
+    scheduler.push(limited, fake_messages('n', 10))
+    picked = [scheduler.next_message(timeout=0) for _ in range(3)]
+    check(failures, picked[2] is None and limited.running == 2, "max_concurrency caps running messages at 2")
+
+    scheduler = QueueScheduler(workers=8, policy='weighted')
+    fifo = scheduler.add_queue('payments.fifo', prefetch=100, fifo=True)
+    scheduler.push(fifo, fake_messages('p', 6, groups=2))  # group-0: p-0, p-2, p-4; group-1: p-1, p-3, p-5
+    first = scheduler.next_message(timeout=0)
+    second = scheduler.next_message(timeout=0)
+    third = scheduler.next_message(timeout=0)
+    check(failures, [first[1]['MessageId'], second[1]['MessageId']] == ['p-0', 'p-1'] and third is None,
+          "FIFO: one message per group runs at a time")
+    released = scheduler.complete(fifo, first[1], False)
+    check(failures, [message['MessageId'] for message in released] == ['p-2', 'p-4'],
+          "FIFO: a failure hands the rest of its group back")
+
+def run_flood(policy, notifications=3000, payments=200, workers=8, handler_seconds=0.005):
+    """Flood notifications, trickle payments in, and return per-queue observations"""
+    client = LocalSQSClient.from_template(latency_seconds=0.001, max_wait_seconds=0.5)
+    standard_url = client.get_queue_url(QueueName='order-notifications-queue')['QueueUrl']
+    fifo_url = client.get_queue_url(QueueName='payment-processing-queue.fifo')['QueueUrl']
+    for start in range(0, notifications, 10):
+        client.send_message_batch(QueueUrl=standard_url, Entries=[
+            {'Id': str(i), 'MessageBody': json.dumps({'type': 'notification', 'n': start + i})}
+            for i in range(10)])
+
+    lock = threading.Lock()
+    running = {'notification': 0, 'payment': 0}
+    peaks = {'notification': 0, 'payment': 0}
+    payment_waits = []
+    sequences = {}
+    violations = []
+
+    def handler(queue_name, message):
+        body = json.loads(message['Body'])
+        kind = body['type']
+        with lock:
+            running[kind] += 1
+            peaks[kind] = max(peaks[kind], running[kind])
+            if kind == 'payment':
+                payment_waits.append(time.time() - body['sent'])
+                seen = sequences.setdefault(body['group'], [])
+                if seen and body['seq'] <= seen[-1]:
+                    violations.append(f"{body['group']}: {body['seq']} after {seen[-1]}")
+                seen.append(body['seq'])
+        time.sleep(handler_seconds)
+        with lock:
+            running[kind] -= 1
+        return True
+
+    def trickle():
+        for i in range(payments):
+            group, seq = f"payment-{i % 20}", i // 20
+            body = json.dumps({'type': 'payment', 'group': group, 'seq': seq, 'sent': time.time()})
+            client.send_message(QueueUrl=fifo_url, MessageBody=body, MessageGroupId=group,
+                                MessageDeduplicationId=f"pay-{i}")
+            time.sleep(0.005)
+
+    queues = [
+        {'queue_url': fifo_url, 'name': 'payments', 'priority': 0, 'weight': 4},
+        {'queue_url': standard_url, 'name': 'notifications', 'priority': 1, 'weight': 1,
+         'max_concurrency': workers * 3 // 4}
+    ]
+    producer = threading.Thread(target=trickle)
+    started = time.perf_counter()
+    producer.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        processed = consume_queues_scheduled(client, queues, workers, policy, max_messages=0, handler=handler,
+                                             idle_timeout=2)
+    producer.join()
+    waits = sorted(payment_waits)
+    return {
+        'processed': processed,
+        'elapsed': time.perf_counter() - started,
+        'payment_p95_ms': waits[int(len(waits) * 0.95)] * 1000 if waits else float('inf'),
+        'peaks': peaks,
+        'violations': violations
+    }
+
+def main():
+    print("=" * 60)
+    print("🧪 Queue Scheduler - Priority and Fairness Test")
+    print("=" * 60)
+    failures = []
+    check_policies(failures)
+
+    # Draining 3000 notifications on 6 workers takes about 2.5s, which is what a
+    # payment would wait if it sat behind the notification backlog
+    for policy in ('strict', 'weighted'):
+        print(f"\nNotification flood ({policy}):")
+        result = run_flood(policy)
+        print(f"  {result['processed']} in {result['elapsed']:.1f}s, payment p95 wait "
+              f"{result['payment_p95_ms']:.1f} ms, peak workers {result['peaks']}")
+        check(failures, result['processed'] == {'payments': 200, 'notifications': 3000},
+              "every payment and notification processed")
+        check(failures, result['payment_p95_ms'] < 250, "payments are not stuck behind the flood (p95 < 250 ms)")
+        check(failures, result['peaks']['notification'] <= 6, "notifications never hold more than 6 of 8 workers")
+        check(failures, not result['violations'], "payment groups processed in order")
+
+    print("\n" + "=" * 60)
+    print("✅ All checks passed!" if not failures else f"❌ {len(failures)} check(s) failed")
+    print("=" * 60)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Asyncio SQS/SNS Transport
+Shared by the SQS and SNS labs
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+class AsyncTransport:
+    """
+    Async send/receive/publish on top of one pooled boto3 session.
+
+    Every service client shares the session and is configured with
+    max_pool_connections=max_connections; blocking botocore calls run on an
+    executor of the same size, so up to max_connections requests are in
+    flight at once from a single event loop. Pre-built clients (e.g. a local
+    stand-in) can be passed in through `clients`.
+    """
+
+    def __init__(self, max_connections=100, region_name=None, session=None, clients=None):
+        self.max_connections = max_connections
+        self.session = session or boto3.session.Session(region_name=region_name)
+        self.config = Config(max_pool_connections=max_connections, retries={'mode': 'adaptive'})
+        self._clients = dict(clients or {})
+        self._clients_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='aws-async')
+
+    def client(self, service):
+        """Return the shared client for a service, creating it on first use"""
+        with self._clients_lock:
+            if service not in self._clients:
+                self._clients[service] = self.session.client(service, config=self.config)
+            return self._clients[service]
+
+    async def call(self, service, operation, **kwargs):
+        """Run any API operation without blocking the event loop"""
+        method = getattr(self.client(service), operation)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(method, **kwargs))
+
+    async def send(self, queue_url, message_body, message_attributes=None, **kwargs):
+        """SendMessage (pass MessageGroupId/MessageDeduplicationId for FIFO queues)"""
+        if message_attributes:
+            kwargs['MessageAttributes'] = message_attributes
+        return await self.call('sqs', 'send_message', QueueUrl=queue_url, MessageBody=message_body, **kwargs)
+
+    async def send_batch(self, queue_url, entries):
+        """SendMessageBatch with up to 10 entries"""
+        return await self.call('sqs', 'send_message_batch', QueueUrl=queue_url, Entries=entries)
+
+    async def receive(self, queue_url, max_messages=10, wait_seconds=20, **kwargs):
+        """ReceiveMessage; returns the list of messages (possibly empty)"""
+        kwargs.setdefault('MessageAttributeNames', ['All'])
+        response = await self.call('sqs', 'receive_message', QueueUrl=queue_url,
+                                   MaxNumberOfMessages=max_messages, WaitTimeSeconds=wait_seconds, **kwargs)
+        return response.get('Messages', [])
+
+    async def delete(self, queue_url, receipt_handle):
+        """DeleteMessage"""
+        return await self.call('sqs', 'delete_message', QueueUrl=queue_url, ReceiptHandle=receipt_handle)
+
+    async def delete_batch(self, queue_url, receipt_handles):
+        """DeleteMessageBatch for up to 10 receipt handles"""
+        entries = [{'Id': str(i), 'ReceiptHandle': receipt_handle} for i, receipt_handle in enumerate(receipt_handles)]
+        return await self.call('sqs', 'delete_message_batch', QueueUrl=queue_url, Entries=entries)
+
+    async def publish(self, topic_arn, message, message_attributes=None, subject=None, **kwargs):
+        """SNS Publish"""
+        if message_attributes:
+            kwargs['MessageAttributes'] = message_attributes
+        if subject:
+            kwargs['Subject'] = subject
+        return await self.call('sns', 'publish', TopicArn=topic_arn, Message=message, **kwargs)
+
+    async def publish_batch(self, topic_arn, entries):
+        """SNS PublishBatch with up to 10 entries"""
+        return await self.call('sns', 'publish_batch', TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+
+    def close(self):
+        """Wait for running calls and shut the executor down"""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+CloudFormation Template Loader
+Reads the labs' CloudFormation YAML templates, keeping short-form intrinsics as {tag: value} dictionaries
+"""
+
+import yaml
+
+class CloudFormationLoader(yaml.SafeLoader):
+    """SafeLoader that accepts the CloudFormation short-form tags (!Ref, !GetAtt, !Sub, ...)"""
+
+def _construct_intrinsic(loader, tag_suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node)
+    else:
+        value = loader.construct_mapping(node)
+    return {tag_suffix: value}
+
+CloudFormationLoader.add_multi_constructor('!', _construct_intrinsic)
+
+def read_template(path):
+    """Parse a CloudFormation YAML/JSON template; `!Ref Queue` becomes {'Ref': 'Queue'}"""
+    with open(path) as template_file:
+        return yaml.load(template_file, Loader=CloudFormationLoader)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Claim Check
+Stores large message bodies in an object store and sends a small pointer through the queue or topic instead
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Mapping
+
+OFFLOAD_THRESHOLD_BYTES = 64 * 1024  # SQS bills every 64 KB chunk of a message as one request
+POINTER_KEY = 'claim_check'
+POINTER_PREFIX = '{"' + POINTER_KEY + '"'
+SIZE_ATTRIBUTE = 'ExtendedPayloadSize'
+CHUNK_BYTES = 64 * 1024
+
+class ClaimCheckError(Exception):
+    pass
+
+class LocalObjectStore:
+    """
+    Filesystem stand-in for an S3 bucket.
+
+    Objects are written to a temporary file and renamed into place, so a
+    reader never sees a partial object.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def put(self, key, data):
+        path = self._path(key)
+        if os.path.exists(path):
+            return  # Keys are content hashes, so the stored object is already identical
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+    def open(self, key):
+        """A binary file object for streaming reads"""
+        try:
+            return open(self._path(key), 'rb')
+        except FileNotFoundError:
+            raise ClaimCheckError(f"Object {key} not found in {self.root}")
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def location(self, key):
+        return f"file://{self._path(key)}"
+
+class S3ObjectStore:
+    """The same interface backed by an S3 bucket; reads stream from the GetObject body"""
+
+    def __init__(self, bucket, s3_client=None, prefix='claim-check/'):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.s3_client = s3_client or boto3.client('s3')
+
+    def put(self, key, data):
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def open(self, key):
+        return self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+
+    def delete(self, key):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def location(self, key):
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+class ClaimCheck:
+    """
+    Offloads large bodies to an object store and resolves the pointers again.
+
+    offload() stores any body of threshold_bytes or more (zlib-compressed
+    when that saves at least 10%) under its SHA-256 and returns a pointer
+    body plus an ExtendedPayloadSize attribute. fetch() streams the object
+    back in chunks, verifies the hash and keeps recently fetched bodies in
+    a byte-bounded LRU cache, so fan-out copies and redeliveries of one
+    payload are read once.
+    """
+
+    def __init__(self, store, threshold_bytes=OFFLOAD_THRESHOLD_BYTES, cache_bytes=32 * 1024 * 1024):
+        self.store = store
+        self.threshold_bytes = threshold_bytes
+        self.cache_bytes = cache_bytes
+        self.offloaded = 0
+        self.fetched = 0
+        self.cache_hits = 0
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def offload(self, body, attributes=None):
+        """Return (body, attributes) to send: unchanged for small bodies, a pointer for large ones"""
+        data = body.encode('utf-8')
+        if len(data) < self.threshold_bytes:
+            return body, attributes
+
+        digest = hashlib.sha256(data).hexdigest()
+        stored = zlib.compress(data, 6)
+        encoding = 'zlib'
+        if len(stored) >= len(data) * 0.9:
+            stored = data
+            encoding = 'identity'
+        self.store.put(digest, stored)
+        self.offloaded += 1
+
+        pointer = json.dumps({POINTER_KEY: {
+            'key': digest,
+            'location': self.store.location(digest),
+            'size': len(data),
+            'stored_size': len(stored),
+            'encoding': encoding
+        }})
+        attributes = dict(attributes or {})
+        attributes[SIZE_ATTRIBUTE] = {'DataType': 'Number', 'StringValue': str(len(data))}
+        return pointer, attributes
+
+    @staticmethod
+    def is_pointer(body):
+        """Cheap check that needs no JSON parsing"""
+        return isinstance(body, str) and body.startswith(POINTER_PREFIX)
+
+    def fetch(self, pointer_body):
+        """The original body behind a pointer"""
+        pointer = json.loads(pointer_body)[POINTER_KEY]
+        key = pointer['key']
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return body
+
+        digest = hashlib.sha256()
+        decompressor = zlib.decompressobj() if pointer['encoding'] == 'zlib' else None
+        chunks = []
+        stream = self.store.open(key)
+        try:
+            while True:
+                chunk = stream.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                digest.update(chunk)
+                chunks.append(chunk)
+        finally:
+            stream.close()
+        if decompressor is not None:
+            tail = decompressor.flush()
+            digest.update(tail)
+            chunks.append(tail)
+        if digest.hexdigest() != key:
+            raise ClaimCheckError(f"Object {key} failed its integrity check")
+
+        body = b''.join(chunks).decode('utf-8')
+        self.fetched += 1
+        self._remember(key, body, pointer['size'])
+        return body
+
+    def resolve(self, body):
+        """Fetch the body behind a pointer; any other body is returned as-is"""
+        return self.fetch(body) if self.is_pointer(body) else body
+
+    def _remember(self, key, body, size):
+        if size > self.cache_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = body
+            self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted.encode('utf-8'))
+
+    def stats(self):
+        return {'offloaded': self.offloaded, 'fetched': self.fetched, 'cache_hits': self.cache_hits,
+                'cached_bytes': self._cached_bytes}
+
+class ClaimCheckMessage(Mapping):
+    """
+    A received message whose Body is fetched from the object store on first access.
+
+    Everything else (MessageId, ReceiptHandle, attributes) is read straight
+    from the original message, so routing and deleting never touch the store.
+    """
+
+    def __init__(self, message, claim_check):
+        self.message = message
+        self.claim_check = claim_check
+        self._body = None
+
+    def __getitem__(self, key):
+        if key != 'Body':
+            return self.message[key]
+        if self._body is None:
+            self._body = self.claim_check.resolve(self.message['Body'])
+        return self._body
+
+    def __iter__(self):
+        return iter(self.message)
+
+    def __len__(self):
+        return len(self.message)
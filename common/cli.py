@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Command-Line Options
+Validated `--name value` options for the lab scripts, so a trailing flag or a
+bad value prints a usage error instead of a traceback
+"""
+
+import sys
+
+def usage_error(message, usage=None):
+    """Report a usage error through the script's usage(message), or print it and exit 1"""
+    if usage is not None:
+        usage(message)
+    print(f"❌ {message}")
+    sys.exit(1)
+
+def get_option(args, name, default, choices=None, usage=None):
+    """
+    Read a --name value option, converted to the type of default.
+
+    A missing value, a value that does not convert, or one outside
+    `choices` is a usage error (see usage_error).
+    """
+    if name not in args:
+        return default
+    index = args.index(name) + 1
+    if index >= len(args) or args[index].startswith('--'):
+        usage_error(f"{name} needs a value", usage)
+    try:
+        value = type(default)(args[index])
+    except ValueError:
+        usage_error(f"Invalid value for {name}: {args[index]!r}", usage)
+    if choices is not None and value not in choices:
+        usage_error(f"Invalid value for {name}: {args[index]!r} (use {', '.join(choices)})", usage)
+    return value
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Lab Metrics
+Counters, histograms and timing spans aggregated in-process and flushed to
+CloudWatch EMF, StatsD or Prometheus text. Everything is a no-op until an
+exporter is configured, so instrumented hot paths cost one method call.
+
+Configure from the command line (--metrics emf|statsd|prometheus, --quiet)
+or the environment:
+  METRICS_EXPORTER      emf | statsd | prometheus (unset = disabled)
+  METRICS_FLUSH_SECONDS flush interval (default 10, or 0 = every span in Lambda)
+  METRICS_NAMESPACE     EMF namespace / metric name prefix (default SAALabs)
+  STATSD_HOST, STATSD_PORT
+  PROMETHEUS_FILE       textfile-collector path (default: print to stdout)
+  QUIET=true            drop the per-message status prints
+"""
+
+import atexit
+import bisect
+import functools
+import json
+import math
+import os
+import re
+import socket
+import sys
+import threading
+import time
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+QUIET = os.environ.get('QUIET', 'false').lower() == 'true'
+
+def nearest_rank(pct, count):
+    """1-based rank of the pct-th percentile among count samples (nearest-rank method)"""
+    return min(count, max(1, math.ceil(pct * count / 100.0)))
+
+def percentile(values, pct, default=0.0):
+    """Nearest-rank percentile of a list of numbers; `default` when the list is empty"""
+    if not values:
+        return default
+    ordered = sorted(values)
+    return ordered[nearest_rank(pct, len(ordered)) - 1]
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max"""
+
+    __slots__ = ('counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th sample (capped at max)"""
+        if not self.count:
+            return 0.0
+        rank = nearest_rank(pct, self.count)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return round(min(BUCKETS_MS[index], self.max) if index < len(BUCKETS_MS) else self.max, 3)
+        return round(self.max, 3)
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class _Span:
+    """Times a block into the histogram `name` (ms) and counts `name.errors` on exceptions"""
+
+    __slots__ = ('metrics', 'name', 'tags', 'started')
+
+    def __init__(self, metrics, name, tags):
+        self.metrics = metrics
+        self.name = name
+        self.tags = tags
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.observe(self.name, (time.perf_counter() - self.started) * 1000, **self.tags)
+        if exc_type is not None:
+            self.metrics.incr(self.name + '.errors', **self.tags)
+        self.metrics.flush_if_due()
+        return False
+
+class Metrics:
+    """
+    In-process aggregation keyed by (name, tags).
+
+    incr() and observe() update dictionaries under one lock; spans flush
+    when flush_interval has passed, so no background thread is needed and
+    the same code works in a Lambda container that is frozen between
+    invocations. Delta exporters (EMF, StatsD) get the values since the
+    last flush; cumulative ones (Prometheus) get running totals.
+    """
+
+    def __init__(self, exporter=None, flush_interval=10.0):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+        self.flush_interval = flush_interval
+        self._counters = {}
+        self._histograms = {}
+        self._next_flush = time.monotonic() + flush_interval
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1, **tags):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(tags.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **tags):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(tags.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.add(value)
+
+    def span(self, name, **tags):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, tags)
+
+    def flush_if_due(self):
+        if self.enabled and time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        """Hand the aggregated values to the exporter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._next_flush = time.monotonic() + self.flush_interval
+            counters, histograms = self._counters, self._histograms
+            if not counters and not histograms:
+                return
+            if getattr(self.exporter, 'cumulative', False):
+                counters, histograms = dict(counters), {key: _copy(value) for key, value in histograms.items()}
+            else:
+                self._counters, self._histograms = {}, {}
+        try:
+            self.exporter.export(counters, histograms)
+        except Exception as e:
+            print(f"⚠️  Could not export metrics: {e}", file=sys.stderr)
+
+def _copy(histogram):
+    copy = Histogram()
+    copy.counts = list(histogram.counts)
+    copy.count, copy.sum, copy.min, copy.max = histogram.count, histogram.sum, histogram.min, histogram.max
+    return copy
+
+def _summary(histogram):
+    return [('.avg', round(histogram.sum / histogram.count, 3)), ('.p50', histogram.percentile(50)),
+            ('.p99', histogram.percentile(99)), ('.max', round(histogram.max, 3))]
+
+def _group_by_tags(counters, histograms):
+    groups = {}
+    for (name, tags), value in counters.items():
+        groups.setdefault(tags, ({}, {}))[0][name] = value
+    for (name, tags), histogram in histograms.items():
+        groups.setdefault(tags, ({}, {}))[1][name] = histogram
+    return groups
+
+class EMFExporter:
+    """
+    CloudWatch Embedded Metric Format: one JSON line per tag set on stdout.
+
+    In Lambda the log line becomes metrics without any API call. Each
+    histogram becomes .count plus .avg/.p50/.p99/.max in milliseconds.
+    """
+
+    def __init__(self, namespace='SAALabs', stream=None):
+        self.namespace = namespace
+        self.stream = stream
+
+    def export(self, counters, histograms):
+        stream = self.stream or sys.stdout
+        timestamp = int(time.time() * 1000)
+        for tags, (group_counters, group_histograms) in _group_by_tags(counters, histograms).items():
+            document = dict(tags)
+            definitions = []
+            for name, value in group_counters.items():
+                document[name] = value
+                definitions.append({'Name': name, 'Unit': 'Count'})
+            for name, histogram in group_histograms.items():
+                document[name + '.count'] = histogram.count
+                definitions.append({'Name': name + '.count', 'Unit': 'Count'})
+                for suffix, value in _summary(histogram):
+                    document[name + suffix] = value
+                    definitions.append({'Name': name + suffix, 'Unit': 'Milliseconds'})
+            document['_aws'] = {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{'Namespace': self.namespace, 'Dimensions': [[key for key, _ in tags]],
+                                       'Metrics': definitions}]
+            }
+            stream.write(json.dumps(document) + '\n')
+        stream.flush()
+
+class StatsDExporter:
+    """
+    StatsD over UDP with DogStatsD-style tags.
+
+    Values are already aggregated, so counters go out as one |c line and
+    each histogram as .count plus .avg/.p50/.p99/.max gauges.
+    """
+
+    MAX_PACKET_BYTES = 1432
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix=''):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def export(self, counters, histograms):
+        lines = []
+        for (name, tags), value in counters.items():
+            lines.append(self._line(name, value, 'c', tags))
+        for (name, tags), histogram in histograms.items():
+            lines.append(self._line(name + '.count', histogram.count, 'c', tags))
+            for suffix, value in _summary(histogram):
+                lines.append(self._line(name + suffix, value, 'g', tags))
+        packet = ''
+        for line in lines:
+            if packet and len(packet) + len(line) + 1 > self.MAX_PACKET_BYTES:
+                self.socket.sendto(packet.encode(), self.address)
+                packet = ''
+            packet = packet + '\n' + line if packet else line
+        if packet:
+            self.socket.sendto(packet.encode(), self.address)
+
+    def _line(self, name, value, kind, tags):
+        line = f"{self.prefix}{name}:{value}|{kind}"
+        if tags:
+            line += '|#' + ','.join(f"{key}:{tag}" for key, tag in tags)
+        return line
+
+class PrometheusExporter:
+    """
+    Prometheus text exposition format, cumulative since start.
+
+    Written atomically to path (for the node_exporter textfile collector)
+    or printed to stdout when no path is given.
+    """
+
+    cumulative = True
+
+    def __init__(self, path=None, prefix='saa_labs_'):
+        self.path = path
+        self.prefix = prefix
+
+    def render(self, counters, histograms):
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            metric = self._name(name) + '_total'
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, tags), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{self._labels(tags)} {value}")
+        for name in sorted({name for name, _ in histograms}):
+            metric = self._name(name) + '_ms'
+            lines.append(f"# TYPE {metric} histogram")
+            for (histogram_name, tags), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS_MS, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{self._labels(tags, le=bound)} {cumulative}")
+                lines.append(f"{metric}_bucket{self._labels(tags, le='+Inf')} {histogram.count}")
+                lines.append(f"{metric}_sum{self._labels(tags)} {histogram.sum:.3f}")
+                lines.append(f"{metric}_count{self._labels(tags)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, counters, histograms):
+        text = self.render(counters, histograms)
+        if not self.path:
+            sys.stdout.write(text)
+            return
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as output:
+            output.write(text)
+        os.replace(temp_path, self.path)
+
+    def _name(self, name):
+        return self.prefix + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+    def _labels(self, tags, le=None):
+        labels = [f'{key}="{value}"' for key, value in tags]
+        if le is not None:
+            labels.append(f'le="{le}"')
+        return '{' + ','.join(labels) + '}' if labels else ''
+
+def build_exporter(kind):
+    """Exporter for 'emf', 'statsd' or 'prometheus' using the environment for its settings"""
+    namespace = os.environ.get('METRICS_NAMESPACE', 'SAALabs')
+    if kind == 'emf':
+        return EMFExporter(namespace)
+    if kind == 'statsd':
+        return StatsDExporter(os.environ.get('STATSD_HOST', '127.0.0.1'), int(os.environ.get('STATSD_PORT', 8125)),
+                              prefix=namespace.lower() + '.')
+    if kind == 'prometheus':
+        return PrometheusExporter(os.environ.get('PROMETHEUS_FILE'), prefix=namespace.lower() + '_')
+    raise ValueError(f"Unknown metrics exporter: {kind} (use emf, statsd or prometheus)")
+
+METRICS = Metrics()
+
+def configure(exporter=None, flush_interval=None, quiet=None):
+    """
+    Enable metrics with an exporter (an object or 'emf'/'statsd'/'prometheus')
+    and/or quiet mode. Pending values are flushed at exit.
+    """
+    global QUIET
+    if quiet is not None:
+        QUIET = quiet
+    if exporter is None:
+        return METRICS
+    if isinstance(exporter, str):
+        exporter = build_exporter(exporter)
+    if flush_interval is None:
+        # A frozen Lambda container may never run atexit, so flush as each invocation ends
+        default = 0 if 'AWS_LAMBDA_FUNCTION_NAME' in os.environ else 10
+        flush_interval = float(os.environ.get('METRICS_FLUSH_SECONDS', default))
+    METRICS.flush()
+    with METRICS._lock:
+        METRICS._counters, METRICS._histograms = {}, {}
+    METRICS.exporter = exporter
+    METRICS.flush_interval = flush_interval
+    METRICS._next_flush = time.monotonic() + flush_interval
+    if not METRICS.enabled:
+        METRICS.enabled = True
+        atexit.register(METRICS.flush)
+    return METRICS
+
+def configure_from_args(args):
+    """Apply --metrics KIND and --quiet from a command line"""
+    from cli import get_option  # Only the command-line scripts need it; Lambda packages ship metrics.py alone
+    exporter = get_option(args, '--metrics', '', choices=('emf', 'statsd', 'prometheus')) or None
+    configure(exporter, quiet=True if '--quiet' in args else None)
+
+def incr(name, value=1, **tags):
+    METRICS.incr(name, value, **tags)
+
+def observe(name, value, **tags):
+    METRICS.observe(name, value, **tags)
+
+def span(name, **tags):
+    return METRICS.span(name, **tags)
+
+def traced(name, **tags):
+    """Decorator form of span()"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapped(*args, **kwargs):
+            with METRICS.span(name, **tags):
+                return function(*args, **kwargs)
+        return wrapped
+    return decorate
+
+def queue_tag(queue_url):
+    """Short tag for a queue: the last segment of its URL"""
+    return queue_url.rsplit('/', 1)[-1]
+
+def say(message):
+    """Print a per-message status line unless quiet mode is on"""
+    if not QUIET:
+        print(message)
+
+if os.environ.get('METRICS_EXPORTER'):
+    configure(os.environ['METRICS_EXPORTER'])